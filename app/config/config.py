@@ -9,4 +9,133 @@ class Settings:
     """
     GOOGLE_GENAI_API_KEY: str = os.getenv("GOOGLE_GENAI_API_KEY", "")
 
+    # Logging: LOG_FORMAT is "text" or "json"; LOG_SAMPLE_RATES keeps a fraction of high-volume
+    # message types, e.g. "task_ids=0.01"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text").lower()
+    LOG_ENQUEUE: bool = os.getenv("LOG_ENQUEUE", "true").lower() == "true"
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "task_ids=0.01")
+    # Opt-in log of raw model responses, capped per entry and rotated on disk
+    LOG_PAYLOADS: bool = os.getenv("LOG_PAYLOADS", "false").lower() == "true"
+    LOG_PAYLOAD_PATH: str = os.getenv("LOG_PAYLOAD_PATH", "/tmp/intellitask/logs/payloads.log")
+    LOG_PAYLOAD_MAX_CHARS: int = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "20000"))
+    LOG_PAYLOAD_ROTATION: str = os.getenv("LOG_PAYLOAD_ROTATION", "50 MB")
+    LOG_PAYLOAD_RETENTION: int = int(os.getenv("LOG_PAYLOAD_RETENTION", "5"))
+
+    # Model backend: "live" calls the API, "record" also saves every call to GENAI_CASSETTE_DIR,
+    # "replay" answers from those recordings offline (load testing without an API key)
+    GENAI_BACKEND: str = os.getenv("GENAI_BACKEND", "live").lower()
+    GENAI_CASSETTE_DIR: str = os.getenv("GENAI_CASSETTE_DIR", "/tmp/intellitask/cassettes")
+    # Replay latency is lognormal around the recorded latency times the scale (0 disables delays);
+    # non-strict replay answers unrecorded prompts with a recording of the same prompt template
+    GENAI_REPLAY_LATENCY_SCALE: float = float(os.getenv("GENAI_REPLAY_LATENCY_SCALE", "1.0"))
+    GENAI_REPLAY_LATENCY_SIGMA: float = float(os.getenv("GENAI_REPLAY_LATENCY_SIGMA", "0.25"))
+    GENAI_REPLAY_STRICT: bool = os.getenv("GENAI_REPLAY_STRICT", "false").lower() == "true"
+
+    # Model tiers, fastest first: "model:max_input_tokens,...,model". Larger inputs go to later tiers;
+    # requests with a latency budget step back to faster tiers whose recent p90 fits the budget
+    GENAI_MODEL_TIERS: str = os.getenv("GENAI_MODEL_TIERS", "gemini-2.5-flash-lite")
+    # Hedged requests: duplicate a call still running past this percentile of recent latencies
+    GENAI_HEDGE_ENABLED: bool = os.getenv("GENAI_HEDGE_ENABLED", "false").lower() == "true"
+    GENAI_HEDGE_PERCENTILE: float = float(os.getenv("GENAI_HEDGE_PERCENTILE", "0.95"))
+    GENAI_HEDGE_MAX_RATIO: float = float(os.getenv("GENAI_HEDGE_MAX_RATIO", "0.1"))
+    GENAI_LATENCY_WINDOW: int = int(os.getenv("GENAI_LATENCY_WINDOW", "200"))
+    GENAI_LATENCY_MIN_SAMPLES: int = int(os.getenv("GENAI_LATENCY_MIN_SAMPLES", "20"))
+
+    # Adaptive (AIMD) limit on model calls in flight per worker process: starts at the initial value,
+    # grows on success and halves on 429/503 or rising latency, within [min, max]
+    GENAI_MAX_CONCURRENCY: int = int(os.getenv("GENAI_MAX_CONCURRENCY", "32"))
+    GENAI_MIN_CONCURRENCY: int = int(os.getenv("GENAI_MIN_CONCURRENCY", "2"))
+    GENAI_INITIAL_CONCURRENCY: int = int(os.getenv("GENAI_INITIAL_CONCURRENCY", "8"))
+    GENAI_LIMITER_LATENCY_TOLERANCE: float = float(os.getenv("GENAI_LIMITER_LATENCY_TOLERANCE", "3.0"))
+    GENAI_LIMITER_COOLDOWN_SECONDS: float = float(os.getenv("GENAI_LIMITER_COOLDOWN_SECONDS", "2"))
+
+    # Retries of 429/5xx/network errors with jittered exponential backoff
+    GENAI_RETRY_MAX_ATTEMPTS: int = int(os.getenv("GENAI_RETRY_MAX_ATTEMPTS", "4"))
+    GENAI_RETRY_MAX_SECONDS: float = float(os.getenv("GENAI_RETRY_MAX_SECONDS", "60"))
+    GENAI_RETRY_BASE_SECONDS: float = float(os.getenv("GENAI_RETRY_BASE_SECONDS", "1"))
+    GENAI_RETRY_MAX_WAIT_SECONDS: float = float(os.getenv("GENAI_RETRY_MAX_WAIT_SECONDS", "20"))
+
+    # Circuit breaker: fail fast with 503 after consecutive failures, probe again after the reset time
+    GENAI_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("GENAI_BREAKER_FAILURE_THRESHOLD", "5"))
+    GENAI_BREAKER_RESET_SECONDS: float = float(os.getenv("GENAI_BREAKER_RESET_SECONDS", "30"))
+
+    # Tokens-per-minute budget shared by all workers through a SQLite file (0 disables the scheduler).
+    # Calls reserve estimated input + recent average output tokens and wait in priority order
+    GENAI_TPM_LIMIT: int = int(os.getenv("GENAI_TPM_LIMIT", "0"))
+    GENAI_TPM_DB_PATH: str = os.getenv("GENAI_TPM_DB_PATH", "/tmp/intellitask/token_budget.db")
+    GENAI_TPM_OUTPUT_ESTIMATE: int = int(os.getenv("GENAI_TPM_OUTPUT_ESTIMATE", "4000"))
+    GENAI_TPM_POLL_SECONDS: float = float(os.getenv("GENAI_TPM_POLL_SECONDS", "0.25"))
+    GENAI_TPM_MAX_WAIT_SECONDS: float = float(os.getenv("GENAI_TPM_MAX_WAIT_SECONDS", "120"))
+
+    # Cache shared by all worker processes on this host: one SQLite file in WAL mode holding
+    # zstd-compressed values. Backs the result cache's disk tier, the upload registry and the
+    # conversion cache; expired entries and then least recently used ones are evicted past the size cap
+    SHARED_CACHE_PATH: str = os.getenv("SHARED_CACHE_PATH", "/tmp/intellitask/shared-cache.db")
+    SHARED_CACHE_MAX_BYTES: int = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+    SHARED_CACHE_MAX_AGE_SECONDS: int = int(os.getenv("SHARED_CACHE_MAX_AGE_SECONDS", "604800"))
+
+    # Files API upload registry (content-addressed reuse of uploaded files)
+    UPLOAD_CACHE_ENABLED: bool = os.getenv("UPLOAD_CACHE_ENABLED", "true").lower() == "true"
+    UPLOAD_CACHE_MAX_FILES: int = int(os.getenv("UPLOAD_CACHE_MAX_FILES", "500"))
+    UPLOAD_EXPIRY_MARGIN_SECONDS: int = int(os.getenv("UPLOAD_EXPIRY_MARGIN_SECONDS", "3600"))
+
+    # Explicit context caching of static prompt prefixes and uploaded documents
+    CONTEXT_CACHE_ENABLED: bool = os.getenv("CONTEXT_CACHE_ENABLED", "true").lower() == "true"
+    CONTEXT_CACHE_TTL_SECONDS: int = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    CONTEXT_CACHE_MAX_ENTRIES: int = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "100"))
+
+    # Analyze result cache (in-memory LRU per worker + the shared cache as disk tier)
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+    RESULT_CACHE_TTL_SECONDS: int = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+    RESULT_CACHE_DISK_TTL_SECONDS: int = int(os.getenv("RESULT_CACHE_DISK_TTL_SECONDS", "604800"))
+
+    # Coalesce identical concurrent /analyze/ requests into one model call; the call is cancelled
+    # once every waiting client has disconnected (checked every DISCONNECT_POLL_SECONDS)
+    ANALYZE_COALESCE_ENABLED: bool = os.getenv("ANALYZE_COALESCE_ENABLED", "true").lower() == "true"
+    DISCONNECT_POLL_SECONDS: float = float(os.getenv("DISCONNECT_POLL_SECONDS", "1"))
+
+    # LibreOffice DOCX -> PDF conversion pool
+    LIBREOFFICE_BINARY: str = os.getenv("LIBREOFFICE_BINARY", "libreoffice")
+    CONVERTER_POOL_SIZE: int = int(os.getenv("CONVERTER_POOL_SIZE", "2"))
+    CONVERTER_TIMEOUT_SECONDS: int = int(os.getenv("CONVERTER_TIMEOUT_SECONDS", "120"))
+    CONVERTER_MAX_JOBS_PER_WORKER: int = int(os.getenv("CONVERTER_MAX_JOBS_PER_WORKER", "50"))
+    CONVERTER_PROFILE_DIR: str = os.getenv("CONVERTER_PROFILE_DIR", "/tmp/intellitask/lo-profiles")
+
+    # Upload size limits
+    MAX_UPLOAD_FILE_BYTES: int = int(os.getenv("MAX_UPLOAD_FILE_BYTES", str(25 * 1024 * 1024)))
+    MAX_UPLOAD_REQUEST_BYTES: int = int(os.getenv("MAX_UPLOAD_REQUEST_BYTES", str(100 * 1024 * 1024)))
+
+    # Per-request scratch workspaces; point WORKSPACE_ROOT at a tmpfs mount for faster I/O.
+    # WORKSPACE_QUOTA_BYTES caps the workspaces of all worker processes under the root together
+    WORKSPACE_ROOT: str = os.getenv("WORKSPACE_ROOT", "/tmp/intellitask/workspaces")
+    WORKSPACE_QUOTA_BYTES: int = int(os.getenv("WORKSPACE_QUOTA_BYTES", str(2 * 1024 * 1024 * 1024)))
+    WORKSPACE_STALE_SECONDS: int = int(os.getenv("WORKSPACE_STALE_SECONDS", "3600"))
+
+    # PDF/DOCX text extraction runs in a pool of EXTRACTION_POOL_SIZE processes per worker process,
+    # EXTRACTION_PAGES_PER_TASK PDF pages per task; page texts are kept in the shared cache
+    EXTRACTION_POOL_SIZE: int = int(os.getenv("EXTRACTION_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+    EXTRACTION_PAGES_PER_TASK: int = int(os.getenv("EXTRACTION_PAGES_PER_TASK", "8"))
+
+    # Documents with less extractable text than this are uploaded instead of inlined (ingest_mode=auto)
+    TEXT_INGEST_MIN_CHARS: int = int(os.getenv("TEXT_INGEST_MIN_CHARS", "200"))
+
+    # Background analyze jobs (persisted in SQLite)
+    JOB_DB_PATH: str = os.getenv("JOB_DB_PATH", "/tmp/intellitask/jobs.db")
+    JOB_STORAGE_DIR: str = os.getenv("JOB_STORAGE_DIR", "/tmp/intellitask/jobs")
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_HEARTBEAT_SECONDS: float = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+    JOB_STALE_SECONDS: int = int(os.getenv("JOB_STALE_SECONDS", "120"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+    # Chunked (map-reduce) analysis of large documents
+    CHUNK_MAX_CHARS: int = int(os.getenv("CHUNK_MAX_CHARS", "20000"))
+    CHUNK_MIN_CHARS: int = int(os.getenv("CHUNK_MIN_CHARS", "2000"))
+    CHUNK_MAX_CONCURRENCY: int = int(os.getenv("CHUNK_MAX_CONCURRENCY", "4"))
+
+    # Retrieval-scoped /edit-json/: at most this many query-relevant tasks are sent to the model
+    EDIT_SCOPE_MAX_TASKS: int = int(os.getenv("EDIT_SCOPE_MAX_TASKS", "20"))
+
 settings = Settings()
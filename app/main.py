@@ -1,10 +1,35 @@
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.logger import logger
-from app.routes.analyze import router as analyze_router
+from app.utils.converter_pool import converter_pool
+from app.utils.extraction_pool import extraction_pool
+from app.utils.workspace import cleanup_stale_workspaces
+from app.routes.analyze import router as analyze_router, genai_service
+from app.routes.jobs import router as jobs_router
+from app.routes.metrics import router as metrics_router
+from app.utils.metrics import MetricsMiddleware
+from app.services.job_queue import JobQueue
+from app.services.resilience import ModelUnavailableError
 
-app = FastAPI(title="Truflux FRS Task Breakdown API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    cleanup_stale_workspaces()
+    # Initialize LibreOffice profiles up front so the first DOCX upload does not pay the cold start
+    await converter_pool.warm_up()
+    await extraction_pool.warm_up()
+    # Created here rather than at import so importing the app does not open or migrate the job database
+    app.state.job_queue = JobQueue(genai_service)
+    await app.state.job_queue.start()
+    yield
+    await app.state.job_queue.stop()
+    extraction_pool.shutdown()
+
+
+app = FastAPI(title="Truflux FRS Task Breakdown API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,6 +38,20 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Per-request stage timings and token counts, exposed on /metrics
+app.add_middleware(MetricsMiddleware)
+
+
+@app.exception_handler(ModelUnavailableError)
+async def model_unavailable_handler(request: Request, exc: ModelUnavailableError):
+    # Quota exhausted, outage or open circuit: tell clients when to come back instead of a generic 500
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(round(exc.retry_after), 1))},
+    )
 
 
-app.include_router(analyze_router, tags=["Analyze"])
\ No newline at end of file
+app.include_router(analyze_router, tags=["Analyze"])
+app.include_router(jobs_router, tags=["Jobs"])
+app.include_router(metrics_router, tags=["Metrics"])
\ No newline at end of file
@@ -1,29 +1,36 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, field_validator, model_validator
 from typing import List, Optional
+from app.utils.validation_utils import normalize_priority
+from app.utils.other_utils import parse_estimate
 
 # Shared Models
 class SubTask(BaseModel):
     summary: str = Field(..., max_length=255)
     description: str = Field(..., max_length=1000)
     issueType: str = Field(..., pattern=r'^(Task|Story|Bug)$')
-    priority: str = Field(..., pattern=r'^(None|Low|Medium|High)$')
+    priority: str = Field("None", pattern=r'^(None|Low|Medium|High)$')
     startDate: Optional[str] = None  # "YYYY-MM-DD HH:mm:ss" or None
     dueDate: Optional[str] = None
     originalEstimate: str = Field(..., max_length=45)  # HH:mm format
     storyPoint: int = Field(..., ge=0, le=2147483647)
 
+    # Normalize model-generated priorities (e.g. "high", "Critical") during validation
+    _normalize_priority = field_validator("priority", mode="before")(normalize_priority)
+
 
 class Task(BaseModel):
     summary: str = Field(..., max_length=255)
     description: str = Field(..., max_length=1000)
     issueType: str = Field(..., pattern=r'^(Task|Story|Bug)$')
-    priority: str = Field(..., pattern=r'^(None|Low|Medium|High)$')
+    priority: str = Field("None", pattern=r'^(None|Low|Medium|High)$')
     startDate: Optional[str] = None
     dueDate: Optional[str] = None
     originalEstimate: str = Field(..., max_length=45)  # HH:mm format
     storyPoint: int = Field(..., ge=0, le=2147483647)
     subTasks: List[SubTask] = Field(default_factory=list)
 
+    _normalize_priority = field_validator("priority", mode="before")(normalize_priority)
+
 # Scrum Models
 class Sprint(BaseModel):
     name: str = Field(..., max_length=45)
@@ -53,4 +60,20 @@ class KanbanProject(BaseModel):
 # Task-Only Model
 class Project(BaseModel):
     project_name: str
-    tasks: List[Task]
\ No newline at end of file
+    tasks: List[Task]
+
+    _total_estimate_hours: float = PrivateAttr(default=0.0)
+
+    @model_validator(mode="after")
+    def compute_rollups(self):
+        # Same rollup as calculate_total_estimate_hours, computed while validating instead of on a dump
+        self._total_estimate_hours = round(sum(parse_estimate(task.originalEstimate) for task in self.tasks), 2)
+        return self
+
+    @property
+    def total_estimate_hours(self) -> float:
+        return self._total_estimate_hours
+
+
+# Compiled once; validates model output straight from JSON text without an intermediate dict
+ProjectAdapter = TypeAdapter(Project)
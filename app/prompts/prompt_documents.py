@@ -0,0 +1,20 @@
+DOCUMENT_TEXT_TEMPLATE = """
+---------------------------------------------
+FRS DOCUMENT TEXT
+---------------------------------------------
+
+The FRS content below was extracted from the uploaded documents.
+Treat it exactly as you would treat attached FRS files.
+
+{documents}
+"""
+
+SECTION_SCOPE_NOTE = """
+---------------------------------------------
+SECTION SCOPE
+---------------------------------------------
+
+The text above is one section of a larger FRS; other sections are analyzed separately.
+Generate tasks only for requirements stated in this section. Do not add tasks for
+features that are merely referenced here but specified elsewhere.
+"""
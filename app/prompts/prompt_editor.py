@@ -1,4 +1,5 @@
-EDIT_TASK_TEMPLATE = """
+# Shared by the full-document and JSON-Patch edit modes so both follow the same editing rules
+EDIT_RULES = """
 You are a senior software architect and expert task-structuring AI.
 
 Your job is to **modify an existing JSON task breakdown** based on a user query.  
@@ -80,7 +81,19 @@ When updating descriptions that reference technology:
 - If replacing tech (e.g., "change React to Vue"), update only the specified references
 - Keep descriptions accurate and coherent after any tech changes
 
+"""
+
+EDIT_USER_INPUT = """---------------------------------------------
+USER INPUT BELOW
 ---------------------------------------------
+Previous JSON:
+{previous_json}
+
+User Query:
+{query}
+"""
+
+EDIT_TASK_TEMPLATE = EDIT_RULES + """---------------------------------------------
 FINAL OUTPUT
 ---------------------------------------------
 Return ONLY a JSON object with this structure:
@@ -122,12 +135,72 @@ Example Error Response:
 
 NOTHING else. No markdown, explanation, or extra text.
 
+""" + EDIT_USER_INPUT
+
+EDIT_PATCH_TEMPLATE = EDIT_RULES + """---------------------------------------------
+FINAL OUTPUT (JSON PATCH)
 ---------------------------------------------
-USER INPUT BELOW
----------------------------------------------
-Previous JSON:
-{previous_json}
+Do NOT return the updated JSON. Return ONLY the changes, as RFC 6902 JSON Patch operations
+that transform previous_json into the updated breakdown.
+
+Path rules:
+- Paths are JSON Pointers into previous_json, e.g. "/tasks/3/subTasks/1/originalEstimate".
+- Operations are applied in order; array indexes refer to the array after the preceding operations.
+- Use "add" with path "/tasks/-" (or ".../subTasks/-") to append a new task or sub-task.
+- Use "replace" for changed fields and "remove" for deleted tasks or sub-tasks.
+- When removing several items from one array, remove the highest index first.
+- Before changing or removing an existing task or sub-task, add a "test" operation on its
+  "summary" with the current value, so a wrong index is detected instead of editing the wrong task.
+- Include parent-task estimate and storyPoint recalculations as operations too.
 
-User Query:
-{query}
-"""
\ No newline at end of file
+Return ONLY a JSON object with this structure:
+
+SUCCESS RESPONSE:
+{
+  "success": true,
+  "added": ["<summary text of added task 1>"],
+  "updated": ["<summary text of updated task 1>"],
+  "deleted": ["<summary text of deleted task 1>"],
+  "patch": [
+    {"op": "test", "path": "/tasks/2/summary", "value": "FE: Implement login page"},
+    {"op": "replace", "path": "/tasks/2/priority", "value": "High"}
+  ]
+}
+
+ERROR RESPONSE:
+{
+  "success": false,
+  "error": "<error message without Error: prefix>"
+}
+
+NOTHING else. No markdown, explanation, or extra text.
+
+""" + EDIT_USER_INPUT
+
+# Appended when previous_json is sent in the tabular encoding
+TABULAR_JSON_NOTE = """
+---------------------------------------------
+PREVIOUS JSON ENCODING
+---------------------------------------------
+Previous JSON above is in a compact tabular form to save space:
+- "tasks" is a list of rows; each row holds the values of "task_columns" in that order.
+  The last column, "subTasks", is a list of sub-task rows with the values of "subtask_columns".
+- "task_constants" / "subtask_constants" are fields with the same value on every task / sub-task.
+- If "description_html" is set, every description is wrapped in that HTML template.
+Row N corresponds to "/tasks/N" and sub-task row M of it to "/tasks/N/subTasks/M".
+Your OUTPUT must use the normal JSON task structure (full objects with every field), never the tabular form.
+"""
+
+# Appended for retrieval-scoped edits; {outline} lists the tasks that were left out of previous_json
+SCOPED_EDIT_NOTE = """
+---------------------------------------------
+EDIT SCOPE
+---------------------------------------------
+Previous JSON above contains only the tasks relevant to the query, not the whole project.
+Apply the query to these tasks and return ONLY them (plus any new tasks) in your output;
+tasks you leave out of your output are treated as deleted.
+The project's other tasks are listed below for context. Do not return, modify or duplicate them.
+
+Other tasks:
+{outline}
+"""
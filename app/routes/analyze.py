@@ -1,18 +1,31 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse, Response
 from app.services.genai_service import GenAIService
-from app.utils.logger import logger
+from app.utils.logger import logger, sampled
 import json
 from typing import Any, Dict, List, Optional
 
 # Import new utils
-from app.utils.file_utils import save_temp_file, convert_docx_to_pdf
+from app.utils.file_utils import save_temp_file, file_digest, prepare_documents, UploadBudget
 from app.utils.validation_utils import (
     validate_project_type,
+    validate_ingest_mode,
+    validate_edit_mode,
+    validate_json_encoding,
+    validate_latency_budget,
     validate_json_string,
+    is_cache_bypass,
     parse_tech_stack,
 )
-from app.utils.ai_utils import parse_ai_json
+from app.utils.ai_utils import parse_ai_json, build_document_section, template_prefix
+from app.utils.workspace import RequestWorkspace, get_workspace
+from app.utils.request_utils import run_until_disconnected
+from app.utils.patch_utils import apply_task_patch
+from app.utils.encoding_utils import encode_previous_json, encoding_report
+from app.utils.retrieval_utils import scope_edit
+from app.config.config import settings
+from app.utils.metrics import stage_timer, set_labels
+from app.services.token_budget import PRIORITY_INTERACTIVE
 
 import os
 import json
@@ -22,11 +35,18 @@ genai_service = GenAIService()
 
 @router.post("/analyze/")
 async def analyze(
+    request: Request,
     files: list[UploadFile] = File(None, description="Upload up to 5 files (PDF, DOCX)"),
     project_type: str = Form(..., description="Project methodology: Scrum or Kanban"),
     tech_stack: str = Form(None, description="Comma-separated list of technologies used in the project"),
+    ingest_mode: str = Form("auto", description="Document ingestion: auto, text (inline extracted text) or file (upload)"),
+    chunked: bool = Form(False, description="Analyze large documents section by section and merge the results (requires text ingestion)"),
+    allow_partial: bool = Form(False, description="With chunked, return the tasks of the sections that succeeded instead of failing; see _meta.failed_sections"),
+    latency_budget: Optional[float] = Form(None, description="Target response time in seconds; may route the request to a faster model tier"),
+    x_cache_bypass: Optional[str] = Header(None, description="Set to 'true' to skip the result cache and regenerate"),
+    workspace: RequestWorkspace = Depends(get_workspace),
 ):
-    logger.info(f"Analyze request: project_type={project_type}")
+    logger.info(f"Analyze request: project_type={project_type}, ingest_mode={ingest_mode}, chunked={chunked}")
 
     if not files:
         raise HTTPException(status_code=400, detail="You must upload at least one file.")
@@ -34,25 +54,101 @@ async def analyze(
         raise HTTPException(status_code=400, detail="Maximum 5 files allowed.")
 
     validate_project_type(project_type)
+    validate_ingest_mode(ingest_mode)
+    validate_latency_budget(latency_budget)
 
-    temp_files = []
+    if chunked:
+        # Sections are cut from extracted text, so every document must be ingested as text
+        if ingest_mode == "file":
+            raise HTTPException(status_code=400, detail="Chunked analysis requires ingest_mode 'auto' or 'text'.")
+        _, document_texts, _ = await _ingest_uploads(files, "text", workspace)
+        result = await run_until_disconnected(request, genai_service.analyze_frs_chunked(
+            document_texts,
+            project_type=project_type,
+            tech_stack=parse_tech_stack(tech_stack),
+            bypass_cache=is_cache_bypass(x_cache_bypass),
+            latency_budget=latency_budget,
+            allow_partial=allow_partial,
+        ))
+        return result if isinstance(result, Response) else ORJSONResponse(content=result)
 
-    for uploaded in files:
-        temp_path = save_temp_file(uploaded)
+    temp_files, document_texts, document_hashes = await _ingest_uploads(files, ingest_mode, workspace)
 
-        if temp_path.endswith(".docx"):
-            pdf_path = convert_docx_to_pdf(temp_path)
-            temp_files.append(pdf_path)
-        else:
-            temp_files.append(temp_path)
+    # Identical concurrent requests share one model call; it is cancelled only when all their clients are gone
+    result = await run_until_disconnected(request, genai_service.analyze_frs(
+        temp_files,
+        project_type=project_type,
+        tech_stack=parse_tech_stack(tech_stack),
+        document_hashes=document_hashes,
+        bypass_cache=is_cache_bypass(x_cache_bypass),
+        document_texts=document_texts,
+        latency_budget=latency_budget,
+    ))
+
+    return result if isinstance(result, Response) else ORJSONResponse(content=result)
+
+
+@router.post("/analyze/stream")
+async def analyze_stream(
+    files: list[UploadFile] = File(None, description="Upload up to 5 files (PDF, DOCX)"),
+    project_type: str = Form(..., description="Project methodology: Scrum or Kanban"),
+    tech_stack: str = Form(None, description="Comma-separated list of technologies used in the project"),
+    ingest_mode: str = Form("auto", description="Document ingestion: auto, text (inline extracted text) or file (upload)"),
+    latency_budget: Optional[float] = Form(None, description="Target response time in seconds; may route the request to a faster model tier"),
+    x_cache_bypass: Optional[str] = Header(None, description="Set to 'true' to skip the result cache and regenerate"),
+    workspace: RequestWorkspace = Depends(get_workspace),
+):
+    """
+    Same as /analyze/ but streams NDJSON: one {"type": "task"} line per task as soon as the model
+    finishes it, then a final {"type": "meta"} line (or {"type": "error"}).
+    """
+    logger.info(f"Streaming analyze request: project_type={project_type}, ingest_mode={ingest_mode}")
+
+    if not files:
+        raise HTTPException(status_code=400, detail="You must upload at least one file.")
+    if len(files) > 5:
+        raise HTTPException(status_code=400, detail="Maximum 5 files allowed.")
+
+    validate_project_type(project_type)
+    validate_ingest_mode(ingest_mode)
+    validate_latency_budget(latency_budget)
 
-    result = await genai_service.analyze_frs(
+    temp_files, document_texts, document_hashes = await _ingest_uploads(files, ingest_mode, workspace)
+
+    events = genai_service.stream_analyze_frs(
         temp_files,
         project_type=project_type,
-        tech_stack=tech_stack
+        tech_stack=parse_tech_stack(tech_stack),
+        document_hashes=document_hashes,
+        bypass_cache=is_cache_bypass(x_cache_bypass),
+        document_texts=document_texts,
+        latency_budget=latency_budget,
     )
 
-    return JSONResponse(content=result)
+    async def ndjson():
+        async for event in events:
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+async def _ingest_uploads(
+    files: list[UploadFile], ingest_mode: str, workspace: RequestWorkspace
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Saves uploads into the workspace and prepares them for the model.
+    Returns (paths to upload, inline document texts, hashes of the original uploads).
+    """
+    budget = UploadBudget()
+    source_paths = [await save_temp_file(uploaded, budget, workspace) for uploaded in files]
+    temp_files, document_texts = await prepare_documents(source_paths, ingest_mode)
+    for temp_path in temp_files:
+        workspace.track(temp_path)
+
+    # Hash the original uploads (memoized while saving); converted PDFs are not byte-stable
+    document_hashes = [file_digest(p) for p in source_paths]
+    return temp_files, document_texts, document_hashes
+
 
 def validate_and_preserve_ids(previous_data: Dict[str, Any], updated_data: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -75,16 +171,17 @@ def validate_and_preserve_ids(previous_data: Dict[str, Any], updated_data: Dict[
             sub_key = ("subtask", task.get("summary", ""), subtask.get("summary", ""))
             existing_map[sub_key] = subtask.get("id")
     
-    # Apply IDs to updated data
+    # Apply IDs to updated data (per-task lines are sampled debug output; see LOG_SAMPLE_RATES)
+    task_log = sampled("task_ids")
     for task in updated_data.get("tasks", []):
         key = (task.get("issueType", ""), task.get("summary", ""))
         
         if key in existing_map:
             task["id"] = existing_map[key]
-            logger.info(f"Preserved ID {existing_map[key]} for task: {task.get('summary')}")
+            task_log.debug("Preserved ID {} for task: {}", existing_map[key], task.get("summary"))
         else:
             task["id"] = None
-            logger.info(f"New task created (id=null): {task.get('summary')}")
+            task_log.debug("New task created (id=null): {}", task.get("summary"))
         
         # Handle subtasks
         for subtask in task.get("subTasks", []):
@@ -92,10 +189,10 @@ def validate_and_preserve_ids(previous_data: Dict[str, Any], updated_data: Dict[
             
             if sub_key in existing_map:
                 subtask["id"] = existing_map[sub_key]
-                logger.info(f"Preserved ID {existing_map[sub_key]} for subtask: {subtask.get('summary')}")
+                task_log.debug("Preserved ID {} for subtask: {}", existing_map[sub_key], subtask.get("summary"))
             else:
                 subtask["id"] = None
-                logger.info(f"New subtask created (id=null): {subtask.get('summary')}")
+                task_log.debug("New subtask created (id=null): {}", subtask.get("summary"))
     
     return updated_data
 
@@ -105,42 +202,80 @@ async def edit_json(
     files: Optional[List[UploadFile]] = File(None, description="Upload up to 5 files (PDF, DOCX)"),
     previous_json: str = Form(...),
     query: str = Form(...),
+    ingest_mode: str = Form("auto", description="Document ingestion: auto, text (inline extracted text) or file (upload)"),
+    edit_mode: str = Form("full", description="full (model returns the whole updated JSON) or patch (model returns JSON Patch operations)"),
+    json_encoding: str = Form("pretty", description="How previous_json is embedded in the prompt: pretty, minified or tabular"),
+    scoped: bool = Form(False, description="Send only the tasks relevant to the query (plus an outline of the rest) for large projects"),
+    latency_budget: Optional[float] = Form(None, description="Target response time in seconds; may route the request to a faster model tier"),
+    workspace: RequestWorkspace = Depends(get_workspace),
 ):
-    from app.prompts.prompt_editor import EDIT_TASK_TEMPLATE
+    from app.prompts.prompt_editor import EDIT_TASK_TEMPLATE, EDIT_PATCH_TEMPLATE, TABULAR_JSON_NOTE, SCOPED_EDIT_NOTE
 
     # Validate and normalize previous_json (handles both array and dict formats)
     previous_data = validate_json_string(previous_json)
+    validate_ingest_mode(ingest_mode)
+    validate_edit_mode(edit_mode)
+    validate_json_encoding(json_encoding)
+    validate_latency_budget(latency_budget)
+    template = EDIT_PATCH_TEMPLATE if edit_mode == "patch" else EDIT_TASK_TEMPLATE
 
     temp_files = []
+    document_texts = []
     if files:
         logger.info(f"Received {len(files)} files for edit-json")
         if len(files) > 5:
             raise HTTPException(status_code=400, detail="Maximum 5 files allowed.")
 
+        budget = UploadBudget()
+        source_paths = []
         for uploaded in files:
-            temp_path = await save_temp_file(uploaded)
+            temp_path = await save_temp_file(uploaded, budget, workspace)
             logger.info(f"Saved temp file: {temp_path}")
+            source_paths.append(temp_path)
 
-            if temp_path.endswith(".docx"):
-                pdf_path = await convert_docx_to_pdf(temp_path)
-                temp_files.append(pdf_path)
-                logger.info(f"Converted to PDF: {pdf_path}")
-            else:
-                temp_files.append(temp_path)
+        temp_files, document_texts = await prepare_documents(source_paths, ingest_mode)
+        for temp_path in temp_files:
+            workspace.track(temp_path)
     else:
         logger.info("No files received for edit-json")
 
-    prompt = EDIT_TASK_TEMPLATE \
-        .replace("{previous_json}", json.dumps(previous_data, indent=2)) \
+    # Scoped edits send only the query-relevant tasks; the model's result is merged back below
+    scope = scope_edit(previous_data, query, settings.EDIT_SCOPE_MAX_TASKS) if scoped else None
+    prompt_data = scope.scoped_data if scope else previous_data
+
+    encoded_previous, json_encoding = encode_previous_json(prompt_data, json_encoding)
+    encoding_meta = encoding_report(previous_data, encoded_previous, json_encoding)
+    logger.info(f"previous_json encoding: {encoding_meta}")
+
+    prompt = template \
+        .replace("{previous_json}", encoded_previous) \
         .replace("{query}", query)
+    if json_encoding == "tabular":
+        prompt += TABULAR_JSON_NOTE
+    if scope:
+        prompt += SCOPED_EDIT_NOTE.replace("{outline}", scope.outline())
+    if document_texts:
+        prompt += build_document_section(document_texts)
 
+    model = await genai_service.client.choose_model(temp_files, prompt, latency_budget)
+    set_labels(model=model)
     response = await genai_service.client.get_task_breakdown(
         file_paths=temp_files,
-        prompt=prompt
+        prompt=prompt,
+        static_prefix=template_prefix(template, "{previous_json}"),
+        model=model,
+        priority=PRIORITY_INTERACTIVE,
     )
 
     response_text = response.get("text", "") if isinstance(response, dict) else response
-    ai_response = parse_ai_json(response_text)
+    with stage_timer("parse"):
+        ai_response = parse_ai_json(response_text)
+
+    # Patch mode: rebuild updated_json from the operations, then continue exactly like full mode
+    if edit_mode == "patch" and "patch" in ai_response:
+        with stage_timer("apply_patch"):
+            # The operations are an internal detail; clients get the same response shape as full mode
+            ai_response["updated_json"] = apply_task_patch(prompt_data, ai_response.pop("patch"))
     
     # Handle the wrapper structure from prompt_editor
     if isinstance(ai_response, dict) and "updated_json" in ai_response:
@@ -149,12 +284,20 @@ async def edit_json(
         # Normalize inner data if it comes as array
         if isinstance(inner_data, list):
             inner_data = {"tasks": inner_data}
+        if not isinstance(inner_data, dict) or "tasks" not in inner_data:
+            logger.info("Model response has no updated tasks; returning it unchanged")
+            return ai_response
+        if scope:
+            inner_data = scope.merge(inner_data)
             
         # Preserve IDs on the inner data
         inner_data = validate_and_preserve_ids(previous_data, inner_data)
         
         # Update the wrapper with processed data
         ai_response["updated_json"] = inner_data
+        ai_response["_meta"] = {"previous_json": encoding_meta}
+        if scope:
+            ai_response["_meta"]["scoped_tasks"] = len(scope.selected)
         
         logger.info(f"Returning wrapper with {len(inner_data.get('tasks', []))} tasks")
         return ai_response
@@ -165,6 +308,12 @@ async def edit_json(
     # Normalize updated_json if it comes as array
     if isinstance(updated_json, list):
         updated_json = {"tasks": updated_json}
+    # Error responses ({"success": false, "error": ...}) carry no tasks and go back as they are
+    if not isinstance(updated_json, dict) or "tasks" not in updated_json:
+        logger.info("Model response has no tasks; returning it unchanged")
+        return updated_json
+    if scope:
+        updated_json = scope.merge(updated_json)
 
     # Preserve IDs from previous data
     updated_json = validate_and_preserve_ids(previous_data, updated_json)
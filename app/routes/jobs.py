@@ -0,0 +1,77 @@
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Depends, Request
+from fastapi.responses import ORJSONResponse
+from typing import Optional
+import asyncio
+
+from app.config.config import settings
+from app.services.job_queue import JobQueue
+from app.utils.logger import logger
+from app.utils.file_utils import save_temp_file, UploadBudget
+from app.utils.validation_utils import (
+    validate_project_type,
+    validate_ingest_mode,
+    parse_tech_stack,
+    is_cache_bypass,
+)
+from app.utils.workspace import RequestWorkspace
+
+router = APIRouter()
+
+
+def get_job_queue(request: Request) -> JobQueue:
+    """
+    The queue is created in the app lifespan, so importing this module does not open the job database.
+    """
+    return request.app.state.job_queue
+
+
+@router.post("/jobs/analyze", status_code=202)
+async def submit_analyze_job(
+    files: list[UploadFile] = File(None, description="Upload up to 5 files (PDF, DOCX)"),
+    project_type: str = Form(..., description="Project methodology: Scrum or Kanban"),
+    tech_stack: str = Form(None, description="Comma-separated list of technologies used in the project"),
+    ingest_mode: str = Form("auto", description="Document ingestion: auto, text (inline extracted text) or file (upload)"),
+    x_cache_bypass: Optional[str] = Header(None, description="Set to 'true' to skip the result cache and regenerate"),
+    job_queue: JobQueue = Depends(get_job_queue),
+):
+    """
+    Queues an analysis and returns its job id immediately. Poll GET /jobs/{job_id} for the result.
+    """
+    logger.info(f"Analyze job request: project_type={project_type}, ingest_mode={ingest_mode}")
+
+    if not files:
+        raise HTTPException(status_code=400, detail="You must upload at least one file.")
+    if len(files) > 5:
+        raise HTTPException(status_code=400, detail="Maximum 5 files allowed.")
+
+    validate_project_type(project_type)
+    validate_ingest_mode(ingest_mode)
+
+    # Uploads must outlive this request, so they go into a job-owned directory
+    workspace = await asyncio.to_thread(RequestWorkspace(root=settings.JOB_STORAGE_DIR).open)
+    try:
+        budget = UploadBudget()
+        source_paths = [await save_temp_file(uploaded, budget, workspace) for uploaded in files]
+    except Exception:
+        await asyncio.to_thread(workspace.close)
+        raise
+    workspace.detach()
+
+    job_id = await job_queue.submit(
+        project_type=project_type,
+        tech_stack=parse_tech_stack(tech_stack),
+        ingest_mode=ingest_mode,
+        storage_dir=workspace.path,
+        file_paths=source_paths,
+        bypass_cache=is_cache_bypass(x_cache_bypass),
+    )
+
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    job = await asyncio.to_thread(job_queue.store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return ORJSONResponse(content=job.to_dict())
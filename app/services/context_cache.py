@@ -0,0 +1,192 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import xxhash
+from cachetools import TTLCache
+from google.genai import errors, types
+
+from app.config.config import settings
+from app.services.resilience import is_retryable
+from app.utils.logger import logger
+from app.utils.metrics import record_cache_lookup
+
+# Prefixes the API refused to cache (e.g. below the model's minimum token count) are not retried for this long
+REJECTED_RETRY_SECONDS = 3600
+# After a transient failure (overload, server error, timeout) creation is retried sooner
+FAILED_RETRY_SECONDS = 60
+
+
+class ContextCacheManager:
+    """
+    Explicit context caching for the static part of a prompt.
+    The static template prefix plus the uploaded documents are stored once as cached content;
+    later calls with the same prefix and documents reference the handle instead of re-sending them.
+    Handles are keyed by model, template hash and document hashes, and their TTL is extended
+    when they are reused past half their lifetime.
+    """
+
+    def __init__(self, caches, model_name: str, ttl_seconds: int | None = None, max_entries: int | None = None):
+        # caches is client.aio.caches (or FakeCacheService in tests)
+        self.caches = caches
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds or settings.CONTEXT_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.CONTEXT_CACHE_MAX_ENTRIES
+        # key -> (cached content name, expires_at epoch seconds), oldest first
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._pending: dict[str, asyncio.Future] = {}
+        self._rejected = TTLCache(maxsize=1024, ttl=REJECTED_RETRY_SECONDS)
+        self._failed = TTLCache(maxsize=1024, ttl=FAILED_RETRY_SECONDS)
+        self._background: set[asyncio.Task] = set()
+
+    def make_key(self, static_prefix: str, document_hashes: list[str], model_name: str | None = None) -> str:
+        hasher = xxhash.xxh3_128()
+        hasher.update((model_name or self.model_name).encode("utf-8"))
+        hasher.update(xxhash.xxh3_128_digest(static_prefix.encode("utf-8")))
+        for digest in document_hashes:
+            hasher.update(digest.encode("utf-8"))
+        return hasher.hexdigest()
+
+    async def get(
+        self, static_prefix: str, uploaded_files: list, document_hashes: list[str], model_name: str | None = None
+    ) -> str | None:
+        """
+        Returns the cached content name for the prefix and documents, creating or refreshing it as needed.
+        Cached content belongs to one model; model_name defaults to the manager's model.
+        Returns None when caching is not possible; callers then send the full request.
+        """
+        model_name = model_name or self.model_name
+        key = self.make_key(static_prefix, document_hashes, model_name)
+        if key in self._rejected or key in self._failed:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            name, expires_at = entry
+            remaining = expires_at - time.time()
+            if remaining > 0:
+                self._entries.move_to_end(key)
+                record_cache_lookup("context", "hit")
+                if remaining < self.ttl_seconds / 2:
+                    await self._refresh(key, name)
+                return self._entries[key][0] if key in self._entries else None
+            self._entries.pop(key)
+
+        pending = self._pending.get(key)
+        if pending is None:
+            record_cache_lookup("context", "miss")
+            pending = asyncio.ensure_future(self._create(key, static_prefix, uploaded_files, model_name))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        return await asyncio.shield(pending)
+
+    async def _create(self, key: str, static_prefix: str, uploaded_files: list, model_name: str) -> str | None:
+        try:
+            cached = await self.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    contents=uploaded_files + [static_prefix],
+                    ttl=f"{self.ttl_seconds}s",
+                    display_name=f"intellitask-{key[:16]}",
+                ),
+            )
+        except Exception as e:
+            if _is_rejection(e):
+                logger.warning("Context cache refused this content; sending full prompts for it: {}", e)
+                self._rejected[key] = True
+            else:
+                logger.warning("Context cache creation failed; retrying in {}s: {}", FAILED_RETRY_SECONDS, e)
+                self._failed[key] = True
+            return None
+
+        logger.info("Created context cache {} ({} files)", cached.name, len(uploaded_files))
+        self._entries[key] = (cached.name, self._expires_at(cached))
+        while len(self._entries) > self.max_entries:
+            _, (name, _) = self._entries.popitem(last=False)
+            self._delete_in_background(name)
+        return cached.name
+
+    async def _refresh(self, key: str, name: str):
+        try:
+            cached = await self.caches.update(
+                name=name, config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+            )
+            self._entries[key] = (name, self._expires_at(cached))
+            logger.debug("Extended context cache {}", name)
+        except Exception as e:
+            # Deleted or expired remotely; the next call recreates it
+            logger.info("Could not extend context cache {}: {}", name, e)
+            self._entries.pop(key, None)
+
+    def _expires_at(self, cached) -> float:
+        if cached.expire_time is not None:
+            return cached.expire_time.timestamp()
+        return time.time() + self.ttl_seconds
+
+    def _delete_in_background(self, name: str):
+        task = asyncio.ensure_future(self._delete_remote(name))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _delete_remote(self, name: str):
+        try:
+            await self.caches.delete(name=name)
+            logger.info("Deleted context cache {}", name)
+        except Exception as e:
+            logger.debug("Could not delete context cache {}: {}", name, e)
+
+
+def _is_rejection(error: BaseException) -> bool:
+    """
+    True when the API refused the content itself (too small, unsupported model), so retrying soon cannot help.
+    """
+    return isinstance(error, errors.ClientError) and not is_retryable(error)
+
+
+class FakeCacheService:
+    """
+    In-process stand-in for client.aio.caches with the same create/update/delete surface.
+    Used to exercise ContextCacheManager without calling the API; min_chars mimics the
+    service's minimum cacheable size, and errors queued in failures are raised by the next creates.
+    """
+
+    def __init__(self, min_chars: int = 0):
+        self.min_chars = min_chars
+        self.store: dict[str, types.CachedContent] = {}
+        self.failures: list[BaseException] = []
+        self.attempts = 0
+        self.created = 0
+        self.updated = 0
+
+    async def create(self, *, model: str, config: types.CreateCachedContentConfig) -> types.CachedContent:
+        self.attempts += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        size = sum(len(part) for part in config.contents if isinstance(part, str))
+        if size < self.min_chars:
+            message = f"Cached content is too small ({size} chars)"
+            raise errors.ClientError(400, {"error": {"code": 400, "message": message, "status": "INVALID_ARGUMENT"}})
+        name = f"cachedContents/{uuid.uuid4().hex}"
+        cached = types.CachedContent(
+            name=name, model=model, display_name=config.display_name, expire_time=self._expiry(config.ttl)
+        )
+        self.store[name] = cached
+        self.created += 1
+        return cached
+
+    async def update(self, *, name: str, config: types.UpdateCachedContentConfig) -> types.CachedContent:
+        if name not in self.store:
+            raise KeyError(name)
+        self.store[name].expire_time = self._expiry(config.ttl)
+        self.updated += 1
+        return self.store[name]
+
+    async def delete(self, *, name: str):
+        self.store.pop(name, None)
+
+    @staticmethod
+    def _expiry(ttl: str) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=float(ttl.rstrip("s")))
@@ -1,50 +1,248 @@
+import asyncio
 from app.config.config import settings
-from app.utils.logger import logger
-from google import genai
+from app.utils.logger import logger, log_payload
+from google.genai import types
 import pathlib
-from app.utils.file_utils import upload_files_to_genai
-from app.utils.ai_utils import log_token_usage
+from app.utils.file_utils import upload_files_to_genai, file_digest
+from app.services.upload_registry import UploadRegistry
+from app.services.context_cache import ContextCacheManager
+from app.services.model_backend import create_backend
+from app.services.model_router import ModelRouter, parse_model_tiers, estimate_input_tokens
+from app.services.resilience import ModelCallPolicy
+from app.services.token_budget import CallTokens, TokenScheduler, PRIORITY_DEFAULT
+from app.utils.ai_utils import log_token_usage, token_usage
+from app.utils.metrics import stage_timer, observe_stage, record_tokens
+import time
 
 
 class GenAIClient:
     def __init__(self):
-        # Initialize with API key directly (required by google-genai)
-        self.client = genai.Client(api_key=settings.GOOGLE_GENAI_API_KEY)
-        self.model_name = "gemini-2.5-flash-lite"  # or whichever model you prefer
+        # genai.Client, or a recording/replaying stand-in with the same surface (GENAI_BACKEND)
+        self.client = create_backend()
+        # Model tiers and hedging of slow calls (GENAI_MODEL_TIERS, GENAI_HEDGE_*)
+        self.router = ModelRouter(parse_model_tiers(settings.GENAI_MODEL_TIERS))
+        self.model_name = self.router.default_model
+        # Adaptive concurrency limit, circuit breaker and retries shared by all model calls
+        self.policy = ModelCallPolicy()
+        # Tokens-per-minute budget shared with the other worker processes
+        self.token_budget = TokenScheduler() if settings.GENAI_TPM_LIMIT > 0 else None
+        self.uploads = UploadRegistry(self.client) if settings.UPLOAD_CACHE_ENABLED else None
+        self.context_cache = (
+            ContextCacheManager(self.client.aio.caches, self.model_name) if settings.CONTEXT_CACHE_ENABLED else None
+        )
+
+    async def choose_model(self, file_paths: list[str], prompt: str, latency_budget: float | None = None) -> str:
+        """
+        Picks the model tier for a request from its estimated input size and optional latency budget (seconds).
+        """
+        return self.router.choose(await estimate_input_tokens(file_paths, prompt), latency_budget)
+
+    async def _build_request(
+        self, file_paths: list[str], uploaded_files: list, prompt: str, static_prefix: str | None, model: str
+    ):
+        """
+        Returns (contents, config) for a generate call.
+        When prompt starts with static_prefix, the files and prefix are served from the context cache
+        and only the rest of the prompt is sent.
+        """
+        if self.context_cache is None or not static_prefix or not prompt.startswith(static_prefix):
+            return uploaded_files + [prompt], None
+
+        with stage_timer("context_cache"):
+            document_hashes = await asyncio.to_thread(lambda: [file_digest(p) for p in file_paths])
+            cache_name = await self.context_cache.get(static_prefix, uploaded_files, document_hashes, model)
+        if cache_name is None:
+            return uploaded_files + [prompt], None
 
-    async def get_task_breakdown(self, file_paths: list[str], prompt: str) -> dict:
+        logger.info(
+            "Using context cache {} for {} prompt chars and {} files", cache_name, len(static_prefix), len(uploaded_files)
+        )
+        return [prompt[len(static_prefix):]], types.GenerateContentConfig(cached_content=cache_name)
+
+    async def get_task_breakdown(
+        self,
+        file_paths: list[str],
+        prompt: str,
+        static_prefix: str | None = None,
+        model: str | None = None,
+        priority: int = PRIORITY_DEFAULT,
+    ) -> dict:
         """
         Sends the prompt to Google GenAI along with up to 5 file uploads and returns both text output and token usage.
+        Uses the SDK's async client so the event loop keeps serving other requests while the model is generating.
+        static_prefix is the template text the prompt starts with; it is context-cached together with the files.
+        model defaults to the first tier (see choose_model); priority orders calls waiting for token budget.
         """
-        logger.info(f"GenAIClient.get_task_breakdown called with {len(file_paths)} files")
-        logger.debug(f"File paths: {file_paths}")
-        logger.info("Uploading files to Google GenAI File API")
+        model = model or self.model_name
+        logger.debug("GenAIClient.get_task_breakdown called with {} files: {}", len(file_paths), file_paths)
 
         # --- Upload files ---
-        uploaded_files = upload_files_to_genai(self.client, file_paths)
+        uploaded_files = await upload_files_to_genai(self.client, file_paths, registry=self.uploads)
 
-        logger.info(f"Uploaded {len(uploaded_files)} files to GenAI")
+        logger.debug("Uploaded {} files to GenAI", len(uploaded_files))
         for uf in uploaded_files:
-            logger.debug(f"Uploaded file: {uf.name} (URI: {uf.uri})")
+            logger.debug("Uploaded file: {} (URI: {})", uf.name, uf.uri)
+
+        logger.debug("Sending prompt to model (Length: {} chars)", len(prompt))
+        contents, config = await self._build_request(file_paths, uploaded_files, prompt, static_prefix, model)
 
-        logger.info(f"Sending prompt to model (Length: {len(prompt)} chars)")
-        
         # --- Generate response ---
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=uploaded_files + [prompt]  # Combine files and prompt
-        )
+        call_tokens = await self._reserve_call(file_paths, prompt, priority)
 
-        usage = {
-            "input_tokens": response.usage_metadata.prompt_token_count,
-            "output_tokens": response.usage_metadata.candidates_token_count,
-            "total_tokens": response.usage_metadata.total_token_count,
-        }
+        async def attempt():
+            # Retries and hedges are billed too, so every attempt holds its own reservation
+            reservation = await self._attempt_tokens(call_tokens)
+            sent = False
+            try:
+                async with self.policy.slot():
+                    sent = True
+                    response = await self.client.aio.models.generate_content(
+                        model=model,
+                        contents=contents,  # Files and prompt, or only the uncached part of the prompt
+                        config=config,
+                    )
+            except BaseException:
+                # An attempt that reached the API (even one cancelled as a hedge loser) keeps its estimate
+                if not sent:
+                    self._release_tokens(reservation)
+                raise
+            await self._settle_tokens(reservation, token_usage(response.usage_metadata))
+            return response
+
+        try:
+            with stage_timer("generate"):
+                response = await self.policy.run(lambda: self.router.call(model, "generate", attempt))
+        finally:
+            self._release_spare(call_tokens)
 
-        logger.info(f"Token usage: {usage}")
-        logger.info(f"RAW AI RESPONSE:\n{response.text}")
+        usage = log_token_usage(response.usage_metadata)
+        record_tokens(usage)
+        log_payload("RAW AI RESPONSE", response.text)
 
         return {
             "text": response.text,
             "usage": usage
-        }
\ No newline at end of file
+        }
+
+    async def stream_task_breakdown(
+        self,
+        file_paths: list[str],
+        prompt: str,
+        static_prefix: str | None = None,
+        model: str | None = None,
+        priority: int = PRIORITY_DEFAULT,
+    ):
+        """
+        Streaming variant of get_task_breakdown.
+        Yields {"text": <chunk>} dicts as the model generates, followed by a final {"usage": {...}}.
+        Hedging and retries apply until the first chunk arrives; once a stream has started it is kept.
+        """
+        model = model or self.model_name
+        logger.debug("GenAIClient.stream_task_breakdown called with {} files", len(file_paths))
+        uploaded_files = await upload_files_to_genai(self.client, file_paths, registry=self.uploads)
+
+        logger.debug("Streaming prompt to model (Length: {} chars)", len(prompt))
+        contents, config = await self._build_request(file_paths, uploaded_files, prompt, static_prefix, model)
+        usage_metadata = None
+        call_tokens = await self._reserve_call(file_paths, prompt, priority)
+
+        async def attempt():
+            # Retries and hedges are billed too, so every attempt holds its own reservation
+            reservation = await self._attempt_tokens(call_tokens)
+            # Holds a concurrency slot from opening the stream until it is finished or discarded
+            try:
+                probe = await self.policy.acquire()
+            except BaseException:
+                self._release_tokens(reservation)
+                raise
+            try:
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=model,
+                    contents=contents,
+                    config=config,
+                )
+                chunks = stream.__aiter__()
+                first = await anext(chunks, None)
+            except BaseException as e:
+                self.policy.release(probe, e)
+                raise
+            if first is None:
+                self.policy.release(probe)
+            return first, chunks, probe, reservation
+
+        async def discard(opened):
+            # The losing stream was billed for what it generated; its reservation keeps the estimate
+            first, chunks, probe, _ = opened
+            if first is not None:
+                await self._close_stream(chunks, probe)
+
+        start = time.perf_counter()
+        try:
+            first, chunks, probe, reservation = await self.policy.run(
+                lambda: self.router.call(model, "first_chunk", attempt, discard=discard)
+            )
+        finally:
+            self._release_spare(call_tokens)
+        observe_stage("first_chunk", time.perf_counter() - start)
+
+        error = None
+        try:
+            chunk = first
+            while chunk is not None:
+                if chunk.usage_metadata is not None:
+                    usage_metadata = chunk.usage_metadata
+                if chunk.text:
+                    yield {"text": chunk.text}
+                chunk = await anext(chunks, None)
+        except BaseException as e:
+            error = e
+            # Tokens were likely consumed, but usage is unknown; keep the estimate
+            raise
+        finally:
+            if first is not None:
+                await self._close_stream(chunks, probe, error)
+        self.router.tracker(model, "generate").observe(time.perf_counter() - start)
+        observe_stage("generate", time.perf_counter() - start)
+
+        if usage_metadata is not None:
+            usage = log_token_usage(usage_metadata)
+            record_tokens(usage)
+            await self._settle_tokens(reservation, usage)
+            yield {"usage": usage}
+        else:
+            yield {"usage": {"input_tokens": None, "output_tokens": None, "total_tokens": None}}
+
+    async def _close_stream(self, chunks, probe: bool, error: BaseException | None = None):
+        try:
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        finally:
+            self.policy.release(probe, error)
+
+    # --- Token budget ---
+
+    async def _reserve_call(self, file_paths: list[str], prompt: str, priority: int) -> CallTokens | None:
+        if self.token_budget is None:
+            return None
+        with stage_timer("token_budget"):
+            return await self.token_budget.reserve_call(await estimate_input_tokens(file_paths, prompt), priority)
+
+    @staticmethod
+    async def _attempt_tokens(call_tokens: CallTokens | None):
+        if call_tokens is None:
+            return None
+        return await call_tokens.take()
+
+    @staticmethod
+    def _release_spare(call_tokens: CallTokens | None):
+        if call_tokens is not None:
+            call_tokens.release_spare()
+
+    async def _settle_tokens(self, reservation, usage: dict):
+        if reservation is not None:
+            await self.token_budget.settle(reservation, usage)
+
+    def _release_tokens(self, reservation):
+        if reservation is not None:
+            self.token_budget.release(reservation)
@@ -1,41 +1,181 @@
+import asyncio
 from app.utils.logger import logger
+from app.config.config import settings
 
 from app.prompts.prompt_taskonly import TASK_TEMPLATE
+from app.prompts.prompt_documents import DOCUMENT_TEXT_TEMPLATE, SECTION_SCOPE_NOTE
 from app.services.genai_client import GenAIClient
-from app.models import ScrumProject, KanbanProject, Project
+from app.services.result_cache import ResultCache
+from app.services.singleflight import SingleFlight
+from app.services.resilience import ModelUnavailableError
+from app.services.token_budget import PRIORITY_DEFAULT, PRIORITY_BATCH
+from app.models import ScrumProject, KanbanProject, Project, ProjectAdapter, Task
+from pydantic import ValidationError
 import json, re
 from app.utils.validation_utils import sanitize_priorities
-from app.utils.other_utils import calculate_total_estimate_hours
-from app.utils.ai_utils import clean_ai_response
+from app.utils.other_utils import calculate_total_estimate_hours, normalize_summary
+from app.utils.ai_utils import clean_ai_response, build_document_section, template_prefix
+from app.utils.file_utils import file_digest
+from app.utils.stream_utils import TaskStreamParser
+from app.utils.section_utils import split_into_sections
+from app.utils.metrics import stage_timer, set_labels
+from app.utils.workspace import RequestWorkspace
+import xxhash
+
+# Instructions before the first per-request placeholder; context-cached across calls
+TASK_STATIC_PREFIX = template_prefix(TASK_TEMPLATE, "{tech_stack}")
 
 
 class GenAIService:
     """
     Service for interacting with Google GenAI to analyze FRS and return structured tasks.
     Includes token usage tracking, sanitization, and auto-truncation for safe schema validation.
+    Validated results are cached by document content and generation settings.
     """
 
     def __init__(self):
         self.client = GenAIClient()
+        self.result_cache = ResultCache() if settings.RESULT_CACHE_ENABLED else None
+        # Identical concurrent analyze requests share one model call
+        self.inflight = SingleFlight() if settings.ANALYZE_COALESCE_ENABLED else None
 
-    async def analyze_frs(self, file_paths: list[str], project_type: str, tech_stack: list[str]) -> dict:
-        
+    def _build_prompt(
+        self,
+        project_type: str,
+        tech_stack: list[str],
+        document_texts: list[str] | None,
+        section_scope: bool = False,
+    ) -> tuple[str, str]:
+        """
+        Returns the rendered prompt and the unrendered template it came from (used for cache keys).
+        section_scope restricts the model to the requirements of a single document section.
+        """
         tech_stack_str = ", ".join(tech_stack) if tech_stack else "Not specified"
 
         # --- Choose prompt ---
         if project_type == "Scrum":
             prompt = TASK_TEMPLATE.replace("{tech_stack}", tech_stack_str)
-            logger.info("Using Scrum prompt for GenAI service.")
+            logger.debug("Using Scrum prompt for GenAI service.")
         elif project_type == "Kanban":
             prompt = TASK_TEMPLATE.replace("{tech_stack}", tech_stack_str)
-            logger.info("Using Kanban prompt for GenAI service.")
+            logger.debug("Using Kanban prompt for GenAI service.")
         else:
-            logger.error(f"Invalid project_type: {project_type}")
+            logger.error("Invalid project_type: {}", project_type)
             raise ValueError("project_type must be 'Scrum' or 'Kanban'.")
 
+        template = TASK_TEMPLATE
+        if document_texts:
+            prompt += build_document_section(document_texts)
+            template += DOCUMENT_TEXT_TEMPLATE
+        if section_scope:
+            prompt += SECTION_SCOPE_NOTE
+            template += SECTION_SCOPE_NOTE
+        return prompt, template
+
+    async def _request_key(
+        self,
+        file_paths: list[str],
+        document_hashes: list[str] | None,
+        project_type: str,
+        tech_stack: list[str],
+        template: str,
+        model: str,
+    ) -> str:
+        """
+        Identifies a generation by document content, settings, prompt template and model.
+        Used as the result cache key and to coalesce identical in-flight requests.
+        """
+        if document_hashes is None:
+            document_hashes = await asyncio.to_thread(lambda: [file_digest(p) for p in file_paths])
+        return ResultCache.make_key(document_hashes, project_type, tech_stack, template, model)
+
+    async def analyze_frs(
+        self,
+        file_paths: list[str],
+        project_type: str,
+        tech_stack: list[str],
+        document_hashes: list[str] | None = None,
+        bypass_cache: bool = False,
+        document_texts: list[str] | None = None,
+        section_scope: bool = False,
+        latency_budget: float | None = None,
+        priority: int = PRIORITY_DEFAULT,
+    ) -> dict:
+        """
+        Generates and validates the task breakdown for the given documents.
+        file_paths are uploaded to the Files API; document_texts are sent inline in the prompt.
+        document_hashes identify the original uploads (before any conversion) for the result cache;
+        they are computed from file_paths when omitted. bypass_cache forces regeneration.
+        latency_budget (seconds) lets the router pick a faster model tier; priority orders the call
+        while it waits for token budget.
+        """
+
+        prompt, template = self._build_prompt(project_type, tech_stack, document_texts, section_scope)
+        model = await self.client.choose_model(file_paths, prompt, latency_budget)
+        set_labels(project_type=project_type, model=model, cache="bypass" if bypass_cache else "miss")
+
+        # --- Result cache lookup ---
+        with stage_timer("result_cache"):
+            request_key = None
+            if self.result_cache is not None or self.inflight is not None:
+                request_key = await self._request_key(
+                    file_paths, document_hashes, project_type, tech_stack, template, model
+                )
+            cache_key = request_key if self.result_cache is not None else None
+            cached = None
+            if cache_key is not None:
+                if bypass_cache:
+                    logger.info("Result cache bypassed; forcing regeneration.")
+                else:
+                    cached = await self.result_cache.get(cache_key)
+        if cached is not None:
+            cached["_meta"]["cache"] = "hit"
+            set_labels(cache="hit")
+            return cached
+
+        # --- Coalesce with an identical request already in flight ---
+        if self.inflight is None:
+            return await self._generate(file_paths, prompt, project_type, model, priority, bypass_cache, cache_key)
+
+        async def own_inputs():
+            # The shared call can outlive the request that started it, and with it that request's
+            # workspace, so it works on its own links to the uploads
+            inputs = await asyncio.to_thread(RequestWorkspace().open)
+            try:
+                owned_paths = await asyncio.to_thread(lambda: [inputs.adopt(p) for p in file_paths])
+            except BaseException:
+                await asyncio.to_thread(inputs.close)
+                raise
+            return owned_paths, inputs.close
+
+        async def generate(paths=file_paths):
+            return await self._generate(paths, prompt, project_type, model, priority, bypass_cache, cache_key)
+
+        result, shared = await self.inflight.do(request_key, generate, prepare=own_inputs if file_paths else None)
+        if shared:
+            logger.info("Joined an identical analyze request already in flight")
+            set_labels(cache="coalesced")
+            result = {**result, "_meta": {**result["_meta"], "cache": "coalesced"}}
+        return result
+
+    async def _generate(
+        self,
+        file_paths: list[str],
+        prompt: str,
+        project_type: str,
+        model: str,
+        priority: int,
+        bypass_cache: bool,
+        cache_key: str | None,
+    ) -> dict:
+        """
+        Calls the model, then validates and caches the result. Runs once per group of coalesced requests.
+        """
         # --- Call GenAI model and unpack token usage ---
         try:
-            response_data = await self.client.get_task_breakdown(file_paths=file_paths, prompt=prompt)
+            response_data = await self.client.get_task_breakdown(
+                file_paths=file_paths, prompt=prompt, static_prefix=TASK_STATIC_PREFIX, model=model, priority=priority
+            )
 
             if isinstance(response_data, dict):
                 response_text = response_data.get("text", "")
@@ -43,48 +183,251 @@ class GenAIService:
             else:
                 response_text = response_data
                 usage = {"input_tokens": None, "output_tokens": None, "total_tokens": None}
-
-            logger.info(f"GenAI response received. Token usage: {usage}")
+        except ModelUnavailableError:
+            # Surfaced as 503 so clients back off instead of retrying immediately
+            raise
         except Exception as e:
-            logger.error(f"GenAI service error: {e}")
+            logger.error("GenAI service error: {}", e)
             raise ValueError("Error while calling GenAI service.")
 
-        # --- Clean and parse AI response ---
+        # --- Clean, parse, sanitize and validate in a single pass ---
         cleaned = clean_ai_response(response_text)
         if not cleaned or not cleaned.startswith("{"):
-            logger.error(f"GenAI returned invalid JSON: {response_text[:200]}...")
+            logger.error("GenAI returned invalid JSON: {}...", response_text[:200])
             raise ValueError("GenAI did not return valid JSON.")
 
+        # Priorities are normalized by model validators and the estimate rollup is computed
+        # during validation, so the response is only walked once.
         try:
-            parsed = json.loads(cleaned)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing failed: {e} | Raw text: {response_text[:300]}")
-            raise ValueError("GenAI returned invalid JSON format.")
-
-        # --- Sanitize + Truncate fields safely ---
-        # parsed = self._sanitize_release_and_sprint_names(parsed)
-        # --- Sanitize priorities before schema validation ---
-        parsed = sanitize_priorities(parsed)
-
-        # --- Schema validation ---
-        try:
-            validated = Project(**parsed) if project_type == "Scrum" else Project(**parsed)
-        except Exception as e:
-            logger.error(f"Schema validation failed for {project_type}: {e}")
+            with stage_timer("validate"):
+                validated = ProjectAdapter.validate_json(cleaned)
+        except ValidationError as e:
+            if any(error["type"] == "json_invalid" for error in e.errors()):
+                logger.error("JSON parsing failed: {} | Raw text: {}", e, response_text[:300])
+                raise ValueError("GenAI returned invalid JSON format.")
+            logger.error("Schema validation failed for {}: {}", project_type, e)
             raise ValueError(f"Invalid structure returned by GenAI for {project_type} project.")
 
-        logger.info(f"{project_type} project validated successfully.")
-
-        # --- Calculate total estimated hours ---
-        total_estimate_hours = calculate_total_estimate_hours(validated.model_dump())
+        logger.debug("{} project validated successfully.", project_type)
 
         # --- Return structured result with token usage ---
         result = validated.model_dump()
         result["_meta"] = {
             "token_usage": usage,
-            "model": self.client.model_name,
+            "model": model,
             "project_type": project_type,
-            "total_estimate_hours": total_estimate_hours
+            "total_estimate_hours": validated.total_estimate_hours,
+            "cache": "bypass" if bypass_cache else "miss",
         }
 
-        return result
\ No newline at end of file
+        if cache_key is not None:
+            await self.result_cache.set(cache_key, result)
+
+        return result
+
+    async def analyze_frs_chunked(
+        self,
+        document_texts: list[str],
+        project_type: str,
+        tech_stack: list[str],
+        bypass_cache: bool = False,
+        latency_budget: float | None = None,
+        allow_partial: bool = False,
+    ) -> dict:
+        """
+        Map-reduce variant of analyze_frs for large documents.
+        Each document is split at its headings into sections of at most CHUNK_MAX_CHARS; sections are
+        analyzed concurrently (at most CHUNK_MAX_CONCURRENCY at a time) and the per-section projects are
+        merged in document order. Tasks whose normalized summaries repeat an earlier task are dropped.
+        Each section is cached on its own, so editing one section only regenerates that section.
+        If any section fails the whole call fails (a retry only regenerates the failed sections), unless
+        allow_partial is set; the merged result then lists the missing sections in _meta.failed_sections.
+        """
+        sections = [
+            section
+            for text in document_texts
+            for section in split_into_sections(text, settings.CHUNK_MAX_CHARS, settings.CHUNK_MIN_CHARS)
+        ]
+        if not sections:
+            raise ValueError("No document text to analyze.")
+        logger.info("Chunked analysis: {} documents split into {} sections", len(document_texts), len(sections))
+
+        semaphore = asyncio.Semaphore(settings.CHUNK_MAX_CONCURRENCY)
+
+        async def analyze_section(index: int, section: str) -> dict:
+            async with semaphore:
+                logger.debug("Analyzing section {}/{} ({} chars)", index + 1, len(sections), len(section))
+                return await self.analyze_frs(
+                    [],
+                    project_type=project_type,
+                    tech_stack=tech_stack,
+                    document_hashes=[xxhash.xxh3_128_hexdigest(section.encode("utf-8"))],
+                    bypass_cache=bypass_cache,
+                    document_texts=[section],
+                    section_scope=True,
+                    latency_budget=latency_budget,
+                    # Many section calls per request; let single-call requests go first
+                    priority=PRIORITY_BATCH,
+                )
+
+        results = await asyncio.gather(
+            *(analyze_section(i, section) for i, section in enumerate(sections)),
+            return_exceptions=True,
+        )
+
+        failed = [(index + 1, result) for index, result in enumerate(results) if isinstance(result, BaseException)]
+        for number, error in failed:
+            logger.error("Section {} failed: {}", number, error)
+        if failed and (not allow_partial or len(failed) == len(sections)):
+            set_labels(cache="chunked")
+            unavailable = [error for _, error in failed if isinstance(error, ModelUnavailableError)]
+            if unavailable:
+                raise unavailable[0]
+            raise ValueError(f"Error while calling GenAI service for {len(failed)} of {len(sections)} sections.")
+
+        # --- Merge section results in document order ---
+        project_name = None
+        tasks = []
+        seen_summaries = set()
+        duplicates = 0
+        failed_sections = [number for number, _ in failed]
+        cache_states = {}
+        models = set()
+        usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                continue
+
+            meta = result["_meta"]
+            cache_states[meta["cache"]] = cache_states.get(meta["cache"], 0) + 1
+            models.add(meta["model"])
+            for key in usage:
+                usage[key] += meta["token_usage"].get(key) or 0
+
+            project_name = project_name or result["project_name"]
+            for task in result["tasks"]:
+                summary_key = normalize_summary(task["summary"])
+                if summary_key in seen_summaries:
+                    duplicates += 1
+                    continue
+                seen_summaries.add(summary_key)
+                tasks.append(task)
+
+        set_labels(cache="chunked")
+        merged = Project.model_validate({"project_name": project_name, "tasks": tasks})
+        logger.info(
+            "Chunked analysis merged {} tasks from {} sections ({} duplicates removed, {} sections failed)",
+            len(tasks), len(sections), duplicates, len(failed_sections),
+        )
+
+        result = merged.model_dump()
+        result["_meta"] = {
+            "token_usage": usage,
+            "model": ",".join(sorted(models)),
+            "project_type": project_type,
+            "total_estimate_hours": merged.total_estimate_hours,
+            "cache": cache_states,
+            "sections": len(sections),
+            "duplicates_removed": duplicates,
+            "failed_sections": failed_sections,
+        }
+        return result
+
+    async def stream_analyze_frs(
+        self,
+        file_paths: list[str],
+        project_type: str,
+        tech_stack: list[str],
+        document_hashes: list[str] | None = None,
+        bypass_cache: bool = False,
+        document_texts: list[str] | None = None,
+        latency_budget: float | None = None,
+    ):
+        """
+        Streaming variant of analyze_frs. Yields events:
+        - {"type": "task", "task": {...}} for each task, sanitized and validated as soon as the model closes it
+        - {"type": "meta", "project_name": ..., "_meta": {...}} once generation finishes
+        - {"type": "error", "detail": ...} if generation fails
+        """
+        prompt, template = self._build_prompt(project_type, tech_stack, document_texts)
+        model = await self.client.choose_model(file_paths, prompt, latency_budget)
+        set_labels(project_type=project_type, model=model, cache="bypass" if bypass_cache else "miss")
+
+        with stage_timer("result_cache"):
+            cache_key = None
+            if self.result_cache is not None:
+                cache_key = await self._request_key(
+                    file_paths, document_hashes, project_type, tech_stack, template, model
+                )
+            cached = None
+            if cache_key is not None and not bypass_cache:
+                cached = await self.result_cache.get(cache_key)
+        if cached is not None:
+            set_labels(cache="hit")
+            meta = cached.pop("_meta")
+            meta["cache"] = "hit"
+            for task in cached["tasks"]:
+                yield {"type": "task", "task": task}
+            yield {"type": "meta", "project_name": cached["project_name"], "_meta": meta}
+            return
+
+        parser = TaskStreamParser()
+        tasks = []
+        skipped = 0
+        usage = {"input_tokens": None, "output_tokens": None, "total_tokens": None}
+
+        try:
+            async for chunk in self.client.stream_task_breakdown(
+                file_paths=file_paths, prompt=prompt, static_prefix=TASK_STATIC_PREFIX, model=model
+            ):
+                if "usage" in chunk:
+                    usage = chunk["usage"]
+                    continue
+                for raw_task in parser.feed(chunk["text"]):
+                    task = self._validate_streamed_task(raw_task)
+                    if task is None:
+                        skipped += 1
+                        continue
+                    tasks.append(task)
+                    yield {"type": "task", "task": task}
+        except ModelUnavailableError as e:
+            logger.error("GenAI streaming error: {}", e)
+            yield {"type": "error", "detail": str(e), "status": 503, "retry_after": round(e.retry_after)}
+            return
+        except Exception as e:
+            logger.error("GenAI streaming error: {}", e)
+            yield {"type": "error", "detail": "Error while calling GenAI service."}
+            return
+
+        # --- Validate the complete document for project_name and the result cache ---
+        project_name = None
+        try:
+            parsed = json.loads(clean_ai_response(parser.text))
+            project_name = parsed.get("project_name")
+        except Exception as e:
+            logger.warning("Streamed response is not a complete JSON document: {}", e)
+
+        meta = {
+            "token_usage": usage,
+            "model": model,
+            "project_type": project_type,
+            "total_estimate_hours": calculate_total_estimate_hours({"tasks": tasks}),
+            "cache": "bypass" if bypass_cache else "miss",
+            "skipped_tasks": skipped,
+        }
+        yield {"type": "meta", "project_name": project_name, "_meta": meta}
+
+        if cache_key is not None and project_name is not None and skipped == 0:
+            result = Project(project_name=project_name, tasks=tasks).model_dump()
+            result["_meta"] = {key: value for key, value in meta.items() if key != "skipped_tasks"}
+            await self.result_cache.set(cache_key, result)
+
+    @staticmethod
+    def _validate_streamed_task(raw_task: dict) -> dict | None:
+        try:
+            sanitized = sanitize_priorities({"tasks": [raw_task]})["tasks"][0]
+            return Task.model_validate(sanitized).model_dump()
+        except Exception as e:
+            logger.warning("Streamed task failed validation: {}", e)
+            return None
@@ -0,0 +1,107 @@
+import asyncio
+import shutil
+import time
+
+from app.config.config import settings
+from app.services.job_store import JobStore
+from app.services.resilience import ModelUnavailableError
+from app.services.token_budget import PRIORITY_BATCH
+from app.utils.file_utils import file_digest, prepare_documents
+from app.utils.logger import logger
+from app.utils.metrics import start_context, observe_stage
+
+
+class JobQueue:
+    """
+    Pool of background workers that run queued analyze jobs.
+    Jobs are persisted in the JobStore, so queued and interrupted jobs survive restarts.
+    Submitting a job wakes a local worker immediately; workers also poll the database
+    so jobs enqueued by other processes are picked up.
+    """
+
+    def __init__(self, service, store: JobStore | None = None, workers: int | None = None):
+        self.service = service
+        self.store = store or JobStore()
+        self.num_workers = workers or settings.JOB_WORKERS
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self):
+        await asyncio.to_thread(self.store.requeue_stale, settings.JOB_STALE_SECONDS, settings.JOB_MAX_ATTEMPTS)
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        logger.info(f"Started {self.num_workers} job workers")
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, **job_fields) -> str:
+        job_id = await asyncio.to_thread(self.store.create, **job_fields)
+        self._wakeup.set()
+        logger.info(f"Queued analyze job {job_id}")
+        return job_id
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next)
+            except Exception as e:
+                logger.error(f"Job worker {index} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    await asyncio.to_thread(
+                        self.store.requeue_stale, settings.JOB_STALE_SECONDS, settings.JOB_MAX_ATTEMPTS
+                    )
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job):
+        logger.info(f"Running analyze job {job.id} (attempt {job.attempts})")
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        # Jobs run outside any HTTP request, so they get their own metrics context
+        metrics = start_context("job:analyze")
+        start = time.perf_counter()
+        try:
+            temp_files, document_texts = await prepare_documents(job.file_paths, job.ingest_mode)
+            result = await self.service.analyze_frs(
+                temp_files,
+                project_type=job.project_type,
+                tech_stack=job.tech_stack,
+                document_hashes=await asyncio.to_thread(lambda: [file_digest(p) for p in job.file_paths]),
+                bypass_cache=bool(job.bypass_cache),
+                document_texts=document_texts,
+                priority=PRIORITY_BATCH,
+            )
+            await asyncio.to_thread(self.store.mark_succeeded, job.id, result)
+            logger.info(f"Analyze job {job.id} succeeded")
+        except asyncio.CancelledError:
+            # Shutdown: leave the job running so it is requeued once its heartbeat goes stale
+            raise
+        except ModelUnavailableError as e:
+            # Overload or an open circuit: the job is fine, so retry it once the model is expected back
+            logger.warning(f"Analyze job {job.id} deferred for {e.retry_after:.0f}s: {e}")
+            await asyncio.to_thread(self.store.retry_later, job.id, e.retry_after)
+            return
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e) or "Job failed."
+            logger.error(f"Analyze job {job.id} failed: {detail}")
+            await asyncio.to_thread(self.store.mark_failed, job.id, detail)
+        finally:
+            heartbeat.cancel()
+            observe_stage("total", time.perf_counter() - start)
+            metrics.flush()
+
+        await asyncio.to_thread(shutil.rmtree, job.storage_dir, True)
+
+    async def _heartbeat(self, job_id: str):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            await asyncio.to_thread(self.store.heartbeat, job_id)
@@ -0,0 +1,218 @@
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import JSON, DateTime, Integer, String, Text, create_engine, inspect, or_, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from app.config.config import settings
+from app.utils.logger import logger
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    status: Mapped[str] = mapped_column(String(16), index=True)
+    project_type: Mapped[str] = mapped_column(String(16))
+    tech_stack: Mapped[list] = mapped_column(JSON, default=list)
+    ingest_mode: Mapped[str] = mapped_column(String(8))
+    bypass_cache: Mapped[int] = mapped_column(Integer, default=0)
+    storage_dir: Mapped[str] = mapped_column(Text)
+    file_paths: Mapped[list] = mapped_column(JSON, default=list)
+    result: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    # Queued jobs are not claimed before this time (set when a job is retried later)
+    not_before: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=_utcnow, index=True)
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "project_type": self.project_type,
+            "created_at": self.created_at.isoformat() + "Z",
+            "updated_at": self.updated_at.isoformat() + "Z",
+        }
+        if self.status == JOB_SUCCEEDED:
+            data["result"] = self.result
+        if self.status == JOB_FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobStore:
+    """
+    SQLite-backed persistence for analyze jobs. The table doubles as the work queue:
+    workers claim queued jobs with an atomic conditional UPDATE, so several processes
+    can share one database without running a job twice.
+    All methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, db_path: str | None = None):
+        db_path = db_path or settings.JOB_DB_PATH
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.engine = create_engine(
+            f"sqlite:///{db_path}",
+            connect_args={"check_same_thread": False, "timeout": 30},
+        )
+        Base.metadata.create_all(self.engine)
+        self._add_missing_columns()
+
+    def _add_missing_columns(self):
+        # create_all does not alter existing tables; databases from before not_before get it added in place
+        if "not_before" in {column["name"] for column in inspect(self.engine).get_columns("jobs")}:
+            return
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(text("ALTER TABLE jobs ADD COLUMN not_before DATETIME"))
+        except OperationalError as e:
+            # Another process added it first
+            logger.debug(f"Could not add jobs.not_before: {e}")
+
+    def create(
+        self,
+        project_type: str,
+        tech_stack: list[str],
+        ingest_mode: str,
+        storage_dir: str,
+        file_paths: list[str],
+        bypass_cache: bool = False,
+    ) -> str:
+        job_id = uuid.uuid4().hex
+        with Session(self.engine) as session:
+            session.add(Job(
+                id=job_id,
+                status=JOB_QUEUED,
+                project_type=project_type,
+                tech_stack=tech_stack,
+                ingest_mode=ingest_mode,
+                bypass_cache=int(bypass_cache),
+                storage_dir=storage_dir,
+                file_paths=file_paths,
+            ))
+            session.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Job | None:
+        with Session(self.engine, expire_on_commit=False) as session:
+            return session.get(Job, job_id)
+
+    def claim_next(self) -> Job | None:
+        """
+        Atomically moves the oldest queued job to running and returns it, or None if no job is due.
+        """
+        with Session(self.engine, expire_on_commit=False) as session:
+            while True:
+                job_id = session.scalars(
+                    select(Job.id)
+                    .where(Job.status == JOB_QUEUED, or_(Job.not_before.is_(None), Job.not_before <= _utcnow()))
+                    .order_by(Job.created_at)
+                    .limit(1)
+                ).first()
+                if job_id is None:
+                    return None
+
+                claimed = session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JOB_QUEUED)
+                    .values(status=JOB_RUNNING, attempts=Job.attempts + 1, updated_at=_utcnow())
+                ).rowcount
+                session.commit()
+                if claimed:
+                    return session.get(Job, job_id)
+                # Another worker claimed it first; try the next one
+
+    def mark_succeeded(self, job_id: str, result: dict):
+        self._finish(job_id, JOB_SUCCEEDED, result=result)
+
+    def mark_failed(self, job_id: str, error: str):
+        self._finish(job_id, JOB_FAILED, error=error)
+
+    def retry_later(self, job_id: str, delay_seconds: float):
+        """
+        Returns a running job to the queue, to be claimed again after delay_seconds.
+        The attempt does not count towards max_attempts: the job never got to run.
+        """
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == JOB_RUNNING)
+                .values(
+                    status=JOB_QUEUED,
+                    attempts=Job.attempts - 1,
+                    not_before=_utcnow() + timedelta(seconds=delay_seconds),
+                    updated_at=_utcnow(),
+                )
+            )
+            session.commit()
+
+    def _finish(self, job_id: str, status: str, result: dict | None = None, error: str | None = None):
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(status=status, result=result, error=error, updated_at=_utcnow())
+            )
+            session.commit()
+
+    def heartbeat(self, job_id: str):
+        """
+        Marks a running job as still alive so requeue_stale leaves it alone.
+        """
+        with Session(self.engine) as session:
+            session.execute(
+                update(Job).where(Job.id == job_id, Job.status == JOB_RUNNING).values(updated_at=_utcnow())
+            )
+            session.commit()
+
+    def requeue_stale(self, stale_seconds: int, max_attempts: int) -> int:
+        """
+        Returns running jobs whose worker stopped heartbeating (crash or restart) to the queue.
+        Jobs that already used max_attempts are failed instead of retried forever, and their uploads removed.
+        """
+        cutoff = _utcnow() - timedelta(seconds=stale_seconds)
+        failed_dirs = []
+        with Session(self.engine) as session:
+            exhausted = session.execute(
+                select(Job.id, Job.storage_dir)
+                .where(Job.status == JOB_RUNNING, Job.updated_at < cutoff, Job.attempts >= max_attempts)
+            ).all()
+            for job_id, storage_dir in exhausted:
+                # Conditional per job, so a directory is only removed by the process that failed the job
+                if session.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == JOB_RUNNING, Job.updated_at < cutoff)
+                    .values(status=JOB_FAILED, error="Job was interrupted too many times.", updated_at=_utcnow())
+                ).rowcount:
+                    failed_dirs.append(storage_dir)
+            count = session.execute(
+                update(Job)
+                .where(Job.status == JOB_RUNNING, Job.updated_at < cutoff)
+                .values(status=JOB_QUEUED, updated_at=_utcnow())
+            ).rowcount
+            session.commit()
+        for storage_dir in failed_dirs:
+            shutil.rmtree(storage_dir, ignore_errors=True)
+        if failed_dirs:
+            logger.warning(f"Failed {len(failed_dirs)} jobs that were interrupted too many times")
+        if count:
+            logger.info(f"Requeued {count} stale jobs")
+        return count
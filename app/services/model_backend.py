@@ -0,0 +1,343 @@
+import asyncio
+import glob
+import math
+import mimetypes
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import orjson
+import xxhash
+from google import genai
+from google.genai import types
+
+from app.config.config import settings
+from app.services.context_cache import FakeCacheService
+from app.utils.encoding_utils import estimate_tokens
+from app.utils.file_utils import file_digest
+from app.utils.logger import logger
+
+BACKEND_MODES = ("live", "record", "replay")
+# Recordings are grouped by the start of the prompt (the template) for non-strict replay
+TEMPLATE_KEY_CHARS = 200
+# Streams recorded without chunk boundaries are replayed in pieces of this size
+REPLAY_CHUNK_CHARS = 400
+REPLAY_FILE_TTL_SECONDS = 48 * 3600
+
+
+def create_backend():
+    """
+    Returns the object GenAIClient talks to. It exposes the SDK's client.aio surface
+    (models, files, caches), so callers cannot tell a live client from a recording or a replay.
+    """
+    mode = settings.GENAI_BACKEND
+    if mode not in BACKEND_MODES:
+        raise ValueError(f"Invalid GENAI_BACKEND '{mode}'. Must be one of {', '.join(BACKEND_MODES)}.")
+
+    if mode == "replay":
+        cassette = Cassette(settings.GENAI_CASSETTE_DIR)
+        logger.info(f"Replaying {len(cassette.entries)} recorded model calls from {cassette.path}")
+        return ReplayBackend(cassette)
+
+    client = genai.Client(api_key=settings.GOOGLE_GENAI_API_KEY)
+    if mode == "record":
+        logger.info(f"Recording model calls to {settings.GENAI_CASSETTE_DIR}")
+        return RecordingBackend(client, Cassette(settings.GENAI_CASSETTE_DIR))
+    return client
+
+
+# --- Cassettes ---
+
+class Cassette:
+    """
+    Directory of recorded model calls, one JSON file per request key. Each entry holds the prompt,
+    the digests of the attached files, the response text (and stream chunks), token usage and latency.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        # template key -> request keys, for non-strict replay
+        self.templates: dict[str, list[str]] = {}
+        for entry_path in sorted(glob.glob(os.path.join(path, "*.json"))):
+            with open(entry_path, "rb") as f:
+                self._add(orjson.loads(f.read()))
+
+    def _add(self, entry: dict):
+        if entry["key"] not in self.entries:
+            self.templates.setdefault(entry["template"], []).append(entry["key"])
+        self.entries[entry["key"]] = entry
+
+    def save(self, entry: dict):
+        """
+        Writes an entry atomically (blocking; call via asyncio.to_thread).
+        """
+        os.makedirs(self.path, exist_ok=True)
+        final_path = os.path.join(self.path, f"{entry['key']}.json")
+        temp_path = f"{final_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(orjson.dumps(entry, option=orjson.OPT_INDENT_2))
+        os.replace(temp_path, final_path)
+        self._add(entry)
+
+    def find(self, key: str, template: str, strict: bool) -> tuple[dict, bool]:
+        """
+        Returns (entry, exact). Without an exact match, non-strict lookups fall back to a recording
+        of the same template (or any recording), chosen deterministically from the key.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            return entry, True
+        if strict or not self.entries:
+            raise ValueError(f"No recorded model response for request {key} in {self.path}")
+        candidates = self.templates.get(template) or list(self.entries)
+        return self.entries[candidates[int(key[:8], 16) % len(candidates)]], False
+
+
+class RequestFingerprints:
+    """
+    Maps requests to stable cassette keys. Remote file and cached-content names differ between runs,
+    so they are replaced by the digests of what they contain.
+    """
+
+    def __init__(self):
+        self.files: dict[str, str] = {}
+        # cached content name -> (key of its contents, its prompt text)
+        self.caches: dict[str, tuple[str, str]] = {}
+
+    def describe(self, model: str, contents: list, config=None) -> dict:
+        parts, texts, files = [], [], []
+        cached_name = getattr(config, "cached_content", None)
+        if cached_name:
+            cached_key, cached_text = self.caches.get(cached_name, (cached_name, ""))
+            parts.append(f"cache:{cached_key}")
+            texts.append(cached_text)
+        for part in contents:
+            if isinstance(part, str):
+                parts.append(part)
+                texts.append(part)
+            else:
+                name = getattr(part, "name", None)
+                digest = self.files.get(name, name)
+                parts.append(f"file:{digest}")
+                files.append(digest)
+
+        hasher = xxhash.xxh3_128()
+        hasher.update(model.encode("utf-8"))
+        for part in parts:
+            hasher.update(b"\0")
+            hasher.update(part.encode("utf-8"))
+        prompt = "".join(texts)
+        return {
+            "key": hasher.hexdigest(),
+            "template": xxhash.xxh3_64_hexdigest(prompt[:TEMPLATE_KEY_CHARS].encode("utf-8")),
+            "prompt": prompt,
+            "files": files,
+        }
+
+
+class TrackedCaches:
+    """
+    Wraps client.aio.caches (or FakeCacheService) and remembers what each cached content holds.
+    """
+
+    def __init__(self, caches, fingerprints: RequestFingerprints):
+        self.caches = caches
+        self.fingerprints = fingerprints
+
+    async def create(self, *, model: str, config: types.CreateCachedContentConfig):
+        cached = await self.caches.create(model=model, config=config)
+        request = self.fingerprints.describe(model, list(config.contents))
+        self.fingerprints.caches[cached.name] = (request["key"], request["prompt"])
+        return cached
+
+    async def update(self, *, name: str, config: types.UpdateCachedContentConfig):
+        return await self.caches.update(name=name, config=config)
+
+    async def delete(self, *, name: str):
+        self.fingerprints.caches.pop(name, None)
+        return await self.caches.delete(name=name)
+
+
+def _usage(response_usage) -> dict:
+    return {
+        "input_tokens": response_usage.prompt_token_count,
+        "output_tokens": response_usage.candidates_token_count,
+        "total_tokens": response_usage.total_token_count,
+        "cached_tokens": response_usage.cached_content_token_count,
+    } if response_usage is not None else {}
+
+
+# --- Record ---
+
+class RecordingBackend:
+    """
+    Live client that also saves every generate call (prompt, file digests, response, usage and
+    latency) to a cassette for later replay.
+    """
+
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+        self.fingerprints = RequestFingerprints()
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(
+                generate_content=self.generate_content, generate_content_stream=self.generate_content_stream
+            ),
+            files=SimpleNamespace(upload=self.upload, delete=client.aio.files.delete),
+            caches=TrackedCaches(client.aio.caches, self.fingerprints),
+        )
+
+    async def upload(self, *, file, **kwargs):
+        remote_file = await self.client.aio.files.upload(file=file, **kwargs)
+        self.fingerprints.files[remote_file.name] = await asyncio.to_thread(file_digest, str(file))
+        return remote_file
+
+    async def generate_content(self, *, model: str, contents: list, config=None):
+        start = time.perf_counter()
+        response = await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+        latency = time.perf_counter() - start
+        await self._save(model, contents, config, response.text, None, _usage(response.usage_metadata), latency, None)
+        return response
+
+    async def generate_content_stream(self, *, model: str, contents: list, config=None):
+        start = time.perf_counter()
+        stream = await self.client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+        return self._record_stream(stream, start, model, contents, config)
+
+    async def _record_stream(self, stream, start: float, model: str, contents: list, config):
+        chunks, usage_metadata, first_chunk = [], None, None
+        async for chunk in stream:
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            if chunk.usage_metadata is not None:
+                usage_metadata = chunk.usage_metadata
+            if chunk.text:
+                chunks.append(chunk.text)
+            yield chunk
+        latency = time.perf_counter() - start
+        await self._save(model, contents, config, "".join(chunks), chunks, _usage(usage_metadata), latency, first_chunk)
+
+    async def _save(self, model, contents, config, text, chunks, usage, latency, first_chunk):
+        entry = self.fingerprints.describe(model, contents, config)
+        entry.update({
+            "model": model,
+            "text": text,
+            "chunks": chunks,
+            "usage": usage,
+            "latency_seconds": round(latency, 4),
+            "first_chunk_seconds": round(first_chunk, 4) if first_chunk is not None else None,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+        })
+        try:
+            await asyncio.to_thread(self.cassette.save, entry)
+            logger.info(f"Recorded model call {entry['key']} ({latency:.2f}s)")
+        except OSError as e:
+            # Recording is best effort; the live response is still returned
+            logger.warning(f"Could not record model call {entry['key']}: {e}")
+
+
+# --- Replay ---
+
+class ReplayBackend:
+    """
+    Offline stand-in for the SDK client that answers from a cassette. Latency is sampled from a
+    lognormal distribution around the recorded latency (GENAI_REPLAY_LATENCY_SCALE,
+    GENAI_REPLAY_LATENCY_SIGMA) and token counts come from the recording, with input tokens
+    adjusted for prompts that differ from the recorded one.
+    """
+
+    def __init__(self, cassette: Cassette, latency_scale: float | None = None, latency_sigma: float | None = None, strict: bool | None = None):
+        self.cassette = cassette
+        self.latency_scale = settings.GENAI_REPLAY_LATENCY_SCALE if latency_scale is None else latency_scale
+        self.latency_sigma = settings.GENAI_REPLAY_LATENCY_SIGMA if latency_sigma is None else latency_sigma
+        self.strict = settings.GENAI_REPLAY_STRICT if strict is None else strict
+        self.fingerprints = RequestFingerprints()
+        self.aio = SimpleNamespace(
+            models=SimpleNamespace(
+                generate_content=self.generate_content, generate_content_stream=self.generate_content_stream
+            ),
+            files=SimpleNamespace(upload=self.upload, delete=self.delete),
+            caches=TrackedCaches(FakeCacheService(), self.fingerprints),
+        )
+        self.exact = 0
+        self.fallbacks = 0
+
+    async def upload(self, *, file, **kwargs):
+        digest = await asyncio.to_thread(file_digest, str(file))
+        remote_file = types.File(
+            name=f"files/{digest}",
+            uri=f"replay://files/{digest}",
+            mime_type=mimetypes.guess_type(str(file))[0],
+            state=types.FileState.ACTIVE,
+            expiration_time=datetime.now(timezone.utc) + timedelta(seconds=REPLAY_FILE_TTL_SECONDS),
+        )
+        self.fingerprints.files[remote_file.name] = digest
+        return remote_file
+
+    async def delete(self, *, name: str, **kwargs):
+        self.fingerprints.files.pop(name, None)
+
+    def _lookup(self, model: str, contents: list, config) -> tuple[dict, dict]:
+        request = self.fingerprints.describe(model, contents, config)
+        entry, exact = self.cassette.find(request["key"], request["template"], self.strict)
+        usage = dict(entry["usage"])
+        if exact:
+            self.exact += 1
+        else:
+            self.fallbacks += 1
+            logger.debug("Replaying recording {} for unrecorded request {}", entry["key"], request["key"])
+            # Keep the recorded file and overhead tokens, adjust for the difference in prompt text
+            prompt_delta = estimate_tokens(request["prompt"]) - estimate_tokens(entry["prompt"])
+            usage["input_tokens"] = max((usage.get("input_tokens") or 0) + prompt_delta, 0)
+            usage["total_tokens"] = usage["input_tokens"] + (usage.get("output_tokens") or 0)
+        return entry, usage
+
+    def sample_latency(self, recorded_seconds: float) -> float:
+        if self.latency_scale <= 0 or recorded_seconds <= 0:
+            return 0.0
+        median = recorded_seconds * self.latency_scale
+        if self.latency_sigma <= 0:
+            return median
+        return random.lognormvariate(math.log(median), self.latency_sigma)
+
+    async def generate_content(self, *, model: str, contents: list, config=None):
+        entry, usage = self._lookup(model, contents, config)
+        await asyncio.sleep(self.sample_latency(entry["latency_seconds"]))
+        return _response(entry["text"], usage)
+
+    async def generate_content_stream(self, *, model: str, contents: list, config=None):
+        entry, usage = self._lookup(model, contents, config)
+        return self._stream(entry, usage)
+
+    async def _stream(self, entry: dict, usage: dict):
+        text = entry["text"]
+        chunks = entry.get("chunks") or [
+            text[i:i + REPLAY_CHUNK_CHARS] for i in range(0, len(text), REPLAY_CHUNK_CHARS)
+        ] or [""]
+        latency = self.sample_latency(entry["latency_seconds"])
+        # Keep the recorded time-to-first-chunk share of the total latency
+        first_share = (entry.get("first_chunk_seconds") or 0) / entry["latency_seconds"] if entry["latency_seconds"] else 0
+        await asyncio.sleep(latency * first_share)
+        interval = latency * (1 - first_share) / max(len(chunks) - 1, 1)
+        for index, chunk in enumerate(chunks):
+            if index:
+                await asyncio.sleep(interval)
+            yield _response(chunk, usage if index == len(chunks) - 1 else None)
+
+
+def _response(text: str, usage: dict | None) -> types.GenerateContentResponse:
+    usage_metadata = None
+    if usage:
+        usage_metadata = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=usage.get("input_tokens"),
+            candidates_token_count=usage.get("output_tokens"),
+            total_token_count=usage.get("total_tokens"),
+            cached_content_token_count=usage.get("cached_tokens"),
+        )
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text=text)]))],
+        usage_metadata=usage_metadata,
+    )
@@ -0,0 +1,201 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+
+from app.config.config import settings
+from app.utils.encoding_utils import estimate_tokens
+from app.utils.extraction_pool import extraction_pool, ExtractionError
+from app.utils.file_utils import file_digest
+from app.utils.logger import logger
+from app.utils.metrics import record_hedge
+
+# Uploaded PDFs are billed per page (each page counts as an image), not per byte
+PDF_TOKENS_PER_PAGE = 258
+# Fallback for files whose pages cannot be counted: a rough bytes-per-token average
+FILE_BYTES_PER_TOKEN = 200
+
+
+def parse_model_tiers(value: str) -> list[tuple[str, float]]:
+    """
+    Parses "model:max_input_tokens,...,model" into [(model, max_input_tokens)], fastest tier first.
+    A tier without a limit (normally the last) accepts any size.
+    """
+    tiers = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, limit = item.partition(":")
+        tiers.append((model.strip(), float(limit) if limit else math.inf))
+    if not tiers:
+        raise ValueError("GENAI_MODEL_TIERS must name at least one model.")
+    return tiers
+
+
+async def estimate_input_tokens(file_paths: list[str], prompt: str) -> int:
+    """
+    Estimates a request's input tokens before it is sent. PDF pages are counted in the extraction
+    pool (and cached by document digest), so repeated estimates for a document are cheap.
+    """
+    file_tokens = await asyncio.gather(*(_estimate_file_tokens(path) for path in file_paths))
+    return estimate_tokens(prompt) + sum(file_tokens)
+
+
+async def _estimate_file_tokens(file_path: str) -> int:
+    if file_path.endswith(".pdf"):
+        try:
+            digest = await asyncio.to_thread(file_digest, file_path)
+            return await extraction_pool.page_count(file_path, digest) * PDF_TOKENS_PER_PAGE
+        except ExtractionError as e:
+            logger.debug("Could not count pages of {}; estimating from its size: {}", file_path, e)
+    return os.path.getsize(file_path) // FILE_BYTES_PER_TOKEN
+
+
+class LatencyTracker:
+    """
+    Rolling window of observed call latencies for one model and call kind.
+    """
+
+    def __init__(self, window: int, min_samples: int):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction: float) -> float | None:
+        """
+        The given percentile of recent latencies, or None until min_samples have been observed.
+        """
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+class ModelRouter:
+    """
+    Chooses the model for a call and hedges slow calls.
+    - Tiering: the first tier whose size limit fits the estimated input is chosen; with a latency
+      budget it steps down to faster tiers while the chosen tier's recent p90 exceeds the budget.
+    - Hedging: when a call has not finished by the learned GENAI_HEDGE_PERCENTILE of its recent
+      latencies, a duplicate is issued; the first result wins and the other call is cancelled.
+      Hedges are capped at GENAI_HEDGE_MAX_RATIO of calls so a slow backend is not flooded.
+    """
+
+    BUDGET_PERCENTILE = 0.9
+
+    def __init__(
+        self,
+        tiers: list[tuple[str, float]],
+        hedge_enabled: bool | None = None,
+        hedge_percentile: float | None = None,
+        hedge_max_ratio: float | None = None,
+        window: int | None = None,
+        min_samples: int | None = None,
+    ):
+        self.tiers = tiers
+        self.hedge_enabled = settings.GENAI_HEDGE_ENABLED if hedge_enabled is None else hedge_enabled
+        self.hedge_percentile = settings.GENAI_HEDGE_PERCENTILE if hedge_percentile is None else hedge_percentile
+        self.hedge_max_ratio = settings.GENAI_HEDGE_MAX_RATIO if hedge_max_ratio is None else hedge_max_ratio
+        self.window = window or settings.GENAI_LATENCY_WINDOW
+        self.min_samples = min_samples or settings.GENAI_LATENCY_MIN_SAMPLES
+        # (model, kind) -> LatencyTracker; kind is "generate" or "first_chunk"
+        self.trackers: dict[tuple[str, str], LatencyTracker] = {}
+        self.calls = 0
+        self.hedges = 0
+
+    @property
+    def default_model(self) -> str:
+        return self.tiers[0][0]
+
+    def tracker(self, model: str, kind: str) -> LatencyTracker:
+        key = (model, kind)
+        if key not in self.trackers:
+            self.trackers[key] = LatencyTracker(self.window, self.min_samples)
+        return self.trackers[key]
+
+    def choose(self, input_tokens: int, latency_budget: float | None = None) -> str:
+        index = next(
+            (i for i, (_, max_tokens) in enumerate(self.tiers) if input_tokens <= max_tokens), len(self.tiers) - 1
+        )
+        if latency_budget:
+            while index > 0:
+                expected = self.tracker(self.tiers[index][0], "generate").percentile(self.BUDGET_PERCENTILE)
+                if expected is None or expected <= latency_budget:
+                    break
+                index -= 1
+        model = self.tiers[index][0]
+        logger.debug("Routing ~{} input tokens (latency budget: {}) to {}", input_tokens, latency_budget, model)
+        return model
+
+    async def call(self, model: str, kind: str, attempt, discard=None):
+        """
+        Awaits attempt() (a zero-argument coroutine factory), hedging it with a second attempt() if it
+        runs past the learned percentile for this model and kind. Returns the first successful result.
+        discard(result) is awaited for a losing attempt that also succeeded, to release what it holds.
+        """
+        tracker = self.tracker(model, kind)
+        self.calls += 1
+        delay = tracker.percentile(self.hedge_percentile) if self.hedge_enabled else None
+
+        primary = asyncio.ensure_future(self._timed(tracker, attempt))
+        if delay is None:
+            return await primary
+
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or self.hedges >= self.hedge_max_ratio * self.calls:
+                return await primary
+
+            self.hedges += 1
+            logger.info(
+                "{} {} exceeded p{:g} ({:.2f}s); sending hedged request", model, kind, self.hedge_percentile * 100, delay
+            )
+            hedge = asyncio.ensure_future(self._timed(tracker, attempt))
+            winner, result = await self._first_success({"primary": primary, "hedge": hedge}, discard)
+        except BaseException:
+            primary.cancel()
+            raise
+        record_hedge(winner)
+        logger.info("Hedged {} {} won by the {} request", model, kind, winner)
+        return result
+
+    @staticmethod
+    async def _timed(tracker: LatencyTracker, attempt):
+        start = time.perf_counter()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            # A cancelled hedge loser took at least this long; counting it keeps the percentile from drifting down
+            tracker.observe(time.perf_counter() - start)
+            raise
+        tracker.observe(time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    async def _first_success(attempts: dict[str, asyncio.Future], discard=None):
+        """
+        Returns (name, result) of the first attempt to succeed and cancels the rest.
+        Raises the last error if all attempts fail.
+        """
+        pending = set(attempts.values())
+        names = {future: name for name, future in attempts.items()}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [future for future in done if future.exception() is None]
+                if succeeded:
+                    # Both attempts can finish in the same step; only one result is kept
+                    for extra in succeeded[1:]:
+                        if discard is not None:
+                            await discard(extra.result())
+                    return names[succeeded[0]], succeeded[0].result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for future in pending:
+                future.cancel()
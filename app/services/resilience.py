@@ -0,0 +1,271 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import httpx
+from google.genai import errors
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
+
+from app.config.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import CIRCUIT_OPEN, CONCURRENCY_LIMIT, record_retry
+
+# Status codes that mean the service is overloaded or over quota: back off and shrink concurrency
+OVERLOAD_CODES = {429, 503}
+# Status codes worth retrying (overload plus transient server errors)
+RETRYABLE_CODES = OVERLOAD_CODES | {500, 502, 504}
+
+
+class ModelUnavailableError(Exception):
+    """
+    The model could not be reached after retries, or the circuit breaker is open.
+    Routes answer 503 with a Retry-After of retry_after seconds.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ModelUnavailableError):
+    pass
+
+
+def is_overload(error: BaseException | None) -> bool:
+    return isinstance(error, errors.APIError) and error.code in OVERLOAD_CODES
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_CODES
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for model calls. Each successful call raises the limit by 1/limit
+    (about +1 per limit's worth of calls); overload errors, or a short-term latency average that
+    rises well above the long-term one, cut it by BACKOFF. Decreases are spaced by at
+    least cooldown_seconds so one burst of failures counts as a single congestion signal.
+    """
+
+    BACKOFF = 0.5
+    SHORT_ALPHA = 0.3
+    LONG_ALPHA = 0.02
+
+    def __init__(
+        self,
+        initial: int | None = None,
+        min_limit: int | None = None,
+        max_limit: int | None = None,
+        latency_tolerance: float | None = None,
+        cooldown_seconds: float | None = None,
+    ):
+        self.max_limit = max_limit or settings.GENAI_MAX_CONCURRENCY
+        self.min_limit = min(min_limit or settings.GENAI_MIN_CONCURRENCY, self.max_limit)
+        self.limit = float(min(max(initial or settings.GENAI_INITIAL_CONCURRENCY, self.min_limit), self.max_limit))
+        self.latency_tolerance = latency_tolerance or settings.GENAI_LIMITER_LATENCY_TOLERANCE
+        self.cooldown_seconds = (
+            settings.GENAI_LIMITER_COOLDOWN_SECONDS if cooldown_seconds is None else cooldown_seconds
+        )
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._short_latency = None
+        self._long_latency = None
+        self._last_decrease = 0.0
+        CONCURRENCY_LIMIT.set(int(self.limit))
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Woken but cancelled before taking the slot; pass the wake-up on
+                    self._wake()
+                raise
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    def release(self, error: BaseException | None = None, latency: float | None = None):
+        """
+        Frees a slot and feeds the call's outcome into the limit. Errors other than overload
+        (and cancellations) leave the limit unchanged.
+        """
+        self.in_flight -= 1
+        if is_overload(error):
+            self._decrease("overload")
+        elif error is None:
+            if latency is not None and self._latency_rising(latency):
+                self._decrease("latency")
+            else:
+                self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+                CONCURRENCY_LIMIT.set(int(self.limit))
+        self._wake()
+
+    def _latency_rising(self, latency: float) -> bool:
+        if self._long_latency is None:
+            self._short_latency = self._long_latency = latency
+            return False
+        self._short_latency += self.SHORT_ALPHA * (latency - self._short_latency)
+        self._long_latency += self.LONG_ALPHA * (latency - self._long_latency)
+        return self._short_latency > self.latency_tolerance * self._long_latency
+
+    def _decrease(self, reason: str):
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown_seconds:
+            return
+        self._last_decrease = now
+        previous = int(self.limit)
+        self.limit = max(self.limit * self.BACKOFF, self.min_limit)
+        CONCURRENCY_LIMIT.set(int(self.limit))
+        logger.warning("Model concurrency limit {} -> {} ({})", previous, int(self.limit), reason)
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive retryable failures; while open, calls fail at once
+    with CircuitOpenError. After reset_seconds one probe call is let through: success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int | None = None, reset_seconds: float | None = None):
+        self.failure_threshold = failure_threshold or settings.GENAI_BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or settings.GENAI_BREAKER_RESET_SECONDS
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def check(self) -> bool:
+        """
+        Raises CircuitOpenError unless the call may proceed. Returns True if the call is the half-open probe.
+        """
+        state = self.state
+        if state == "closed":
+            return False
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            logger.info("Circuit breaker half-open; sending a probe call")
+            return True
+        retry_after = self.reset_seconds - (time.monotonic() - self.opened_at) if state == "open" else self.reset_seconds
+        raise CircuitOpenError("Model service is unavailable; failing fast while the circuit is open.", max(retry_after, 1))
+
+    def record(self, error: BaseException | None, probe: bool):
+        if probe:
+            self.probing = False
+        if error is None:
+            if self.opened_at is not None:
+                logger.info("Circuit breaker closed")
+            self.failures = 0
+            self.opened_at = None
+            CIRCUIT_OPEN.set(0)
+        elif is_retryable(error):
+            self.failures += 1
+            if probe or self.failures >= self.failure_threshold:
+                if self.opened_at is None or probe:
+                    logger.error("Circuit breaker opened after {} consecutive failures: {}", self.failures, error)
+                self.opened_at = time.monotonic()
+                CIRCUIT_OPEN.set(1)
+
+
+class ModelCallPolicy:
+    """
+    Admission and retry policy shared by all model calls of a client: a circuit breaker in front
+    of an adaptive concurrency limit, and jittered exponential backoff for retryable errors.
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter | None = None, breaker: CircuitBreaker | None = None):
+        self.limiter = limiter or AdaptiveLimiter()
+        self.breaker = breaker or CircuitBreaker()
+
+    async def acquire(self) -> bool:
+        """
+        Takes a concurrency slot; returns the probe flag to pass to release().
+        """
+        probe = self.breaker.check()
+        try:
+            await self.limiter.acquire()
+        except BaseException:
+            if probe:
+                self.breaker.probing = False
+            raise
+        return probe
+
+    def release(self, probe: bool, error: BaseException | None = None, latency: float | None = None):
+        self.limiter.release(error, latency)
+        if isinstance(error, asyncio.CancelledError):
+            # Cancelled (e.g. a hedge loser): no verdict on the service's health
+            if probe:
+                self.breaker.probing = False
+            return
+        self.breaker.record(error, probe)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Holds a slot for one call and reports its outcome and latency.
+        """
+        probe = await self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.release(probe, e)
+            raise
+        self.release(probe, latency=time.perf_counter() - start)
+
+    async def run(self, call):
+        """
+        Awaits call() (a zero-argument coroutine factory), retrying retryable errors with jittered
+        exponential backoff. Raises ModelUnavailableError once retries are exhausted on a retryable error.
+        """
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(settings.GENAI_RETRY_MAX_ATTEMPTS) | stop_after_delay(settings.GENAI_RETRY_MAX_SECONDS),
+            wait=wait_random_exponential(multiplier=settings.GENAI_RETRY_BASE_SECONDS, max=settings.GENAI_RETRY_MAX_WAIT_SECONDS),
+            retry=retry_if_exception(is_retryable),
+            before_sleep=self._before_sleep,
+            reraise=True,
+        )
+        try:
+            async for attempt in retrying:
+                with attempt:
+                    return await call()
+        except ModelUnavailableError:
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            raise ModelUnavailableError(
+                f"Model service is unavailable after retries: {e}", settings.GENAI_BREAKER_RESET_SECONDS
+            ) from e
+
+    @staticmethod
+    def _before_sleep(retry_state):
+        record_retry()
+        logger.warning(
+            "Model call failed ({}); retry {} in {:.1f}s",
+            retry_state.outcome.exception(), retry_state.attempt_number, retry_state.next_action.sleep,
+        )
@@ -0,0 +1,79 @@
+import asyncio
+
+import orjson
+import xxhash
+from cachetools import TTLCache
+
+from app.config.config import settings
+from app.utils.logger import logger
+from app.utils.metrics import record_cache_lookup
+from app.utils.shared_cache import SharedCache, shared_cache
+
+NAMESPACE = "result"
+
+
+class ResultCache:
+    """
+    Two-tier cache for analyze results.
+    Tier 1 is an in-memory LRU with TTL in each worker, tier 2 is the SharedCache on disk, which
+    every worker reads and writes, so a result generated in one worker is a hit in all of them.
+    Values are stored serialized so every hit hands out a fresh, independent dict.
+    The memory tier is only touched from the event loop; disk I/O runs in worker threads.
+    """
+
+    def __init__(
+        self,
+        store: SharedCache | None = None,
+        max_entries: int | None = None,
+        ttl_seconds: int | None = None,
+        disk_ttl_seconds: int | None = None,
+    ):
+        self.store = store or shared_cache
+        self.ttl_seconds = ttl_seconds or settings.RESULT_CACHE_TTL_SECONDS
+        self.disk_ttl_seconds = disk_ttl_seconds or settings.RESULT_CACHE_DISK_TTL_SECONDS
+        self.memory = TTLCache(maxsize=max_entries or settings.RESULT_CACHE_MAX_ENTRIES, ttl=self.ttl_seconds)
+
+    @staticmethod
+    def make_key(
+        document_hashes: list[str],
+        project_type: str,
+        tech_stack: list[str] | None,
+        prompt_template: str,
+        model_name: str,
+    ) -> str:
+        """
+        Builds the cache key from everything that influences the model output.
+        Tech stack entries are case-folded, de-duplicated and sorted so equivalent inputs share a key.
+        """
+        normalized_stack = sorted({t.strip().lower() for t in tech_stack or [] if t.strip()})
+        material = orjson.dumps([
+            document_hashes,
+            project_type,
+            normalized_stack,
+            xxhash.xxh3_128_hexdigest(prompt_template),
+            model_name,
+        ])
+        return xxhash.xxh3_128_hexdigest(material)
+
+    async def get(self, key: str) -> dict | None:
+        payload = self.memory.get(key)
+        if payload is not None:
+            record_cache_lookup("result", "memory_hit")
+            logger.info(f"Result cache hit (memory): {key}")
+            return orjson.loads(payload)
+
+        payload = await asyncio.to_thread(self.store.get, NAMESPACE, key)
+        if payload is not None:
+            record_cache_lookup("result", "shared_hit")
+            self.memory[key] = payload
+            logger.info(f"Result cache hit (disk): {key}")
+            return orjson.loads(payload)
+
+        record_cache_lookup("result", "miss")
+        logger.info(f"Result cache miss: {key}")
+        return None
+
+    async def set(self, key: str, result: dict):
+        payload = orjson.dumps(result)
+        self.memory[key] = payload
+        await asyncio.to_thread(self.store.set, NAMESPACE, key, payload, self.disk_ttl_seconds)
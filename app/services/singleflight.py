@@ -0,0 +1,73 @@
+import asyncio
+
+from app.utils.logger import logger
+
+
+class _Call:
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.waiters = 0
+        # Set once prepare() has returned; until then the call may still read its starter's inputs
+        self.prepared = asyncio.Event()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one shared task.
+    Every caller awaits the shared task through a shield, so a caller that is cancelled (e.g. its
+    client disconnected) only stops waiting; the task itself is cancelled when its last waiter leaves.
+    Completed calls are forgotten at once; caching results is the result cache's job.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, _Call] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, func, prepare=None) -> tuple:
+        """
+        Returns (result, shared): the result of func() (a zero-argument coroutine factory), run once
+        per key at a time, and whether this caller joined a call started by someone else.
+        prepare (optional) runs only when a new call starts, e.g. to give the call its own copies of
+        the starting caller's inputs. It returns (value, cleanup): func(value) is called instead of
+        func(), and cleanup (blocking) runs in a thread once the call is done or cancelled.
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call()
+            call.task = asyncio.ensure_future(self._run(call, func, prepare))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                logger.info(f"All waiters left in-flight call {key[:16]}; cancelling it")
+                call.task.cancel()
+                self._forget(key, call)
+            elif not shared and not call.prepared.is_set():
+                # Others still wait on the call; keep this caller's inputs until prepare() is done with them
+                await call.prepared.wait()
+
+    @staticmethod
+    async def _run(call: _Call, func, prepare):
+        if prepare is None:
+            call.prepared.set()
+            return await func()
+        try:
+            value, cleanup = await prepare()
+        finally:
+            call.prepared.set()
+        try:
+            return await func(value)
+        finally:
+            await asyncio.to_thread(cleanup)
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,210 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from app.config.config import settings
+from app.services.resilience import ModelUnavailableError
+from app.utils.logger import logger
+
+# Lower numbers are served first
+PRIORITY_INTERACTIVE = 0  # /edit-json/
+PRIORITY_DEFAULT = 1  # /analyze/ and /analyze/stream
+PRIORITY_BATCH = 2  # background jobs and chunked sections
+
+WINDOW_SECONDS = 60
+# Waiters that stop polling (e.g. their process died) no longer hold the head of the queue
+WAITER_STALE_SECONDS = 10
+OUTPUT_ESTIMATE_ALPHA = 0.1
+
+
+@dataclass
+class Reservation:
+    id: str
+    tokens: int
+
+
+class TokenBudgetStore:
+    """
+    Sliding one-minute token window shared by every worker process through a SQLite file.
+    Reservations are checked and inserted inside one BEGIN IMMEDIATE transaction, so processes
+    cannot overbook the budget. Waiting requests are registered too, and only the best-placed
+    waiter (lowest priority number, then oldest) may reserve.
+    All methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, db_path: str | None = None, limit: int | None = None):
+        db_path = db_path or settings.GENAI_TPM_DB_PATH
+        self.limit = limit or settings.GENAI_TPM_LIMIT
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # Autocommit mode so transactions are controlled explicitly
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS reservations (id TEXT PRIMARY KEY, tokens INTEGER NOT NULL, created REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS waiters "
+            "(id TEXT PRIMARY KEY, priority INTEGER NOT NULL, enqueued REAL NOT NULL, heartbeat REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def try_reserve(self, reservation_id: str, tokens: int, priority: int) -> bool:
+        """
+        Reserves tokens if this request is first in line and the window has room. Otherwise
+        registers (or refreshes) it as a waiter and returns False. A request larger than the whole
+        budget is admitted once the window is empty.
+        """
+        with self._lock:
+            db = self.connection
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM reservations WHERE created < ?", (now - WINDOW_SECONDS,))
+                db.execute("DELETE FROM waiters WHERE heartbeat < ?", (now - WAITER_STALE_SECONDS,))
+                db.execute(
+                    "INSERT INTO waiters (id, priority, enqueued, heartbeat) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                    (reservation_id, priority, now, now),
+                )
+                head = db.execute("SELECT id FROM waiters ORDER BY priority, enqueued LIMIT 1").fetchone()[0]
+                used = db.execute("SELECT COALESCE(SUM(tokens), 0) FROM reservations").fetchone()[0]
+                admitted = head == reservation_id and (used == 0 or used + tokens <= self.limit)
+                if admitted:
+                    db.execute("DELETE FROM waiters WHERE id = ?", (reservation_id,))
+                    db.execute(
+                        "INSERT INTO reservations (id, tokens, created) VALUES (?, ?, ?)", (reservation_id, tokens, now)
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            return admitted
+
+    def settle(self, reservation_id: str, tokens: int):
+        with self._lock:
+            self.connection.execute("UPDATE reservations SET tokens = ? WHERE id = ?", (tokens, reservation_id))
+
+    def cancel(self, reservation_id: str):
+        """
+        Drops a waiter or a reservation (the call was abandoned or failed before using tokens).
+        """
+        with self._lock:
+            self.connection.execute("DELETE FROM waiters WHERE id = ?", (reservation_id,))
+            self.connection.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+
+    def used(self) -> int:
+        with self._lock:
+            return self.connection.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM reservations WHERE created >= ?", (time.time() - WINDOW_SECONDS,)
+            ).fetchone()[0]
+
+
+class CallTokens:
+    """
+    Token reservations for one logical model call, which retries and hedges may send several times.
+    The first attempt uses the reservation taken before the call, so waiting for budget is not counted
+    as model latency; every further attempt reserves its own, since each attempt that reaches the API is billed.
+    """
+
+    def __init__(self, scheduler: "TokenScheduler", input_tokens: int, priority: int):
+        self.scheduler = scheduler
+        self.input_tokens = input_tokens
+        self.priority = priority
+        self._spare: Reservation | None = None
+
+    async def reserve_first(self):
+        self._spare = await self.scheduler.reserve(self.input_tokens, self.priority)
+
+    async def take(self) -> Reservation:
+        """
+        Returns the reservation for the next attempt.
+        """
+        if self._spare is not None:
+            reservation, self._spare = self._spare, None
+            return reservation
+        return await self.scheduler.reserve(self.input_tokens, self.priority)
+
+    def release_spare(self):
+        """
+        Returns the up-front reservation if no attempt took it (the call failed before its first attempt).
+        """
+        if self._spare is not None:
+            self.scheduler.release(self._spare)
+            self._spare = None
+
+
+class TokenScheduler:
+    """
+    Admits model calls against the shared tokens-per-minute budget. Each call reserves its estimated
+    input tokens plus the recent average output before it is sent, waits in priority order while
+    the budget is exhausted, and settles the reservation with the usage_metadata totals afterwards.
+    """
+
+    def __init__(self, store: TokenBudgetStore | None = None):
+        self.store = store or TokenBudgetStore()
+        self.poll_seconds = settings.GENAI_TPM_POLL_SECONDS
+        self.max_wait_seconds = settings.GENAI_TPM_MAX_WAIT_SECONDS
+        self.output_estimate = float(settings.GENAI_TPM_OUTPUT_ESTIMATE)
+        self._changed = asyncio.Event()
+        self._background: set[asyncio.Task] = set()
+
+    async def reserve(self, input_tokens: int, priority: int = PRIORITY_DEFAULT) -> Reservation:
+        reservation = Reservation(uuid.uuid4().hex, input_tokens + round(self.output_estimate))
+        deadline = time.monotonic() + self.max_wait_seconds
+        waited = False
+        try:
+            while not await asyncio.to_thread(self.store.try_reserve, reservation.id, reservation.tokens, priority):
+                if time.monotonic() >= deadline:
+                    raise ModelUnavailableError("Token budget exhausted; try again shortly.", WINDOW_SECONDS)
+                if not waited:
+                    logger.info("Waiting for {} tokens of budget (priority {})", reservation.tokens, priority)
+                    waited = True
+                # Woken early when this process settles or cancels a reservation
+                changed = self._changed
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self.release(reservation)
+            raise
+        return reservation
+
+    async def reserve_call(self, input_tokens: int, priority: int = PRIORITY_DEFAULT) -> CallTokens:
+        """
+        Reserves the first attempt of a model call; further attempts reserve through CallTokens.take.
+        """
+        call = CallTokens(self, input_tokens, priority)
+        await call.reserve_first()
+        return call
+
+    async def settle(self, reservation: Reservation, usage: dict):
+        """
+        Replaces the estimate with the tokens actually used.
+        """
+        tokens = usage.get("total_tokens")
+        if tokens is None:
+            tokens = (usage.get("input_tokens") or 0) + (usage.get("output_tokens") or 0)
+        output_tokens = usage.get("output_tokens")
+        if output_tokens is not None:
+            self.output_estimate += OUTPUT_ESTIMATE_ALPHA * (output_tokens - self.output_estimate)
+        await asyncio.to_thread(self.store.settle, reservation.id, tokens)
+        logger.debug("Settled token reservation {}: estimated {}, used {}", reservation.id, reservation.tokens, tokens)
+        self._notify()
+
+    def release(self, reservation: Reservation):
+        """
+        Returns an unused reservation in the background; safe to call from cancellation handlers.
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(self.store.cancel, reservation.id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        task.add_done_callback(lambda _: self._notify())
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
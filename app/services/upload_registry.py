@@ -0,0 +1,164 @@
+import asyncio
+import pathlib
+import time
+from collections import OrderedDict
+
+from google.genai import types
+
+from app.config.config import settings
+from app.utils.file_utils import file_digest
+from app.utils.logger import logger
+from app.utils.metrics import record_cache_lookup
+from app.utils.shared_cache import SharedCache, shared_cache
+
+# Files API keeps uploads for 48 hours when the response carries no expiration time
+DEFAULT_FILE_TTL_SECONDS = 48 * 3600
+SWEEP_INTERVAL_SECONDS = 60
+CACHE_NAMESPACE = "upload"
+
+
+class UploadRegistry:
+    """
+    Content-addressed cache of files uploaded to the Google GenAI Files API.
+    Files with identical bytes reuse the same remote File handle until it nears expiry.
+    Handles are kept in memory and in the SharedCache, so a file uploaded by one worker process
+    is reused by the others. Cache misses are uploaded concurrently and stale remote files are
+    deleted in the background; handles dropped only for capacity are left to expire remotely,
+    since other workers may still be using them.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_files: int | None = None,
+        expiry_margin_seconds: int | None = None,
+        store: SharedCache | None = None,
+    ):
+        self.client = client
+        self.store = store or shared_cache
+        self.max_files = max_files or settings.UPLOAD_CACHE_MAX_FILES
+        self.expiry_margin_seconds = (
+            settings.UPLOAD_EXPIRY_MARGIN_SECONDS if expiry_margin_seconds is None else expiry_margin_seconds
+        )
+        # digest -> (remote File, expires_at epoch seconds), oldest first
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        # digest -> in-flight upload, so concurrent requests for the same bytes share one upload
+        self._pending: dict[str, asyncio.Future] = {}
+        self._background: set[asyncio.Task] = set()
+        self._last_sweep = 0.0
+
+    async def get_files(self, file_paths: list[str]) -> list:
+        """
+        Returns remote File handles for the given paths, uploading only files not already registered.
+        """
+        digests = await asyncio.to_thread(lambda: [file_digest(path) for path in file_paths])
+        self._sweep()
+        return list(await asyncio.gather(
+            *(self._get_or_upload(digest, path) for digest, path in zip(digests, file_paths))
+        ))
+
+    async def _get_or_upload(self, digest: str, file_path: str):
+        entry = self._entries.get(digest)
+        if entry is not None:
+            remote_file, expires_at = entry
+            if self._is_fresh(expires_at):
+                self._entries.move_to_end(digest)
+                record_cache_lookup("upload", "memory_hit")
+                logger.info(f"Reusing uploaded file {remote_file.name} for {file_path}")
+                return remote_file
+            self._evict(digest)
+
+        pending = self._pending.get(digest)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load_or_upload(digest, file_path))
+            self._pending[digest] = pending
+            pending.add_done_callback(lambda _: self._pending.pop(digest, None))
+
+        # Shield the shared upload so one cancelled request does not abort it for the others
+        return await asyncio.shield(pending)
+
+    async def _load_or_upload(self, digest: str, file_path: str):
+        remote_file = await self._load_shared(digest)
+        if remote_file is not None:
+            record_cache_lookup("upload", "shared_hit")
+            logger.info(f"Reusing uploaded file {remote_file.name} from the shared cache for {file_path}")
+            self._register(digest, remote_file, self._expires_at(remote_file))
+            return remote_file
+
+        record_cache_lookup("upload", "miss")
+        remote_file = await self.client.aio.files.upload(file=pathlib.Path(file_path))
+        logger.info(f"Uploaded {file_path} as {remote_file.name}")
+
+        if getattr(remote_file.state, "name", None) == "FAILED":
+            return remote_file
+
+        expires_at = self._expires_at(remote_file)
+        self._register(digest, remote_file, expires_at)
+        await asyncio.to_thread(
+            self.store.set,
+            CACHE_NAMESPACE,
+            digest,
+            remote_file.model_dump_json(exclude_none=True).encode("utf-8"),
+            expires_at - self.expiry_margin_seconds - time.time(),
+        )
+        return remote_file
+
+    async def _load_shared(self, digest: str):
+        payload = await asyncio.to_thread(self.store.get, CACHE_NAMESPACE, digest)
+        if payload is None:
+            return None
+        try:
+            remote_file = types.File.model_validate_json(payload)
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable shared upload entry {digest}: {e}")
+            return None
+        if not self._is_fresh(self._expires_at(remote_file)):
+            return None
+        # Record/replay backends identify files by content digest; tell them about handles they did not upload
+        fingerprints = getattr(self.client, "fingerprints", None)
+        if fingerprints is not None:
+            fingerprints.files[remote_file.name] = digest
+        return remote_file
+
+    def _register(self, digest: str, remote_file, expires_at: float):
+        self._entries[digest] = (remote_file, expires_at)
+        while len(self._entries) > self.max_files:
+            self._evict(next(iter(self._entries)), delete_remote=False)
+
+    def _expires_at(self, remote_file) -> float:
+        if remote_file.expiration_time is not None:
+            return remote_file.expiration_time.timestamp()
+        return time.time() + DEFAULT_FILE_TTL_SECONDS
+
+    def _is_fresh(self, expires_at: float) -> bool:
+        return time.time() < expires_at - self.expiry_margin_seconds
+
+    def _sweep(self):
+        """
+        Evicts entries close to expiry. Runs at most once per SWEEP_INTERVAL_SECONDS.
+        """
+        now = time.time()
+        if now - self._last_sweep < SWEEP_INTERVAL_SECONDS:
+            return
+        self._last_sweep = now
+
+        stale = [digest for digest, (_, expires_at) in self._entries.items() if not self._is_fresh(expires_at)]
+        for digest in stale:
+            self._evict(digest)
+
+    def _evict(self, digest: str, delete_remote: bool = True):
+        remote_file, _ = self._entries.pop(digest)
+        if not delete_remote:
+            return
+        task = asyncio.ensure_future(self._delete_remote(digest, remote_file.name))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _delete_remote(self, digest: str, name: str):
+        await asyncio.to_thread(self.store.delete, CACHE_NAMESPACE, digest)
+        try:
+            await self.client.aio.files.delete(name=name)
+            logger.info(f"Deleted stale remote file {name}")
+        except Exception as e:
+            # Already expired or deleted remotely; nothing left to reclaim
+            logger.debug(f"Could not delete remote file {name}: {e}")
@@ -41,15 +41,41 @@ def parse_ai_json(text: str) -> dict:
         raise HTTPException(status_code=500, detail="Error parsing AI JSON.")
 
 
-def log_token_usage(usage_metadata) -> dict:
+def token_usage(usage_metadata) -> dict:
     """
-    Extracts and logs token usage from the response metadata.
+    Extracts token usage from the response metadata.
     """
-    usage = {
+    return {
         "input_tokens": usage_metadata.prompt_token_count,
         "output_tokens": usage_metadata.candidates_token_count,
         "total_tokens": usage_metadata.total_token_count,
+        "cached_tokens": usage_metadata.cached_content_token_count,
     }
 
-    logger.info(f"Token usage: {usage}")
+
+def log_token_usage(usage_metadata) -> dict:
+    """
+    Extracts and logs token usage from the response metadata.
+    """
+    usage = token_usage(usage_metadata)
+    logger.info("Token usage: {}", usage)
     return usage
+
+
+def build_document_section(document_texts: list[str]) -> str:
+    """
+    Renders locally extracted document texts as a prompt section appended after the instructions.
+    """
+    from app.prompts.prompt_documents import DOCUMENT_TEXT_TEMPLATE
+
+    documents = "\n\n".join(
+        f"### Document {index}\n{text}" for index, text in enumerate(document_texts, start=1)
+    )
+    return DOCUMENT_TEXT_TEMPLATE.replace("{documents}", documents)
+
+
+def template_prefix(template: str, placeholder: str) -> str:
+    """
+    Returns the static part of a prompt template that precedes the given placeholder.
+    """
+    return template.split(placeholder, 1)[0]
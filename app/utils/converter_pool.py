@@ -0,0 +1,179 @@
+import asyncio
+import os
+import pathlib
+import shutil
+
+from app.config.config import settings
+from app.utils.logger import logger
+from app.utils.shared_cache import SharedCache, shared_cache
+
+CACHE_NAMESPACE = "conversion"
+
+
+class ConversionError(Exception):
+    """
+    Raised when a DOCX → PDF conversion fails or times out.
+    """
+
+
+class _ConverterWorker:
+    """
+    One converter slot with its own LibreOffice user profile.
+    A dedicated profile keeps concurrent conversions from colliding on the shared lock
+    and lets the profile stay initialized (warm) between jobs.
+    """
+
+    def __init__(self, index: int, profile_root: str):
+        self.index = index
+        self.profile_dir = os.path.join(profile_root, f"worker-{index}")
+        self.jobs = 0
+        # Set when a run was killed; the profile may be left locked or half-written
+        self.broken = False
+
+    @property
+    def profile_url(self) -> str:
+        return pathlib.Path(self.profile_dir).as_uri()
+
+    def reset_profile(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.jobs = 0
+        self.broken = False
+
+
+class ConverterPool:
+    """
+    Bounded pool of headless LibreOffice converters behind an async queue.
+    - each worker owns a persistent profile directory, warmed once at startup
+    - conversions run as async subprocesses with a hard timeout
+    - a worker's profile is reset after max_jobs conversions or after a timeout, and re-warmed
+      in the background before the worker takes another job
+    - converted PDFs are cached by the source document's content hash in the SharedCache,
+      so a document converted by one worker process is not converted again by another
+    """
+
+    def __init__(
+        self,
+        size: int | None = None,
+        binary: str | None = None,
+        timeout_seconds: int | None = None,
+        max_jobs: int | None = None,
+        profile_root: str | None = None,
+        cache: SharedCache | None = None,
+    ):
+        self.size = size or settings.CONVERTER_POOL_SIZE
+        self.binary = binary or settings.LIBREOFFICE_BINARY
+        self.timeout_seconds = timeout_seconds or settings.CONVERTER_TIMEOUT_SECONDS
+        self.max_jobs = max_jobs or settings.CONVERTER_MAX_JOBS_PER_WORKER
+        self.profile_root = profile_root or settings.CONVERTER_PROFILE_DIR
+        self.cache = cache or shared_cache
+
+        self.workers = [_ConverterWorker(i, self.profile_root) for i in range(self.size)]
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for worker in self.workers:
+            self._idle.put_nowait(worker)
+        self._background: set[asyncio.Task] = set()
+
+    async def warm_up(self):
+        """
+        Initializes every worker profile so the first real conversion skips LibreOffice's first-run setup.
+        """
+        for worker in self.workers:
+            await self._warm(worker)
+
+    async def _warm(self, worker: _ConverterWorker):
+        try:
+            await self._run(worker, ["--terminate_after_init"])
+        except Exception as e:
+            logger.warning(f"Could not warm LibreOffice worker {worker.index}: {e}")
+            if worker.broken:
+                await asyncio.to_thread(worker.reset_profile)
+
+    async def convert(self, docx_path: str, digest: str) -> str:
+        """
+        Converts docx_path to a PDF next to it and returns the PDF path.
+        """
+        pdf_path = os.path.splitext(docx_path)[0] + ".pdf"
+
+        if await asyncio.to_thread(self._restore, digest, pdf_path):
+            logger.info(f"Conversion cache hit for {docx_path}")
+            return pdf_path
+
+        worker = await self._idle.get()
+        try:
+            await self._run(worker, [
+                "--convert-to", "pdf",
+                "--outdir", os.path.dirname(docx_path),
+                docx_path,
+            ])
+            worker.jobs += 1
+        finally:
+            self._release(worker)
+
+        if not os.path.exists(pdf_path):
+            raise ConversionError(f"LibreOffice produced no output for {docx_path}")
+
+        await asyncio.to_thread(self._store, digest, pdf_path)
+        return pdf_path
+
+    async def _run(self, worker: _ConverterWorker, args: list[str]):
+        process = await asyncio.create_subprocess_exec(
+            self.binary,
+            f"-env:UserInstallation={worker.profile_url}",
+            "--headless",
+            "--norestore",
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            worker.broken = True
+            raise ConversionError(f"LibreOffice timed out after {self.timeout_seconds}s")
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+
+        if process.returncode != 0:
+            raise ConversionError(stderr.decode(errors="ignore").strip() or f"exit code {process.returncode}")
+
+    def _release(self, worker: _ConverterWorker):
+        """
+        Returns the worker to the pool, or first recycles it in the background when it is due.
+        """
+        if not worker.broken and worker.jobs < self.max_jobs:
+            self._idle.put_nowait(worker)
+            return
+        task = asyncio.ensure_future(self._recycle(worker))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _recycle(self, worker: _ConverterWorker):
+        try:
+            await asyncio.to_thread(worker.reset_profile)
+            # Pay the first-run profile setup here rather than in the next request
+            await self._warm(worker)
+            logger.info(f"Recycled LibreOffice worker {worker.index}")
+        finally:
+            self._idle.put_nowait(worker)
+
+    def _restore(self, digest: str, pdf_path: str) -> bool:
+        pdf = self.cache.get(CACHE_NAMESPACE, digest)
+        if pdf is None:
+            return False
+        with open(pdf_path, "wb") as f:
+            f.write(pdf)
+        return True
+
+    def _store(self, digest: str, pdf_path: str):
+        try:
+            with open(pdf_path, "rb") as f:
+                self.cache.set(CACHE_NAMESPACE, digest, f.read())
+        except OSError as e:
+            logger.warning(f"Failed to cache converted PDF {pdf_path}: {e}")
+
+
+converter_pool = ConverterPool()
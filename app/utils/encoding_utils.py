@@ -0,0 +1,172 @@
+import json
+import re
+
+from app.utils.logger import logger
+
+# Every generated description uses this wrapper; the tabular encoding stores only the inner text
+DESCRIPTION_WRAPPER = "<p class='TextEditor__paragraph' dir='ltr'>{}</p>"
+DESCRIPTION_PATTERN = re.compile(r"^<p class='TextEditor__paragraph' dir='ltr'>(.*)</p>$", re.DOTALL)
+
+# Rough characters-per-token ratio for JSON-heavy English text
+CHARS_PER_TOKEN = 4
+
+TABLE_HEADER_KEYS = ("format", "task_columns", "task_constants", "subtask_columns", "subtask_constants", "description_html")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def encode_previous_json(data: dict, encoding: str) -> tuple[str, str]:
+    """
+    Serializes a task breakdown for embedding in a prompt. Returns (text, encoding actually used).
+    - "pretty": indented JSON (the original format)
+    - "minified": JSON without whitespace
+    - "tabular": tasks and sub-tasks as rows under shared column headers, with constant columns
+      and the description HTML wrapper factored out; falls back to minified when rows don't share keys
+    """
+    if encoding == "pretty":
+        return json.dumps(data, indent=2), "pretty"
+    if encoding == "tabular":
+        table = _to_table(data)
+        if table is not None:
+            return json.dumps(table, separators=(",", ":"), ensure_ascii=False), "tabular"
+        logger.info("Tasks do not share a common set of fields; using minified encoding instead of tabular")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False), "minified"
+
+
+def decode_previous_json(text: str) -> dict:
+    """
+    Inverse of encode_previous_json for any encoding.
+    """
+    data = json.loads(text)
+    if isinstance(data, dict) and data.get("format") == "tabular":
+        return _from_table(data)
+    return data
+
+
+def encoding_report(data: dict, encoded: str, encoding: str) -> dict:
+    """
+    Estimated prompt tokens of the chosen encoding compared to the pretty-printed baseline.
+    """
+    baseline = estimate_tokens(json.dumps(data, indent=2))
+    tokens = estimate_tokens(encoded)
+    return {
+        "encoding": encoding,
+        "estimated_tokens": tokens,
+        "estimated_tokens_saved": baseline - tokens,
+    }
+
+
+# --- Tabular encoding ---
+
+def _to_table(data: dict) -> dict | None:
+    tasks = data.get("tasks")
+    if not isinstance(tasks, list) or not tasks or not all(isinstance(task, dict) for task in tasks):
+        return None
+    if any(key in data for key in TABLE_HEADER_KEYS):
+        return None
+    # The subTasks column must be present on every task or on none, so it can be restored exactly
+    has_subtasks = {"subTasks" in task for task in tasks}
+    if len(has_subtasks) > 1:
+        return None
+    has_subtasks = has_subtasks.pop()
+    subtasks = [sub for task in tasks for sub in task.get("subTasks") or []]
+    if not all(isinstance(sub, dict) for sub in subtasks):
+        return None
+
+    # Sub-tasks become a trailing column of their parent row
+    task_rows = [{key: value for key, value in task.items() if key != "subTasks"} for task in tasks]
+    task_columns = _shared_columns(task_rows)
+    subtask_columns = _shared_columns(subtasks) if subtasks else []
+    if task_columns is None or subtask_columns is None:
+        return None
+
+    descriptions = [row.get("description") for row in task_rows + subtasks if "description" in row]
+    wrap_descriptions = bool(descriptions) and all(
+        isinstance(d, str) and DESCRIPTION_PATTERN.match(d) for d in descriptions
+    )
+
+    task_constants = _constant_columns(task_rows, task_columns)
+    subtask_constants = _constant_columns(subtasks, subtask_columns)
+    task_columns = [c for c in task_columns if c not in task_constants]
+    subtask_columns = [c for c in subtask_columns if c not in subtask_constants]
+
+    def row(item: dict, columns: list[str]) -> list:
+        values = [item[column] for column in columns]
+        if wrap_descriptions and "description" in columns:
+            index = columns.index("description")
+            values[index] = DESCRIPTION_PATTERN.match(values[index]).group(1)
+        return values
+
+    rows = []
+    for task, task_row in zip(tasks, task_rows):
+        values = row(task_row, task_columns)
+        if has_subtasks:
+            values.append([row(sub, subtask_columns) for sub in task["subTasks"]])
+        rows.append(values)
+
+    table = {key: value for key, value in data.items() if key != "tasks"}
+    table.update({
+        "format": "tabular",
+        "task_columns": task_columns + ["subTasks"] if has_subtasks else task_columns,
+        "task_constants": task_constants,
+        "subtask_columns": subtask_columns,
+        "subtask_constants": subtask_constants,
+        "description_html": DESCRIPTION_WRAPPER if wrap_descriptions else None,
+        "tasks": rows,
+    })
+    return table
+
+
+def _from_table(table: dict) -> dict:
+    has_subtasks = table["task_columns"][-1:] == ["subTasks"]
+    task_columns = table["task_columns"][:-1] if has_subtasks else table["task_columns"]
+    wrapper = table.get("description_html")
+
+    def item(values: list, columns: list[str], constants: dict) -> dict:
+        result = dict(zip(columns, values))
+        result.update(constants)
+        if wrapper and "description" in result:
+            result["description"] = wrapper.format(result["description"])
+        return result
+
+    tasks = []
+    for values in table["tasks"]:
+        task = item(values[:len(task_columns)], task_columns, table["task_constants"])
+        if has_subtasks:
+            task["subTasks"] = [
+                item(sub, table["subtask_columns"], table["subtask_constants"]) for sub in values[-1]
+            ]
+        tasks.append(task)
+
+    data = {key: value for key, value in table.items() if key not in TABLE_HEADER_KEYS and key != "tasks"}
+    data["tasks"] = tasks
+    return data
+
+
+def _shared_columns(rows: list[dict]) -> list[str] | None:
+    """
+    Column order of the first row, or None if the rows don't all have exactly the same keys.
+    """
+    columns = list(rows[0])
+    keys = set(columns)
+    if any(set(row) != keys for row in rows):
+        return None
+    return columns
+
+
+def _constant_columns(rows: list[dict], columns: list[str]) -> dict:
+    """
+    Scalar columns with the same value in every row (e.g. null startDate/dueDate).
+    """
+    if len(rows) < 2:
+        return {}
+    constants = {}
+    for column in columns:
+        value = rows[0][column]
+        if column != "description" and not isinstance(value, (dict, list)) and all(
+            row[column] == value for row in rows
+        ):
+            constants[column] = value
+    return constants
@@ -0,0 +1,219 @@
+import asyncio
+import multiprocessing
+import os
+from collections.abc import AsyncIterator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from cachetools import LRUCache
+from docx import Document
+from PyPDF2 import PdfReader
+
+from app.config.config import settings
+from app.utils.logger import logger
+from app.utils.shared_cache import SharedCache, shared_cache
+
+PAGE_TEXT_NAMESPACE = "page_text"
+PAGE_COUNT_NAMESPACE = "page_count"
+# PDF images smaller than this (in pixels) are treated as logos/decoration, not content
+MIN_MEANINGFUL_IMAGE_PIXELS = 100_000
+
+# Parsed PDFs kept by each pool process: a document's batches mostly land on the same few processes,
+# and re-parsing the cross-reference table and page tree for every batch costs more than the batch
+_readers: LRUCache = LRUCache(maxsize=4)
+
+
+class ExtractionError(Exception):
+    """
+    Raised when a document cannot be parsed or the extraction process pool fails.
+    """
+
+
+# --- Worker functions (run in the pool's processes) ---
+
+def _ping() -> bool:
+    return True
+
+
+def _open_pdf(file_path: str) -> PdfReader:
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+    reader = _readers.get(key)
+    if reader is None:
+        reader = _readers[key] = PdfReader(file_path)
+    return reader
+
+
+def _pdf_page_count(file_path: str) -> int:
+    return len(_open_pdf(file_path).pages)
+
+
+def _pdf_pages(file_path: str, start: int, stop: int) -> list[str]:
+    reader = _open_pdf(file_path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def _markdown_heading(paragraph) -> str:
+    """
+    Returns a markdown heading prefix ("# ", "## ", ...) for heading-styled paragraphs, else "".
+    Keeps the document's outline visible to the model and to split_into_sections.
+    """
+    style_name = paragraph.style.name if paragraph.style is not None else ""
+    if style_name == "Title":
+        return "# "
+    if style_name.startswith("Heading "):
+        level = style_name.removeprefix("Heading ")
+        if level.isdigit() and paragraph.text.strip():
+            return "#" * min(int(level), 6) + " "
+    return ""
+
+
+def _docx_text(file_path: str) -> str:
+    doc = Document(file_path)
+    lines = []
+    # Walk paragraphs and tables in document order; FRS requirements often live in tables
+    for block in doc.iter_inner_content():
+        if hasattr(block, "rows"):
+            for row in block.rows:
+                lines.append(" | ".join(cell.text.strip() for cell in row.cells))
+        else:
+            lines.append(_markdown_heading(block) + block.text)
+    return "\n".join(lines)
+
+
+def _has_meaningful_images(file_path: str) -> bool:
+    if file_path.endswith(".docx"):
+        doc = Document(file_path)
+        return any("image" in rel.reltype for rel in doc.part.rels.values())
+
+    reader = _open_pdf(file_path)
+    for page in reader.pages:
+        resources = page.get("/Resources")
+        xobjects = resources.get_object().get("/XObject") if resources is not None else None
+        if xobjects is None:
+            continue
+        for xobject in xobjects.get_object().values():
+            xobject = xobject.get_object()
+            if xobject.get("/Subtype") != "/Image":
+                continue
+            if int(xobject.get("/Width", 0)) * int(xobject.get("/Height", 0)) >= MIN_MEANINGFUL_IMAGE_PIXELS:
+                return True
+    return False
+
+
+class ExtractionPool:
+    """
+    Runs CPU-bound PDF and DOCX parsing in a process pool so it never blocks the event loop.
+    - PDF pages are extracted in batches of pages_per_task, spread over the pool's processes
+    - page texts and counts are cached in the SharedCache by document digest and page index
+    - iter_pages streams pages in document order as soon as each one is available
+    A DOCX has no pages of its own and is extracted (and cached) as a single page.
+    Processes are spawned rather than forked, since the parent runs an event loop and threads.
+    """
+
+    def __init__(self, size: int | None = None, pages_per_task: int | None = None, cache: SharedCache | None = None):
+        self.size = size or settings.EXTRACTION_POOL_SIZE
+        self.pages_per_task = pages_per_task or settings.EXTRACTION_PAGES_PER_TASK
+        self.cache = cache or shared_cache
+        self._executor: ProcessPoolExecutor | None = None
+
+    async def warm_up(self):
+        """
+        Starts the pool's processes so the first extraction does not pay their startup.
+        """
+        try:
+            await asyncio.gather(*(self._run(_ping) for _ in range(self.size)))
+        except ExtractionError as e:
+            logger.warning(f"Could not warm the extraction pool: {e}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def page_count(self, file_path: str, digest: str) -> int:
+        if file_path.endswith(".docx"):
+            return 1
+        cached = await asyncio.to_thread(self.cache.get, PAGE_COUNT_NAMESPACE, digest)
+        if cached is not None:
+            return int(cached)
+        count = await self._run(_pdf_page_count, file_path)
+        await asyncio.to_thread(self.cache.set, PAGE_COUNT_NAMESPACE, digest, str(count).encode())
+        return count
+
+    async def iter_pages(self, file_path: str, digest: str) -> AsyncIterator[tuple[int, str]]:
+        """
+        Yields (page index, text) for every page in order. Cached pages are served at once;
+        the rest are extracted in parallel batches and yielded as soon as the pages before them are.
+        """
+        count = await self.page_count(file_path, digest)
+        cached = await asyncio.to_thread(self._cached_pages, digest, count)
+        missing = [index for index in range(count) if index not in cached]
+
+        batches: dict[int, asyncio.Future] = {}
+        for start in self._batch_starts(missing):
+            stop = min(start + self.pages_per_task, count)
+            batches[start] = asyncio.ensure_future(self._extract_batch(file_path, digest, start, stop, cached))
+        if missing:
+            logger.info(f"Extracting {len(missing)} of {count} pages of {file_path} in {len(batches)} tasks")
+
+        try:
+            for index in range(count):
+                if index not in cached:
+                    await batches[index - index % self.pages_per_task]
+                yield index, cached[index]
+        finally:
+            for batch in batches.values():
+                batch.cancel()
+
+    async def extract_pages(self, file_path: str, digest: str) -> list[str]:
+        return [text async for _, text in self.iter_pages(file_path, digest)]
+
+    async def has_meaningful_images(self, file_path: str) -> bool:
+        return await self._run(_has_meaningful_images, file_path)
+
+    def _batch_starts(self, missing: list[int]) -> list[int]:
+        """
+        Start indexes of the batches covering the missing pages. Batches are aligned to
+        pages_per_task, so a batch may re-extract a few pages that were already cached.
+        """
+        return sorted({index - index % self.pages_per_task for index in missing})
+
+    async def _extract_batch(self, file_path: str, digest: str, start: int, stop: int, pages: dict[int, str]):
+        if file_path.endswith(".docx"):
+            texts = [await self._run(_docx_text, file_path)]
+        else:
+            texts = await self._run(_pdf_pages, file_path, start, stop)
+        for offset, text in enumerate(texts):
+            pages[start + offset] = text
+        await asyncio.to_thread(self._cache_pages, digest, start, texts)
+
+    def _cached_pages(self, digest: str, count: int) -> dict[int, str]:
+        pages = {}
+        for index in range(count):
+            text = self.cache.get(PAGE_TEXT_NAMESPACE, f"{digest}:{index}")
+            if text is not None:
+                pages[index] = text.decode("utf-8")
+        return pages
+
+    def _cache_pages(self, digest: str, start: int, texts: list[str]):
+        for offset, text in enumerate(texts):
+            self.cache.set(PAGE_TEXT_NAMESPACE, f"{digest}:{start + offset}", text.encode("utf-8"))
+
+    async def _run(self, func, *args):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.size, mp_context=multiprocessing.get_context("spawn"))
+        executor = self._executor
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory on a hostile PDF); start a fresh pool for the next call
+            if self._executor is executor:
+                self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise ExtractionError(f"Extraction process pool failed: {e}") from e
+        except Exception as e:
+            raise ExtractionError(f"{func.__name__} failed for {args[0] if args else ''}: {e}") from e
+
+
+extraction_pool = ExtractionPool()
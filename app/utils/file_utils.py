@@ -1,59 +1,136 @@
 import os
-import io
+import re
 import uuid
-import subprocess
-from docx import Document
-from PyPDF2 import PdfReader
+import asyncio
+import unicodedata
+import xxhash
+from cachetools import LRUCache
 from fastapi import UploadFile, HTTPException
+from app.config.config import settings
 from app.utils.logger import logger
+from app.utils.converter_pool import converter_pool, ConversionError
+from app.utils.extraction_pool import extraction_pool, ExtractionError
+from app.utils.metrics import timed
 
 
 ALLOWED_EXTENSIONS = {".pdf", ".docx"}
+HASH_CHUNK_SIZE = 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
+# path -> (mtime_ns, size, digest); avoids re-hashing the same file within a request
+_digest_cache: LRUCache = LRUCache(maxsize=4096)
 
-def save_temp_file(uploaded: UploadFile) -> str:
+
+class UploadBudget:
+    """
+    Tracks the bytes ingested across all files of a single request.
+    """
+
+    def __init__(self, max_request_bytes: int | None = None):
+        self.max_request_bytes = max_request_bytes or settings.MAX_UPLOAD_REQUEST_BYTES
+        self.used_bytes = 0
+
+    def consume(self, num_bytes: int):
+        self.used_bytes += num_bytes
+        if self.used_bytes > self.max_request_bytes:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Total upload size exceeds {self.max_request_bytes // (1024 * 1024)} MB.",
+            )
+
+
+def _copy_upload(source, temp_path: str, filename: str, budget: UploadBudget | None, workspace=None) -> str:
+    """
+    Streams an upload to disk in fixed-size chunks, enforcing size limits and hashing in the same pass.
+    Runs in a worker thread; returns the xxh3-128 digest of the written bytes.
+    """
+    max_file_bytes = settings.MAX_UPLOAD_FILE_BYTES
+    hasher = xxhash.xxh3_128()
+    written = 0
+
+    with open(temp_path, "wb") as f:
+        for chunk in iter(lambda: source.read(UPLOAD_CHUNK_SIZE), b""):
+            written += len(chunk)
+            if written > max_file_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"{filename} exceeds the {max_file_bytes // (1024 * 1024)} MB per-file limit.",
+                )
+            if budget is not None:
+                budget.consume(len(chunk))
+            if workspace is not None:
+                workspace.reserve(len(chunk))
+            hasher.update(chunk)
+            f.write(chunk)
+
+    return hasher.hexdigest()
+
+
+@timed("save_upload")
+async def save_temp_file(uploaded: UploadFile, budget: UploadBudget | None = None, workspace=None) -> str:
+    """
+    Saves an upload into the request workspace (or /tmp when none is given) and returns its path.
+    """
     ext = os.path.splitext(uploaded.filename)[1].lower()
 
     if ext not in ALLOWED_EXTENSIONS:
         logger.warning(f"Attempted to upload unsupported file type: {ext}")
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
-    temp_filename = f"{uuid.uuid4()}{ext}"
-    temp_path = f"/tmp/{temp_filename}"
+    # Reject early from the declared size before touching the disk
+    if uploaded.size is not None and uploaded.size > settings.MAX_UPLOAD_FILE_BYTES:
+        logger.warning(f"Rejected oversized upload {uploaded.filename}: {uploaded.size} bytes")
+        raise HTTPException(
+            status_code=413,
+            detail=f"{uploaded.filename} exceeds the {settings.MAX_UPLOAD_FILE_BYTES // (1024 * 1024)} MB per-file limit.",
+        )
+
+    if workspace is not None:
+        temp_path = workspace.new_path(ext)
+        workspace.artifacts.add(temp_path)
+    else:
+        temp_path = f"/tmp/{uuid.uuid4()}{ext}"
 
     try:
-        with open(temp_path, "wb") as f:
-            f.write(uploaded.file.read())
+        digest = await asyncio.to_thread(
+            _copy_upload, uploaded.file, temp_path, uploaded.filename, budget, workspace
+        )
         logger.info(f"File saved successfully: {temp_path}")
+    except HTTPException:
+        _remove_quietly(temp_path)
+        raise
     except Exception as e:
+        _remove_quietly(temp_path)
         logger.error(f"Failed to save file {uploaded.filename}: {e}")
         raise HTTPException(status_code=500, detail=f"Unable to save {uploaded.filename}")
 
+    # Seed the digest memo so caching layers never re-read the file
+    stat = os.stat(temp_path)
+    _digest_cache[temp_path] = (stat.st_mtime_ns, stat.st_size, digest)
     return temp_path
 
 
-def convert_docx_to_pdf(docx_path: str) -> str:
+def _remove_quietly(path: str):
     try:
-        pdf_path = docx_path.replace(".docx", ".pdf")
-        subprocess.run(
-            [
-                "libreoffice",
-                "--headless",
-                "--convert-to",
-                "pdf",
-                docx_path,
-                "--outdir",
-                os.path.dirname(docx_path),
-            ],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@timed("convert")
+async def convert_docx_to_pdf(docx_path: str) -> str:
+    """
+    Converts a DOCX file to PDF through the warm LibreOffice pool.
+    Identical source documents are served from the conversion cache.
+    """
+    try:
+        digest = await asyncio.to_thread(file_digest, docx_path)
+        pdf_path = await converter_pool.convert(docx_path, digest)
         logger.info(f"DOCX successfully converted to PDF: {pdf_path}")
         return pdf_path
 
-    except subprocess.CalledProcessError as e:
-        logger.error(f"LibreOffice conversion failed for {docx_path}: {e.stderr.decode(errors='ignore')}")
+    except ConversionError as e:
+        logger.error(f"LibreOffice conversion failed for {docx_path}: {e}")
         raise HTTPException(status_code=500, detail="Failed to convert DOCX to PDF.")
 
     except Exception as e:
@@ -61,24 +138,27 @@ def convert_docx_to_pdf(docx_path: str) -> str:
         raise HTTPException(status_code=500, detail="Error converting DOCX to PDF.")
 
 
-async def extract_text_from_pdf(file_bytes: bytes) -> str:
+async def extract_text_from_pdf(file_path: str) -> str:
+    """
+    Extracts a PDF's text page by page in the extraction process pool; pages seen before come from the page cache.
+    """
     try:
-        reader = PdfReader(io.BytesIO(file_bytes))
-        text = "\n".join(page.extract_text() or "" for page in reader.pages)
+        digest = await asyncio.to_thread(file_digest, file_path)
+        text = "\n".join(await extraction_pool.extract_pages(file_path, digest))
         logger.info("Text successfully extracted from PDF")
         return text
-    except Exception as e:
+    except ExtractionError as e:
         logger.error(f"Failed to extract text from PDF: {e}")
         raise HTTPException(status_code=500, detail="Error extracting text from PDF.")
 
 
-async def extract_text_from_docx(file_bytes: bytes) -> str:
+async def extract_text_from_docx(file_path: str) -> str:
     try:
-        doc = Document(io.BytesIO(file_bytes))
-        text = "\n".join([para.text for para in doc.paragraphs])
+        digest = await asyncio.to_thread(file_digest, file_path)
+        text = "\n".join(await extraction_pool.extract_pages(file_path, digest))
         logger.info("Text successfully extracted from DOCX")
         return text
-    except Exception as e:
+    except ExtractionError as e:
         logger.error(f"Failed to extract text from DOCX: {e}")
         raise HTTPException(status_code=500, detail="Error extracting text from DOCX.")
 
@@ -93,18 +173,128 @@ async def extract_text_from_txt(file_bytes: bytes) -> str:
         raise HTTPException(status_code=500, detail="Error extracting text from TXT file.")
 
 
-def upload_files_to_genai(client, file_paths: list[str], limit: int = 5) -> list:
+def normalize_text(text: str) -> str:
+    """
+    Normalizes extracted document text for inline prompting:
+    unicode NFKC, unified newlines, collapsed runs of spaces and blank lines.
+    """
+    text = unicodedata.normalize("NFKC", text).replace("\x00", "")
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = re.sub(r"[ \t\f\v]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+@timed("extract_text")
+async def extract_document_text(file_path: str) -> str:
+    """
+    Extracts and normalizes the text of a saved PDF or DOCX upload.
+    """
+    if file_path.endswith(".docx"):
+        text = await extract_text_from_docx(file_path)
+    else:
+        text = await extract_text_from_pdf(file_path)
+    return normalize_text(text)
+
+
+async def _try_inline_text(file_path: str, ingest_mode: str) -> str | None:
+    """
+    Returns the document's text if it should be sent inline, otherwise None.
+    In "auto" mode any failure falls back to uploading; in "text" mode it is an error.
+    """
+    try:
+        if ingest_mode == "auto" and await extraction_pool.has_meaningful_images(file_path):
+            logger.info(f"{file_path} contains images; uploading it instead of inlining text")
+            return None
+
+        text = await extract_document_text(file_path)
+    except HTTPException:
+        if ingest_mode == "text":
+            raise
+        return None
+    except Exception as e:
+        if ingest_mode == "text":
+            logger.error(f"Failed to read {file_path} for text ingestion: {e}")
+            raise HTTPException(status_code=422, detail="Could not extract text from the uploaded document.")
+        logger.info(f"Falling back to file upload for {file_path}: {e}")
+        return None
+
+    if ingest_mode == "auto" and len(text) < settings.TEXT_INGEST_MIN_CHARS:
+        # Likely a scanned document; let the model read the pages instead
+        logger.info(f"{file_path} has too little extractable text; uploading it instead")
+        return None
+    return text
+
+
+async def prepare_documents(file_paths: list[str], ingest_mode: str = "auto") -> tuple[list[str], list[str]]:
+    """
+    Splits saved uploads into files that must go through the Files API and documents sent as inline text.
+
+    - "file": every document is uploaded (DOCX converted to PDF first)
+    - "text": every document is extracted locally and sent inline
+    - "auto": documents without meaningful images and with extractable text are sent inline,
+      the rest are uploaded
+
+    Returns (upload_paths, document_texts).
+    """
+    upload_paths = []
+    document_texts = []
+
+    # Documents are extracted concurrently; the extraction pool spreads their pages over its processes
+    if ingest_mode == "file":
+        texts = [None] * len(file_paths)
+    else:
+        texts = await asyncio.gather(*(_try_inline_text(file_path, ingest_mode) for file_path in file_paths))
+
+    for file_path, text in zip(file_paths, texts):
+        if text is not None:
+            logger.info(f"Using inline text ingestion for {file_path} ({len(text)} chars)")
+            document_texts.append(text)
+        elif file_path.endswith(".docx"):
+            upload_paths.append(await convert_docx_to_pdf(file_path))
+        else:
+            upload_paths.append(file_path)
+
+    return upload_paths, document_texts
+
+
+def file_digest(file_path: str) -> str:
     """
-    Uploads files to Google GenAI File API.
+    Returns the xxh3-128 hex digest of a file's bytes.
+    Results are memoized per path and invalidated when the file's size or mtime changes.
+    """
+    stat = os.stat(file_path)
+    cached = _digest_cache.get(file_path)
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+
+    hasher = xxhash.xxh3_128()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+
+    digest = hasher.hexdigest()
+    _digest_cache[file_path] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+@timed("upload")
+async def upload_files_to_genai(client, file_paths: list[str], limit: int = 5, registry=None) -> list:
+    """
+    Uploads files to Google GenAI File API using the SDK's async surface.
     Limits the number of files uploaded to the specified limit.
+    When an UploadRegistry is given, files already uploaded with identical content reuse their remote handle.
     """
     import pathlib
 
-    uploaded_files = []
-    for file_path in file_paths[:limit]:
-        file = pathlib.Path(file_path)
-        uploaded_file = client.files.upload(file=file)
-        uploaded_files.append(uploaded_file)
+    file_paths = file_paths[:limit]
+    if registry is not None:
+        uploaded_files = await registry.get_files(file_paths)
+    else:
+        uploaded_files = await asyncio.gather(
+            *(client.aio.files.upload(file=pathlib.Path(file_path)) for file_path in file_paths)
+        )
 
     logger.info(f"Uploaded {len(uploaded_files)} files")
-    return uploaded_files
+    return list(uploaded_files)
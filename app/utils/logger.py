@@ -2,13 +2,20 @@ from loguru import logger
 import sys
 import os
 import time
+import random
 import logging
+import traceback
+import orjson
+
+from app.config.config import settings
 
 # Set timezone to IST
 os.environ['TZ'] = 'Asia/Kolkata'
 if hasattr(time, 'tzset'):
     time.tzset()
 
+TEXT_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+
 class InterceptHandler(logging.Handler):
     def emit(self, record):
         # Get corresponding Loguru level if it exists
@@ -25,8 +32,100 @@ class InterceptHandler(logging.Handler):
 
         logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
 
+
+def _parse_sample_rates(value: str) -> dict[str, float]:
+    """
+    Parses "kind=rate,kind=rate" (e.g. "task_ids=0.01") into a dict.
+    """
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            kind, rate = item.split("=", 1)
+            rates[kind.strip()] = float(rate)
+    return rates
+
+
+SAMPLE_RATES = _parse_sample_rates(settings.LOG_SAMPLE_RATES)
+
+
+def _console_filter(record) -> bool:
+    """
+    Drops payload records (they have their own sink) and samples high-volume message types.
+    """
+    extra = record["extra"]
+    if extra.get("payload"):
+        return False
+    kind = extra.get("sample")
+    if kind is not None:
+        return random.random() < SAMPLE_RATES.get(kind, 1.0)
+    return True
+
+
+def _json_sink(message):
+    """
+    Writes one JSON object per line. Runs on loguru's background thread when LOG_ENQUEUE is set.
+    """
+    record = message.record
+    entry = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    extra = {key: value for key, value in record["extra"].items() if key != "sample"}
+    if extra:
+        entry["extra"] = extra
+    if record["exception"] is not None:
+        exc_type, exc_value, exc_traceback = record["exception"]
+        entry["exception"] = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+    sys.stdout.write(orjson.dumps(entry, default=str).decode() + "\n")
+    sys.stdout.flush()
+
+
+def sampled(kind: str):
+    """
+    Logger for a high-volume message type; only LOG_SAMPLE_RATES[kind] of its messages are kept.
+    """
+    return logger.bind(sample=kind)
+
+
+def log_payload(label: str, text: str):
+    """
+    Records a large payload (e.g. a raw model response) in the payload log, capped at
+    LOG_PAYLOAD_MAX_CHARS. Does nothing unless LOG_PAYLOADS is enabled.
+    """
+    if not settings.LOG_PAYLOADS:
+        return
+    logger.bind(payload=True).opt(lazy=True, depth=1).debug(
+        "{}:\n{}", lambda: label, lambda: _cap(text, settings.LOG_PAYLOAD_MAX_CHARS)
+    )
+
+
+def _cap(text: str, max_chars: int) -> str:
+    text = text or ""
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+
+
 logger.remove()
-logger.add(sys.stdout, format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+# enqueue=True hands records to a background thread so request handlers never block on stdout
+if settings.LOG_FORMAT == "json":
+    logger.add(_json_sink, level=settings.LOG_LEVEL, filter=_console_filter, enqueue=settings.LOG_ENQUEUE)
+else:
+    logger.add(sys.stdout, level=settings.LOG_LEVEL, format=TEXT_FORMAT, filter=_console_filter, enqueue=settings.LOG_ENQUEUE)
+
+if settings.LOG_PAYLOADS:
+    logger.add(
+        settings.LOG_PAYLOAD_PATH,
+        level="DEBUG",
+        filter=lambda record: record["extra"].get("payload", False),
+        rotation=settings.LOG_PAYLOAD_ROTATION,
+        retention=settings.LOG_PAYLOAD_RETENTION,
+        enqueue=True,
+    )
 
 # Intercept standard logging
 logging.basicConfig(handlers=[InterceptHandler()], level=0, force=True)
@@ -0,0 +1,277 @@
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Labels attached to every stage timing and token count
+REQUEST_LABELS = ("route", "project_type", "model", "cache")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: dict, amount: float = 1):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # label values -> [bucket counts..., sum, count]
+        self._values: dict[tuple, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: dict, value: float):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for index, bound in enumerate(self.buckets + (math.inf,)):
+                    count = state[index] if index < len(self.buckets) else state[-1]
+                    labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(state[-2])}")
+                lines.append(f"{self.name}_count{labels} {_format_value(state[-1])}")
+        return lines
+
+
+class Gauge:
+    """
+    Process-wide value without labels (e.g. the current concurrency limit).
+    """
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.value)}",
+        ]
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+STAGE_SECONDS = Histogram(
+    "intellitask_stage_duration_seconds",
+    "Time spent in each processing stage.",
+    ("stage",) + REQUEST_LABELS,
+)
+TOKENS = Counter(
+    "intellitask_tokens_total",
+    "Model tokens reported by usage_metadata.",
+    ("direction",) + REQUEST_LABELS,
+)
+HEDGES = Counter(
+    "intellitask_hedged_calls_total",
+    "Model calls that were hedged, by which request returned first.",
+    ("winner",) + REQUEST_LABELS,
+)
+RETRIES = Counter(
+    "intellitask_model_retries_total",
+    "Model calls retried after a retryable error.",
+    REQUEST_LABELS,
+)
+# Process-wide rather than per request: lookups also happen in background jobs
+CACHE_LOOKUPS = Counter(
+    "intellitask_cache_lookups_total",
+    "Result, upload and context cache lookups by outcome (memory_hit, shared_hit, hit or miss).",
+    ("cache", "outcome"),
+)
+CONCURRENCY_LIMIT = Gauge("intellitask_model_concurrency_limit", "Current adaptive limit on in-flight model calls.")
+CIRCUIT_OPEN = Gauge("intellitask_model_circuit_open", "1 while the model circuit breaker is open.")
+REGISTRY = [STAGE_SECONDS, TOKENS, HEDGES, RETRIES, CACHE_LOOKUPS, CONCURRENCY_LIMIT, CIRCUIT_OPEN]
+
+
+# --- Request context ---
+
+class MetricsContext:
+    """
+    Per-request (or per-job) metric buffer. Observations are held until flush() so they carry the
+    final labels, e.g. the cache outcome that is only known after the lookup.
+    """
+
+    def __init__(self, route: str):
+        self.labels = {"route": route, "project_type": "", "model": "", "cache": ""}
+        self.pending: list[tuple] = []
+        self.flushed = False
+        self._lock = threading.Lock()
+
+    def record(self, metric, extra_labels: dict, value: float):
+        with self._lock:
+            if not self.flushed:
+                self.pending.append((metric, extra_labels, value))
+                return
+        _emit(metric, {**self.labels, **extra_labels}, value)
+
+    def flush(self):
+        with self._lock:
+            pending, self.pending, self.flushed = self.pending, [], True
+        for metric, extra_labels, value in pending:
+            _emit(metric, {**self.labels, **extra_labels}, value)
+
+
+_context: ContextVar[MetricsContext | None] = ContextVar("metrics_context", default=None)
+
+
+def _emit(metric, labels: dict, value: float):
+    if isinstance(metric, Histogram):
+        metric.observe(labels, value)
+    else:
+        metric.inc(labels, value)
+
+
+def _record(metric, extra_labels: dict, value: float):
+    context = _context.get()
+    if context is None:
+        _emit(metric, extra_labels, value)
+    else:
+        context.record(metric, extra_labels, value)
+
+
+def start_context(route: str) -> MetricsContext:
+    context = MetricsContext(route)
+    _context.set(context)
+    return context
+
+
+def set_labels(**labels):
+    """
+    Sets request labels (project_type, model, cache) for everything recorded in the current request.
+    """
+    context = _context.get()
+    if context is not None:
+        context.labels.update({key: str(value) for key, value in labels.items() if value is not None})
+
+
+def observe_stage(stage: str, seconds: float):
+    _record(STAGE_SECONDS, {"stage": stage}, seconds)
+
+
+def record_tokens(usage: dict):
+    for direction in ("input", "output", "cached"):
+        count = usage.get(f"{direction}_tokens")
+        if count:
+            _record(TOKENS, {"direction": direction}, count)
+
+
+def record_hedge(winner: str):
+    _record(HEDGES, {"winner": winner}, 1)
+
+
+def record_retry():
+    _record(RETRIES, {}, 1)
+
+
+def record_cache_lookup(cache: str, outcome: str):
+    CACHE_LOOKUPS.inc({"cache": cache, "outcome": outcome})
+
+
+@contextmanager
+def stage_timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def timed(stage: str):
+    """
+    Decorator timing an async function as a stage.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage_timer(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that opens a MetricsContext per HTTP request and flushes it once the response,
+    including streamed bodies, has been sent. Records the whole request as the "total" stage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = start_context("unmatched")
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router stores the matched route in the scope; use its template to bound label cardinality
+            route = scope.get("route")
+            if route is not None:
+                context.labels["route"] = getattr(route, "path", "unmatched")
+            observe_stage("total", time.perf_counter() - start)
+            context.flush()
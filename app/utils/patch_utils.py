@@ -0,0 +1,32 @@
+import copy
+
+import jsonpatch
+from fastapi import HTTPException
+
+from app.utils.logger import logger
+
+
+def apply_task_patch(previous_data: dict, operations) -> dict:
+    """
+    Validates model-generated RFC 6902 operations and applies them to a copy of previous_data.
+    "test" operations guard against the model addressing the wrong array index.
+    """
+    if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+        logger.error(f"AI patch is not a list of operations: {str(operations)[:200]}")
+        raise HTTPException(status_code=500, detail="AI returned an invalid JSON patch.")
+
+    try:
+        patch = jsonpatch.JsonPatch(operations)
+        updated = patch.apply(copy.deepcopy(previous_data))
+    except jsonpatch.JsonPatchTestFailed as e:
+        logger.error(f"AI patch targets the wrong task: {e}")
+        raise HTTPException(status_code=500, detail="AI patch does not match the previous JSON. Please retry.")
+    except (jsonpatch.JsonPatchException, jsonpatch.JsonPointerException) as e:
+        logger.error(f"AI patch could not be applied: {e}")
+        raise HTTPException(status_code=500, detail="AI returned an invalid JSON patch.")
+
+    if not isinstance(updated, dict):
+        raise HTTPException(status_code=500, detail="AI patch must produce a JSON object.")
+
+    logger.info(f"Applied {len(operations)} patch operations")
+    return updated
@@ -0,0 +1,31 @@
+import asyncio
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.config.config import settings
+from app.utils.logger import logger
+
+# Non-standard "client closed request" status; only visible in access logs since the client is gone
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def run_until_disconnected(request: Request, awaitable, poll_seconds: float | None = None):
+    """
+    Awaits the given coroutine, cancelling it if the client disconnects first (checked every
+    DISCONNECT_POLL_SECONDS). Returns its result, or a 499 response after a disconnect.
+    """
+    poll_seconds = poll_seconds or settings.DISCONNECT_POLL_SECONDS
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}; cancelling its work")
+                task.cancel()
+                return Response(status_code=CLIENT_CLOSED_REQUEST)
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,164 @@
+import math
+import re
+from collections import Counter
+
+from app.utils.logger import logger
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+HTML_TAG = re.compile(r"<[^>]+>")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the this that to with task tasks sub subtask subtasks".split()
+)
+# Queries that address the whole breakdown cannot be answered from a subset
+GLOBAL_QUERY = re.compile(r"\b(all|every|each|entire|whole|overall|everything|reorder|renumber)\b", re.IGNORECASE)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Tasks scoring below this fraction of the best match are treated as unrelated to the query
+MIN_RELATIVE_SCORE = 0.25
+# The outline of unselected tasks is capped so it stays short for very large projects
+OUTLINE_MAX_TASKS = 200
+
+
+def tokenize(text: str) -> list[str]:
+    text = HTML_TAG.sub(" ", text or "").lower()
+    return [token for token in TOKEN_PATTERN.findall(text) if token not in STOPWORDS]
+
+
+class TaskIndex:
+    """
+    In-process BM25 index over a breakdown's tasks. Each task is indexed by its summary and
+    description plus the summaries and descriptions of its sub-tasks.
+    """
+
+    def __init__(self, tasks: list[dict]):
+        self.documents = [Counter(tokenize(self._task_text(task))) for task in tasks]
+        self.lengths = [sum(document.values()) for document in self.documents]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        document_frequency = Counter(token for document in self.documents for token in document)
+        count = len(self.documents)
+        self.idf = {
+            token: math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+            for token, frequency in document_frequency.items()
+        }
+
+    @staticmethod
+    def _task_text(task: dict) -> str:
+        parts = [str(task.get("summary", "")), str(task.get("description", ""))]
+        for subtask in task.get("subTasks") or []:
+            if isinstance(subtask, dict):
+                parts.extend([str(subtask.get("summary", "")), str(subtask.get("description", ""))])
+        return " ".join(parts)
+
+    def scores(self, query: str) -> list[float]:
+        query_tokens = set(tokenize(query))
+        results = []
+        for document, length in zip(self.documents, self.lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / (self.average_length or 1))
+            for token in query_tokens:
+                frequency = document.get(token)
+                if frequency:
+                    score += self.idf[token] * frequency * (BM25_K1 + 1) / (frequency + norm)
+            results.append(score)
+        return results
+
+    def search(self, query: str, limit: int) -> list[int]:
+        """
+        Indexes of the tasks most relevant to the query (at most limit), in their original order.
+        """
+        scores = self.scores(query)
+        best = max(scores, default=0.0)
+        if best <= 0:
+            return []
+        ranked = sorted(
+            (index for index, score in enumerate(scores) if score >= best * MIN_RELATIVE_SCORE),
+            key=lambda index: -scores[index],
+        )
+        return sorted(ranked[:limit])
+
+
+class ScopedEdit:
+    """
+    A query-relevant slice of a breakdown for /edit-json/: the model only sees (and returns) the
+    selected tasks, plus a one-line outline of the others, and merge() splices its result back.
+    """
+
+    def __init__(self, previous_data: dict, selected: list[int]):
+        self.previous_data = previous_data
+        self.selected = selected
+        tasks = previous_data["tasks"]
+        self.scoped_data = {key: value for key, value in previous_data.items() if key != "tasks"}
+        self.scoped_data["tasks"] = [tasks[index] for index in selected]
+
+    def outline(self) -> str:
+        selected = set(self.selected)
+        others = [
+            task.get("summary", "") for index, task in enumerate(self.previous_data["tasks"]) if index not in selected
+        ]
+        lines = [f"- {summary}" for summary in others[:OUTLINE_MAX_TASKS]]
+        if len(others) > OUTLINE_MAX_TASKS:
+            lines.append(f"- ... and {len(others) - OUTLINE_MAX_TASKS} more")
+        return "\n".join(lines)
+
+    def merge(self, updated_scoped: dict) -> dict:
+        """
+        Splices the model's tasks back into the full breakdown. Returned tasks whose summary matches a
+        selected task take its original position; new or renamed tasks follow the last selected task
+        (or go at the end when nothing was selected). Selected tasks missing from the result are deleted,
+        unselected tasks are kept unchanged.
+        A result without a task list (e.g. an error response) is returned unchanged.
+        """
+        if not isinstance(updated_scoped, dict) or not isinstance(updated_scoped.get("tasks"), list):
+            return updated_scoped
+        tasks = self.previous_data["tasks"]
+        slots = {tasks[index].get("summary"): index for index in self.selected}
+        placed, extras = {}, []
+        for task in updated_scoped.get("tasks", []):
+            index = slots.pop(task.get("summary"), None) if isinstance(task, dict) else None
+            if index is None:
+                extras.append(task)
+            else:
+                placed[index] = task
+
+        anchor = self.selected[-1] if self.selected else None
+        selected = set(self.selected)
+        merged_tasks = []
+        for index, task in enumerate(tasks):
+            if index not in selected:
+                merged_tasks.append(task)
+            elif index in placed:
+                merged_tasks.append(placed[index])
+            if index == anchor:
+                merged_tasks.extend(extras)
+        if anchor is None:
+            merged_tasks.extend(extras)
+
+        merged = dict(self.previous_data)
+        merged.update({key: value for key, value in updated_scoped.items() if key != "tasks"})
+        merged["tasks"] = merged_tasks
+        return merged
+
+
+def scope_edit(previous_data: dict, query: str, max_tasks: int) -> ScopedEdit | None:
+    """
+    Returns a ScopedEdit for large breakdowns, or None when the full JSON should be sent:
+    the breakdown is small, has no flat task list, the query addresses the whole project,
+    or no task matches the query.
+    """
+    tasks = previous_data.get("tasks")
+    if not isinstance(tasks, list) or len(tasks) <= max_tasks:
+        return None
+    if not all(isinstance(task, dict) for task in tasks):
+        return None
+    if GLOBAL_QUERY.search(query):
+        logger.info("Edit query addresses the whole project; sending all tasks")
+        return None
+
+    selected = TaskIndex(tasks).search(query, max_tasks)
+    if not selected:
+        # Nothing matches the query lexically; an empty scope would leave the model nothing to edit
+        logger.info("No tasks match the edit query; sending all tasks")
+        return None
+    logger.info(f"Scoped edit: sending {len(selected)} of {len(tasks)} tasks")
+    return ScopedEdit(previous_data, selected)
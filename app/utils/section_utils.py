@@ -0,0 +1,96 @@
+import re
+
+# "# Heading" (DOCX headings are rendered this way by extract_text_from_docx)
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+\S")
+# "3 Login", "3.2 Password reset", "4.1.2. Audit log" (typical numbered FRS headings in PDFs)
+NUMBERED_HEADING = re.compile(r"^(\d+(?:\.\d+)*)\.?\s+[A-Z][^.!?]{0,80}$")
+MAX_HEADING_LENGTH = 100
+
+
+def heading_level(line: str) -> int | None:
+    """
+    Returns the outline level of a heading line, or None if the line is body text.
+    """
+    line = line.strip()
+    if not line or len(line) > MAX_HEADING_LENGTH:
+        return None
+
+    match = MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1))
+
+    match = NUMBERED_HEADING.match(line)
+    if match:
+        return match.group(1).count(".") + 1
+
+    return None
+
+
+def split_into_sections(text: str, max_chars: int, min_chars: int = 0) -> list[str]:
+    """
+    Splits document text into sections at its heading structure.
+    - splits at the shallowest heading level that produces more than one section
+    - sections above max_chars are split again at deeper headings, then at paragraph breaks
+    - adjacent sections below min_chars are merged so tiny headings don't each cost a model call
+    The result is deterministic for a given text.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    if len(text) <= max_chars:
+        return [text]
+
+    lines = text.split("\n")
+    levels = sorted({level for level in map(heading_level, lines) if level is not None})
+
+    for level in levels:
+        parts = _split_at_level(lines, level)
+        if len(parts) > 1:
+            sections = []
+            for part in parts:
+                sections.extend(split_into_sections(part, max_chars, min_chars) if len(part) > max_chars else [part])
+            return _merge_small(sections, max_chars, min_chars)
+
+    return _split_paragraphs(text, max_chars)
+
+
+def _split_at_level(lines: list[str], level: int) -> list[str]:
+    parts, current = [], []
+    for line in lines:
+        line_level = heading_level(line)
+        if line_level is not None and line_level <= level and current:
+            parts.append("\n".join(current).strip())
+            current = []
+        current.append(line)
+    if current:
+        parts.append("\n".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _split_paragraphs(text: str, max_chars: int) -> list[str]:
+    """
+    Fallback for sections without usable headings: pack paragraphs up to max_chars.
+    """
+    sections, current = [], ""
+    for paragraph in text.split("\n"):
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            sections.append(current)
+            current = ""
+        while len(paragraph) > max_chars:
+            sections.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current.strip():
+        sections.append(current)
+    return sections
+
+
+def _merge_small(sections: list[str], max_chars: int, min_chars: int) -> list[str]:
+    merged = []
+    for section in sections:
+        if merged and (len(merged[-1]) < min_chars or len(section) < min_chars) \
+                and len(merged[-1]) + len(section) + 2 <= max_chars:
+            merged[-1] = f"{merged[-1]}\n\n{section}"
+        else:
+            merged.append(section)
+    return merged
@@ -0,0 +1,160 @@
+import os
+import sqlite3
+import threading
+import time
+
+import zstandard
+
+from app.config.config import settings
+from app.utils.logger import logger
+
+# Reads refresh an entry's access time at most this often, so hot keys do not turn every read into a write
+ACCESS_RESOLUTION_SECONDS = 60
+# Eviction runs after this many writes or this much time since the last run in the process
+EVICT_EVERY_WRITES = 50
+EVICT_INTERVAL_SECONDS = 30
+# Eviction trims the cache to this fraction of max_bytes so it does not run again on the next write
+EVICT_TARGET_RATIO = 0.9
+COMPRESSION_LEVEL = 3
+
+
+class SharedCache:
+    """
+    Key-value cache shared by every worker process on the host through one SQLite file in WAL mode,
+    so a value cached by one worker is a hit in all of them and survives restarts.
+    Values are bytes, stored zstd-compressed under a namespace. Entries expire after their TTL
+    (capped at max_age_seconds); past max_bytes of compressed values, the least recently used are evicted.
+    The connection is opened lazily per process, so instances created before a fork stay safe.
+    All methods are blocking; call them through asyncio.to_thread from async code.
+    """
+
+    def __init__(self, path: str | None = None, max_bytes: int | None = None, max_age_seconds: int | None = None):
+        self.path = path or settings.SHARED_CACHE_PATH
+        self.max_bytes = max_bytes or settings.SHARED_CACHE_MAX_BYTES
+        self.max_age_seconds = max_age_seconds or settings.SHARED_CACHE_MAX_AGE_SECONDS
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._last_evict = time.monotonic()
+
+    def get(self, namespace: str, key: str) -> bytes | None:
+        """
+        Returns the value, or None if it is missing, expired or the cache cannot be read.
+        """
+        try:
+            with self._lock:
+                db = self._connect()
+                now = time.time()
+                row = db.execute(
+                    "SELECT value, expires, accessed FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if row is None:
+                    return None
+                value, expires, accessed = row
+                if expires <= now:
+                    db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                    return None
+                if now - accessed > ACCESS_RESOLUTION_SECONDS:
+                    db.execute("UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?", (now, namespace, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed for {namespace}/{key}: {e}")
+            return None
+        try:
+            return zstandard.decompress(value)
+        except zstandard.ZstdError as e:
+            logger.warning(f"Discarding unreadable shared cache entry {namespace}/{key}: {e}")
+            self.delete(namespace, key)
+            return None
+
+    def set(self, namespace: str, key: str, value: bytes, ttl_seconds: float | None = None):
+        """
+        Stores the value for ttl_seconds (default and cap: max_age_seconds). Failures are logged, not raised.
+        """
+        ttl_seconds = min(ttl_seconds or self.max_age_seconds, self.max_age_seconds)
+        if ttl_seconds <= 0:
+            return
+        compressed = zstandard.compress(value, COMPRESSION_LEVEL)
+        try:
+            with self._lock:
+                now = time.time()
+                self._connect().execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, expires, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, compressed, len(compressed), now + ttl_seconds, now),
+                )
+                self._writes += 1
+                if self._writes >= EVICT_EVERY_WRITES or time.monotonic() - self._last_evict > EVICT_INTERVAL_SECONDS:
+                    self._evict()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed for {namespace}/{key}: {e}")
+
+    def delete(self, namespace: str, key: str):
+        try:
+            with self._lock:
+                self._connect().execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache delete failed for {namespace}/{key}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+            ).fetchall()
+        return {namespace: {"entries": count, "bytes": size} for namespace, count, size in rows}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Autocommit mode: every statement is its own short transaction
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        # auto_vacuum only takes effect on a new database, before the first table is created
+        db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, "
+            "size INTEGER NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        db.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)")
+        self._connection, self._pid = db, os.getpid()
+        return db
+
+    def _evict(self):
+        """
+        Drops expired entries, then the least recently used ones until the cache is below its size target.
+        Called with the lock held.
+        """
+        self._writes = 0
+        self._last_evict = time.monotonic()
+        db = self._connection
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            expired = db.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),)).rowcount
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            evicted = 0
+            if total > self.max_bytes:
+                excess = total - int(self.max_bytes * EVICT_TARGET_RATIO)
+                victims, freed = [], 0
+                for namespace, key, size in db.execute(
+                    "SELECT namespace, key, size FROM entries ORDER BY accessed"
+                ).fetchall():
+                    victims.append((namespace, key))
+                    freed += size
+                    if freed >= excess:
+                        break
+                db.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+                evicted = len(victims)
+            db.execute("COMMIT")
+            if expired or evicted:
+                db.execute("PRAGMA incremental_vacuum")
+                logger.info(f"Shared cache evicted {expired} expired and {evicted} least recently used entries")
+        except sqlite3.Error as e:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            logger.warning(f"Shared cache eviction failed: {e}")
+
+
+shared_cache = SharedCache()
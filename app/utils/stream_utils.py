@@ -0,0 +1,90 @@
+import json
+
+from app.utils.logger import logger
+
+
+class TaskStreamParser:
+    """
+    Incremental JSON scanner for streamed model output of the form {"project_name": ..., "tasks": [{...}, ...]}.
+    Feed it text chunks as they arrive; it returns each top-level task object as soon as its closing
+    brace is seen. Leading markdown fences or prose before the first "{" are ignored.
+    """
+
+    def __init__(self):
+        # Chunks are kept as received and joined once, when the whole document is needed
+        self.chunks: list[str] = []
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.last_key = None
+        self.pending_key = None
+        self.tasks_depth = None
+        # Text of the open top-level string or task seen in earlier chunks; None when none is open
+        self.key_parts: list[str] | None = None
+        self.task_parts: list[str] | None = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+    def feed(self, chunk: str) -> list[dict]:
+        self.chunks.append(chunk)
+        completed = []
+        # Where the open string or task begins within this chunk
+        key_start = 0
+        task_start = 0
+
+        for index, char in enumerate(chunk):
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == "\\":
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    # Remember strings at the top-level object as candidate keys
+                    if self.key_parts is not None:
+                        self.pending_key = "".join(self.key_parts) + chunk[key_start:index]
+                        self.key_parts = None
+                continue
+
+            if char == '"':
+                if self.depth > 0:
+                    self.in_string = True
+                    if self.depth == 1 and self.tasks_depth is None:
+                        self.key_parts = []
+                        key_start = index + 1
+            elif char == ":":
+                if self.depth == 1:
+                    self.last_key = self.pending_key
+            elif char == ",":
+                if self.depth == 1:
+                    self.last_key = None
+            elif char in "{[":
+                if self.depth == 1 and char == "[" and self.last_key == "tasks":
+                    self.tasks_depth = self.depth + 1
+                elif char == "{" and self.tasks_depth is not None and self.depth == self.tasks_depth:
+                    self.task_parts = []
+                    task_start = index
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if char == "}" and self.task_parts is not None and self.depth == self.tasks_depth:
+                    completed.append(self._decode("".join(self.task_parts) + chunk[task_start:index + 1]))
+                    self.task_parts = None
+                elif char == "]" and self.tasks_depth is not None and self.depth == self.tasks_depth - 1:
+                    self.tasks_depth = None
+
+        if self.key_parts is not None:
+            self.key_parts.append(chunk[key_start:])
+        if self.task_parts is not None:
+            self.task_parts.append(chunk[task_start:])
+        return [task for task in completed if task is not None]
+
+    @staticmethod
+    def _decode(fragment: str) -> dict | None:
+        try:
+            return json.loads(fragment)
+        except json.JSONDecodeError as e:
+            logger.warning("Skipping malformed streamed task: {}", e)
+            return None
@@ -14,6 +14,37 @@ def validate_project_type(project_type: str):
         raise
 
 
+def validate_ingest_mode(ingest_mode: str):
+    if ingest_mode not in ("auto", "text", "file"):
+        logger.warning(f"Invalid ingest_mode: {ingest_mode}")
+        raise HTTPException(status_code=400, detail="ingest_mode must be 'auto', 'text' or 'file'.")
+
+
+def validate_edit_mode(edit_mode: str):
+    if edit_mode not in ("full", "patch"):
+        logger.warning(f"Invalid edit_mode: {edit_mode}")
+        raise HTTPException(status_code=400, detail="edit_mode must be 'full' or 'patch'.")
+
+
+def validate_json_encoding(json_encoding: str):
+    if json_encoding not in ("pretty", "minified", "tabular"):
+        logger.warning(f"Invalid json_encoding: {json_encoding}")
+        raise HTTPException(status_code=400, detail="json_encoding must be 'pretty', 'minified' or 'tabular'.")
+
+
+def validate_latency_budget(latency_budget: float | None):
+    if latency_budget is not None and latency_budget <= 0:
+        logger.warning(f"Invalid latency_budget: {latency_budget}")
+        raise HTTPException(status_code=400, detail="latency_budget must be a positive number of seconds.")
+
+
+def is_cache_bypass(header_value: str | None) -> bool:
+    """
+    Interprets the X-Cache-Bypass request header.
+    """
+    return (header_value or "").strip().lower() in ("1", "true", "yes")
+
+
 def validate_json_string(json_str: str) -> dict:
     """
     Validates JSON string and normalizes it to a dictionary format.
@@ -64,25 +95,30 @@ def parse_tech_stack(tech_stack: str | None) -> list[str]:
         raise
 
 
+VALID_PRIORITIES = {"None", "Low", "Medium", "High"}
+
+
+def normalize_priority(value) -> str:
+    """
+    Maps a raw priority to one of: None, Low, Medium, High. Anything else becomes 'None'.
+    """
+    if isinstance(value, str):
+        v = value.strip().capitalize()
+        return v if v in VALID_PRIORITIES else "None"
+    return "None"
+
+
 def sanitize_priorities(data: dict) -> dict:
     """
     Ensures all task and subtask priorities are strictly one of: None, Low, Medium, High.
     Any other value is replaced with 'None'.
     """
-    valid_values = {"None", "Low", "Medium", "High"}
-
-    def normalize(value):
-        if isinstance(value, str):
-            v = value.strip().capitalize()
-            return v if v in valid_values else "None"
-        return "None"
-
     if "tasks" in data and isinstance(data["tasks"], list):
         for task in data["tasks"]:
-            task["priority"] = normalize(task.get("priority"))
+            task["priority"] = normalize_priority(task.get("priority"))
             if "subTasks" in task and isinstance(task["subTasks"], list):
                 for sub in task["subTasks"]:
-                    sub["priority"] = normalize(sub.get("priority"))
+                    sub["priority"] = normalize_priority(sub.get("priority"))
 
     return data
 
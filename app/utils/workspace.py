@@ -0,0 +1,222 @@
+import asyncio
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from fastapi import HTTPException
+
+from app.config.config import settings
+from app.utils.logger import logger
+
+
+LEDGER_FILENAME = ".usage.db"
+
+
+class _UsageLedger:
+    """
+    Bytes reserved by each open workspace under one root, kept in a SQLite file in that root so
+    every worker process on the host checks the quota against the same total.
+    Workspaces left behind by a crashed process keep their rows until cleanup_stale_workspaces
+    removes their directories, since until then they still occupy the disk.
+    """
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, LEDGER_FILENAME)
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def reserve(self, workspace: str, num_bytes: int, quota_bytes: int) -> bool:
+        """
+        Adds num_bytes to the workspace's reservation unless that would take the total over quota_bytes.
+        """
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM usage").fetchone()[0]
+                if total + num_bytes > quota_bytes:
+                    db.execute("ROLLBACK")
+                    return False
+                db.execute(
+                    "INSERT INTO usage (workspace, bytes) VALUES (?, ?) "
+                    "ON CONFLICT (workspace) DO UPDATE SET bytes = bytes + excluded.bytes",
+                    (workspace, num_bytes),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                raise
+        return True
+
+    def release(self, workspace: str):
+        with self._lock:
+            self._connect().execute("DELETE FROM usage WHERE workspace = ?", (workspace,))
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COALESCE(SUM(bytes), 0) FROM usage").fetchone()[0]
+
+    def forget_missing(self):
+        """
+        Drops reservations of workspaces whose directory no longer exists.
+        """
+        with self._lock:
+            db = self._connect()
+            workspaces = [row[0] for row in db.execute("SELECT workspace FROM usage").fetchall()]
+            missing = [(workspace,) for workspace in workspaces if not os.path.isdir(workspace)]
+            db.executemany("DELETE FROM usage WHERE workspace = ?", missing)
+        if missing:
+            logger.info(f"Released {len(missing)} workspace reservations left by stopped processes")
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is not None and self._pid == os.getpid():
+            return self._connection
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Autocommit mode: every statement is its own short transaction unless BEGIN is explicit
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("CREATE TABLE IF NOT EXISTS usage (workspace TEXT PRIMARY KEY, bytes INTEGER NOT NULL)")
+        self._connection, self._pid = db, os.getpid()
+        return db
+
+
+_ledgers: dict[str, _UsageLedger] = {}
+_ledgers_lock = threading.Lock()
+
+
+def _ledger(root: str) -> _UsageLedger:
+    with _ledgers_lock:
+        ledger = _ledgers.get(root)
+        if ledger is None:
+            ledger = _ledgers[root] = _UsageLedger(root)
+        return ledger
+
+
+class RequestWorkspace:
+    """
+    Isolated scratch directory for one request.
+    Every upload and derived artifact (e.g. converted PDFs) lives inside it and is
+    removed when the request finishes or fails. Bytes written through reserve() count against
+    a quota shared by every process using the same root, so sustained load cannot fill the disk.
+    """
+
+    def __init__(self, root: str | None = None, quota_bytes: int | None = None):
+        self.root = root or settings.WORKSPACE_ROOT
+        self.quota_bytes = quota_bytes or settings.WORKSPACE_QUOTA_BYTES
+        self.path = os.path.join(self.root, uuid.uuid4().hex)
+        self._ledger = _ledger(self.root)
+        self.artifacts: set[str] = set()
+        self.reserved_bytes = 0
+
+    def open(self) -> "RequestWorkspace":
+        os.makedirs(self.path, exist_ok=True)
+        return self
+
+    def new_path(self, ext: str) -> str:
+        return os.path.join(self.path, f"{uuid.uuid4()}{ext}")
+
+    def reserve(self, num_bytes: int):
+        """
+        Accounts for bytes about to be written. Safe to call from worker threads.
+        """
+        try:
+            reserved = self._ledger.reserve(self.path, num_bytes, self.quota_bytes)
+        except sqlite3.Error as e:
+            # The quota is a safety net; a broken ledger should not fail uploads
+            logger.warning(f"Workspace usage ledger unavailable: {e}")
+            reserved = True
+        if not reserved:
+            logger.warning(f"Workspace quota of {self.quota_bytes} bytes exhausted")
+            raise HTTPException(status_code=507, detail="Server is out of temporary storage. Please retry shortly.")
+        self.reserved_bytes += num_bytes
+
+    def track(self, file_path: str):
+        """
+        Registers a derived artifact and accounts for its size if it was not written through reserve().
+        """
+        if file_path in self.artifacts:
+            return
+        self.artifacts.add(file_path)
+        if os.path.dirname(file_path) != self.path:
+            logger.warning(f"Artifact {file_path} is outside workspace {self.path}")
+        elif os.path.exists(file_path):
+            self.reserve(os.path.getsize(file_path))
+
+    def adopt(self, file_path: str) -> str:
+        """
+        Hard-links (or, across filesystems, copies) a file from elsewhere into this workspace and
+        returns the new path, so the file survives the removal of the workspace it came from.
+        Links take no extra space; only copies count against the quota.
+        """
+        path = self.new_path(os.path.splitext(file_path)[1])
+        try:
+            os.link(file_path, path)
+        except OSError:
+            self.reserve(os.path.getsize(file_path))
+            shutil.copyfile(file_path, path)
+        self.artifacts.add(path)
+        return path
+
+    def detach(self):
+        """
+        Hands the directory over to a longer-lived owner (e.g. a queued job): the files are kept
+        but no longer count against the quota.
+        """
+        self._release()
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        logger.debug(f"Removed workspace {self.path} ({self.reserved_bytes} bytes)")
+        self._release()
+
+    def _release(self):
+        if self.reserved_bytes:
+            try:
+                self._ledger.release(self.path)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not release workspace reservation for {self.path}: {e}")
+        self.reserved_bytes = 0
+
+    @staticmethod
+    def usage_bytes(root: str | None = None) -> int:
+        """
+        Bytes reserved by all processes' open workspaces under root.
+        """
+        return _ledger(root or settings.WORKSPACE_ROOT).total_bytes()
+
+
+def cleanup_stale_workspaces(root: str | None = None, max_age_seconds: int | None = None):
+    """
+    Removes workspaces left behind by crashed or killed processes.
+    """
+    root = root or settings.WORKSPACE_ROOT
+    max_age_seconds = max_age_seconds or settings.WORKSPACE_STALE_SECONDS
+    if not os.path.isdir(root):
+        return
+
+    cutoff = time.time() - max_age_seconds
+    for entry in os.scandir(root):
+        if entry.is_dir() and entry.stat().st_mtime < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            logger.info(f"Removed stale workspace {entry.path}")
+    try:
+        _ledger(root).forget_missing()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not clean the workspace usage ledger: {e}")
+
+
+async def get_workspace():
+    """
+    FastAPI dependency yielding a RequestWorkspace that is cleaned up after the request.
+    """
+    workspace = await asyncio.to_thread(RequestWorkspace().open)
+    try:
+        yield workspace
+    finally:
+        await asyncio.to_thread(workspace.close)
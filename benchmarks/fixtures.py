@@ -0,0 +1,98 @@
+"""
+Deterministic stand-ins for recorded model outputs, in the shape gemini returns them:
+fenced JSON, mixed-case or invalid priorities, HTML descriptions and two to four sub-tasks per task.
+The same size always produces byte-identical output, so timings are comparable across runs.
+"""
+import json
+import random
+
+SIZES = {"small": 10, "medium": 200, "large": 2000}
+
+CATEGORIES = ["UI/UX", "FE", "BE", "DevOps"]
+FEATURES = [
+    "user login", "password reset", "dashboard charts", "payment gateway", "invoice export",
+    "user profile", "notification emails", "search filters", "audit log", "role permissions",
+]
+TECH = ["React", "FastAPI", "PostgreSQL", "Redis", "Docker", "AWS ECS"]
+PRIORITIES = ["High", "Medium", "Low", "None", "high", "MEDIUM", "Critical", "urgent", None]
+POINTS = {1: "01:00", 3: "03:00", 5: "05:00", 8: "08:00", 13: "13:00"}
+
+
+def _description(rng: random.Random, feature: str) -> str:
+    return (
+        "<p class='TextEditor__paragraph' dir='ltr'>"
+        f"Implement {feature} using {rng.choice(TECH)} with validation, error handling and tests.</p>"
+    )
+
+
+def _subtask(rng: random.Random, feature: str, index: int) -> dict:
+    points = rng.choice(list(POINTS))
+    return {
+        "summary": f"{rng.choice(CATEGORIES)}: {feature} step {index}",
+        "description": _description(rng, feature),
+        "issueType": "Task",
+        "priority": rng.choice(PRIORITIES),
+        "startDate": None,
+        "dueDate": None,
+        "originalEstimate": POINTS[points],
+        "storyPoint": points,
+    }
+
+
+def project(num_tasks: int, seed: int = 0) -> dict:
+    rng = random.Random(seed * 100_003 + num_tasks)
+    tasks = []
+    for index in range(num_tasks):
+        feature = f"{FEATURES[index % len(FEATURES)]} {index // len(FEATURES)}"
+        subtasks = [_subtask(rng, feature, j) for j in range(rng.randint(2, 4))]
+        hours = sum(int(sub["originalEstimate"].split(":")[0]) for sub in subtasks)
+        tasks.append({
+            "summary": f"{rng.choice(CATEGORIES)}: Build {feature}",
+            "description": _description(rng, feature),
+            "issueType": rng.choice(["Story", "Task"]),
+            "priority": rng.choice(PRIORITIES),
+            "startDate": None,
+            "dueDate": None,
+            "originalEstimate": f"{hours:02d}:00",
+            "storyPoint": rng.choice(list(POINTS)),
+            "subTasks": subtasks,
+        })
+    return {"project_name": f"Benchmark project {num_tasks}", "tasks": tasks}
+
+
+def model_output(num_tasks: int) -> str:
+    """
+    Raw model response text: pretty-printed JSON inside a ```json fence.
+    """
+    return "```json\n" + json.dumps(project(num_tasks), indent=2) + "\n```"
+
+
+def with_ids(data: dict) -> dict:
+    """
+    The same breakdown as a client would send back to /edit-json/, with ids assigned.
+    """
+    next_id = 1
+    for task in data["tasks"]:
+        task["id"] = next_id
+        next_id += 1
+        for subtask in task["subTasks"]:
+            subtask["id"] = next_id
+            next_id += 1
+    return data
+
+
+def scrum_project(num_tasks: int) -> dict:
+    """
+    Sprint-shaped breakdown (one sprint per 10 tasks) with names that need sanitizing.
+    Sprint task lists are left empty: name sanitizing never looks at them, and copying them
+    would dominate the benchmark's setup time.
+    """
+    sprints = [
+        {
+            "name": f"Sprint #{index + 1}: {FEATURES[index % len(FEATURES)]} & polish!!",
+            "description": "Sprint goal",
+            "tasks": [],
+        }
+        for index in range(max(1, num_tasks // 10))
+    ]
+    return {"project_name": f"Benchmark project {num_tasks}", "sprints": sprints}
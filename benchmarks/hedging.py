@@ -0,0 +1,114 @@
+"""
+Simulates ModelRouter hedging against a fake backend with injected heavy-tailed latency.
+
+    python -m benchmarks.hedging
+    python -m benchmarks.hedging --calls 2000 --straggler-rate 0.05 --percentile 0.9
+
+Each call's latency is lognormal around --median, and a --straggler-rate fraction of calls is
+--straggler-factor times slower. The same seeded latencies are replayed with hedging off and on,
+and the run reports latency percentiles, the hedge rate and how many hedges won.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("LOG_ENQUEUE", "false")
+
+from app.services.model_router import ModelRouter
+
+
+class FakeBackend:
+    """
+    Returns after a pre-sampled latency; tracks how many calls were started and cancelled.
+    """
+
+    def __init__(self, latencies: list[float]):
+        self.latencies = latencies
+        self.started = 0
+        self.cancelled = 0
+
+    async def generate(self) -> str:
+        latency = self.latencies[self.started % len(self.latencies)]
+        self.started += 1
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return "ok"
+
+
+def sample_latencies(args, rng: random.Random) -> list[float]:
+    latencies = []
+    for _ in range(args.calls * 2):
+        latency = rng.lognormvariate(0, args.sigma) * args.median
+        if rng.random() < args.straggler_rate:
+            latency *= args.straggler_factor
+        latencies.append(latency)
+    return latencies
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+async def simulate(args, hedge: bool) -> dict:
+    backend = FakeBackend(sample_latencies(args, random.Random(args.seed)))
+    router = ModelRouter(
+        [("fake-model", float("inf"))],
+        hedge_enabled=hedge,
+        hedge_percentile=args.percentile,
+        hedge_max_ratio=args.max_ratio,
+        window=200,
+        min_samples=20,
+    )
+    semaphore = asyncio.Semaphore(args.concurrency)
+    durations = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await router.call("fake-model", "generate", backend.generate)
+            durations.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(args.calls)))
+    return {
+        "p50": percentile(durations, 0.5),
+        "p99": percentile(durations, 0.99),
+        "max": max(durations),
+        "backend_calls": backend.started,
+        "hedges": router.hedges,
+        "cancelled": backend.cancelled,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--median", type=float, default=0.05, help="median latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.3)
+    parser.add_argument("--straggler-rate", type=float, default=0.03)
+    parser.add_argument("--straggler-factor", type=float, default=20)
+    parser.add_argument("--percentile", type=float, default=0.95)
+    parser.add_argument("--max-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    print(f"{'':<10} {'p50':>8} {'p99':>8} {'max':>8} {'calls':>7} {'hedges':>7} {'cancelled':>10}")
+    for hedge in (False, True):
+        result = asyncio.run(simulate(args, hedge))
+        print(
+            f"{'hedged' if hedge else 'baseline':<10} {result['p50']:>7.3f}s {result['p99']:>7.3f}s "
+            f"{result['max']:>7.3f}s {result['backend_calls']:>7} {result['hedges']:>7} {result['cancelled']:>10}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
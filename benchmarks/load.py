@@ -0,0 +1,112 @@
+"""
+Closed-loop load generator for /analyze/ and /edit-json/.
+
+Start the API against recorded model calls so no network access or API key is needed:
+
+    GENAI_BACKEND=record uvicorn app.main:app                      # once, with a real key, to fill the cassette
+    GENAI_BACKEND=replay uvicorn app.main:app --workers 4
+    python -m benchmarks.load analyze --file docs/frs.pdf --requests 200 --concurrency 32
+    python -m benchmarks.load edit-json --previous-json out.json --query "Add a login task"
+
+Requests bypass the result cache so every one reaches the model backend. Reports throughput,
+latency percentiles and error counts.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def build_request(args) -> dict:
+    files = []
+    for path in args.file:
+        with open(path, "rb") as f:
+            files.append(("files", (os.path.basename(path), f.read())))
+
+    if args.route == "analyze":
+        data = {"project_type": args.project_type, "ingest_mode": args.ingest_mode}
+        if args.tech_stack:
+            data["tech_stack"] = args.tech_stack
+        return {"url": "/analyze/", "data": data, "files": files}
+
+    with open(args.previous_json) as f:
+        previous_json = f.read()
+    data = {
+        "previous_json": previous_json,
+        "query": args.query,
+        "ingest_mode": args.ingest_mode,
+        "edit_mode": args.edit_mode,
+        "json_encoding": args.json_encoding,
+    }
+    return {"url": "/edit-json/", "data": data, "files": files or None}
+
+
+async def run(args) -> int:
+    request = build_request(args)
+    latencies, statuses = [], Counter()
+    remaining = iter(range(args.requests))
+    timeout = httpx.Timeout(args.timeout)
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout, headers={"X-Cache-Bypass": "true"}) as client:
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(request["url"], data=request["data"], files=request["files"])
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                    continue
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    print(f"{args.route}: {args.requests} requests, concurrency {args.concurrency}, {elapsed:.1f}s")
+    print(f"  throughput  {len(latencies) / elapsed:.2f} req/s")
+    if latencies:
+        print(
+            f"  latency     p50 {percentile(latencies, 0.5):.2f}s  p95 {percentile(latencies, 0.95):.2f}s  "
+            f"p99 {percentile(latencies, 0.99):.2f}s  max {max(latencies):.2f}s"
+        )
+    print(f"  responses   {dict(statuses)}")
+    return 0 if statuses.get(200, 0) == args.requests else 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("route", choices=["analyze", "edit-json"])
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--file", action="append", default=[], help="document to upload (repeatable)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--ingest-mode", default="auto")
+    parser.add_argument("--project-type", default="Scrum")
+    parser.add_argument("--tech-stack", default="")
+    parser.add_argument("--previous-json", help="breakdown to edit (edit-json)")
+    parser.add_argument("--query", default="Add a task for audit logging")
+    parser.add_argument("--edit-mode", default="full")
+    parser.add_argument("--json-encoding", default="pretty")
+    args = parser.parse_args(argv)
+
+    if args.route == "analyze" and not args.file:
+        parser.error("analyze needs at least one --file")
+    if args.route == "edit-json" and not args.previous_json:
+        parser.error("edit-json needs --previous-json")
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+Offline micro-benchmarks for the CPU-bound post-processing of model output.
+
+    python -m benchmarks.run                  # compare against benchmarks/baselines.json
+    python -m benchmarks.run --update         # re-record baselines
+    python -m benchmarks.run -k validate      # only cases whose name contains "validate"
+
+Each case is timed as the best of several repeats, and each repeat runs enough iterations to
+take at least MIN_REPEAT_SECONDS. Timings are divided by a calibration case (stdlib JSON and plain
+Python on fixed data, independent of the app code) measured just before each case in the same
+process, so baselines are relative costs that carry over between machines. A case fails when it is still slower than its
+baseline by more than the threshold (default 1.5, i.e. 50%) after CONFIRM_ATTEMPTS re-measurements;
+on a quiet machine a tighter --threshold such as 1.2 is practical.
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+# Keep log output and the GenAI client out of the measurements
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("LOG_ENQUEUE", "false")
+os.environ.setdefault("GOOGLE_GENAI_API_KEY", "benchmark")
+
+import orjson
+
+from app.models import ProjectAdapter
+from app.routes.analyze import validate_and_preserve_ids
+from app.utils.ai_utils import clean_ai_response, parse_ai_json
+from app.utils.other_utils import calculate_total_estimate_hours
+from app.utils.validation_utils import sanitize_priorities, sanitize_release_and_sprint_names
+from benchmarks import fixtures
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_THRESHOLD = 1.5
+REPEATS = 7
+MIN_REPEAT_SECONDS = 0.05
+MAX_ITERATIONS = 2000
+CONFIRM_ATTEMPTS = 2
+
+
+# Fixed input for the calibration case; never change it without re-recording every baseline
+_CALIBRATION_DATA = [
+    {"id": index, "summary": f"Task {index}", "tags": [f"tag-{tag}" for tag in range(5)], "hours": index % 8}
+    for index in range(200)
+]
+
+
+def _calibration_workload():
+    data = json.loads(json.dumps(_CALIBRATION_DATA))
+    return sorted((task["hours"], task["summary"]) for task in data if task["tags"])
+
+
+def _edited(previous: dict) -> dict:
+    # Model output for an edit: same tasks without ids, every tenth summary changed
+    updated = orjson.loads(orjson.dumps(previous))
+    for index, task in enumerate(updated["tasks"]):
+        task.pop("id", None)
+        for subtask in task["subTasks"]:
+            subtask.pop("id", None)
+        if index % 10 == 0:
+            task["summary"] += " (revised)"
+    return updated
+
+
+def build_cases(num_tasks: int) -> dict:
+    """
+    Returns {case name: (function, make_input, fresh)}. make_input runs outside the timed region and
+    returns the argument tuple; cases with fresh=True mutate their input and get a new copy per call.
+    """
+    raw = fixtures.model_output(num_tasks)
+    cleaned = clean_ai_response(raw)
+    data_bytes = orjson.dumps(json.loads(cleaned))
+    sanitized = sanitize_priorities(orjson.loads(data_bytes))
+    scrum_bytes = orjson.dumps(fixtures.scrum_project(num_tasks))
+    previous = fixtures.with_ids(copy.deepcopy(sanitized))
+    updated_bytes = orjson.dumps(_edited(previous))
+
+    return {
+        "clean_ai_response": (clean_ai_response, lambda: (raw,), False),
+        "parse_ai_json": (parse_ai_json, lambda: (raw,), False),
+        "sanitize_priorities": (sanitize_priorities, lambda: (orjson.loads(data_bytes),), True),
+        "sanitize_release_and_sprint_names": (
+            sanitize_release_and_sprint_names, lambda: (orjson.loads(scrum_bytes),), True
+        ),
+        "project_validate_json": (ProjectAdapter.validate_json, lambda: (cleaned,), False),
+        "project_validate_python": (ProjectAdapter.validate_python, lambda: (sanitized,), False),
+        "calculate_total_estimate_hours": (calculate_total_estimate_hours, lambda: (sanitized,), False),
+        "validate_and_preserve_ids": (
+            validate_and_preserve_ids, lambda: (previous, orjson.loads(updated_bytes)), True
+        ),
+    }
+
+
+def measure(function, make_input, fresh: bool) -> float:
+    """
+    Best-of-REPEATS seconds per call.
+    """
+    shared = None if fresh else make_input()
+
+    def run_once(number: int) -> float:
+        inputs = [make_input() for _ in range(number)] if fresh else [shared] * number
+        start = time.perf_counter()
+        for args in inputs:
+            function(*args)
+        return (time.perf_counter() - start) / number
+
+    number = 1
+    best = run_once(number)
+    while best * number < MIN_REPEAT_SECONDS and number < MAX_ITERATIONS:
+        number = min(number * 2, MAX_ITERATIONS)
+        best = run_once(number)
+
+    for _ in range(REPEATS - 1):
+        best = min(best, run_once(number))
+    return best
+
+
+def measure_relative(function, make_input, fresh: bool) -> float:
+    """
+    Cost of one call in units of the calibration case, measured right before it so both see
+    the same machine state (frequency scaling, noisy neighbours).
+    """
+    calibration = measure(_calibration_workload, lambda: (), False)
+    return measure(function, make_input, fresh) / calibration
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="write the measured costs as the new baselines")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown ratio")
+    parser.add_argument("-k", dest="keyword", default="", help="only run cases whose name contains this text")
+    args = parser.parse_args(argv)
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH) as f:
+            baselines = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'case':<52} {'cost':>10} {'baseline':>10} {'ratio':>7}")
+    for size_name, num_tasks in fixtures.SIZES.items():
+        for case_name, (function, make_input, fresh) in build_cases(num_tasks).items():
+            name = f"{case_name}[{size_name}]"
+            if args.keyword not in name:
+                continue
+            cost = measure_relative(function, make_input, fresh)
+            baseline = baselines.get(name)
+            attempts = 0
+            while not args.update and baseline and cost / baseline > args.threshold and attempts < CONFIRM_ATTEMPTS:
+                # Confirm before reporting: a noisy measurement should not fail the run
+                cost = min(cost, measure_relative(function, make_input, fresh))
+                attempts += 1
+            results[name] = cost
+
+            ratio = cost / baseline if baseline else None
+            status = ""
+            if ratio is not None and ratio > args.threshold:
+                regressions.append(name)
+                status = "  REGRESSION"
+            print(
+                f"{name:<52} {cost:>10.3f} "
+                f"{baseline or 0:>10.3f} {ratio if ratio is not None else float('nan'):>7.2f}{status}"
+            )
+
+    if args.update:
+        baselines.update({name: round(cost, 4) for name, cost in results.items()})
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"Updated {len(results)} baselines in {BASELINES_PATH}")
+        return 0
+
+    if regressions:
+        print(f"{len(regressions)} cases regressed by more than {args.threshold:.2f}x: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,17 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so the test environment must be in place before app modules load
+_scratch = tempfile.mkdtemp(prefix="intellitask-tests-")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("LOG_ENQUEUE", "false")
+os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(_scratch, "shared-cache.db"))
+os.environ.setdefault("WORKSPACE_ROOT", os.path.join(_scratch, "workspaces"))
+os.environ.setdefault("JOB_DB_PATH", os.path.join(_scratch, "jobs.db"))
+os.environ.setdefault("JOB_STORAGE_DIR", os.path.join(_scratch, "jobs"))
+# No test talks to the real API; model calls are stubbed per test
+os.environ.setdefault("GENAI_BACKEND", "replay")
+os.environ.setdefault("GENAI_CASSETTE_DIR", os.path.join(_scratch, "cassettes"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app.config.config import settings
+from app.services.genai_service import GenAIService
+from app.services.resilience import ModelUnavailableError
+from app.utils.other_utils import normalize_summary
+
+DOCUMENT = "\n".join(f"# Section {index}\n" + f"Requirement {index}. " * 20 for index in range(3))
+
+
+def _task(summary: str) -> dict:
+    return {
+        "summary": summary,
+        "description": summary,
+        "issueType": "Task",
+        "priority": "Medium",
+        "originalEstimate": "01:00",
+        "storyPoint": 1,
+        "subTasks": [],
+    }
+
+
+def _section_results(monkeypatch, service: GenAIService, tasks_by_section: list, errors: dict | None = None):
+    errors = errors or {}
+    monkeypatch.setattr(settings, "CHUNK_MAX_CHARS", 500)
+    monkeypatch.setattr(settings, "CHUNK_MIN_CHARS", 0)
+
+    async def analyze_frs(file_paths, document_texts, **kwargs):
+        index = int(document_texts[0].split("\n")[0].removeprefix("# Section "))
+        if index in errors:
+            raise errors[index]
+        return {
+            "project_name": "Demo",
+            "tasks": [_task(summary) for summary in tasks_by_section[index]],
+            "_meta": {"cache": "miss", "model": "test-model", "token_usage": {"total_tokens": 10}},
+        }
+
+    monkeypatch.setattr(service, "analyze_frs", analyze_frs)
+
+
+def test_normalize_summary_ignores_case_punctuation_and_spacing():
+    assert normalize_summary("  Build the LOGIN page! ") == normalize_summary("build the login-page")
+    assert normalize_summary(None) == ""
+
+
+def test_sections_are_merged_in_order_without_duplicates(monkeypatch):
+    service = GenAIService()
+    _section_results(monkeypatch, service, [["Login page", "Audit log"], ["login page."], ["Reports"]])
+    result = asyncio.run(service.analyze_frs_chunked([DOCUMENT], "Kanban", []))
+
+    assert [task["summary"] for task in result["tasks"]] == ["Login page", "Audit log", "Reports"]
+    assert result["_meta"]["sections"] == 3
+    assert result["_meta"]["duplicates_removed"] == 1
+    assert result["_meta"]["failed_sections"] == []
+
+
+def test_a_failed_section_fails_the_request(monkeypatch):
+    service = GenAIService()
+    _section_results(monkeypatch, service, [["Login page"], [], ["Reports"]], {1: ValueError("bad JSON")})
+    with pytest.raises(ValueError, match="1 of 3 sections"):
+        asyncio.run(service.analyze_frs_chunked([DOCUMENT], "Kanban", []))
+
+
+def test_an_unavailable_model_is_surfaced_as_such(monkeypatch):
+    service = GenAIService()
+    unavailable = ModelUnavailableError("Model service is unavailable.", 30)
+    _section_results(monkeypatch, service, [["Login page"], [], ["Reports"]], {2: unavailable})
+    with pytest.raises(ModelUnavailableError):
+        asyncio.run(service.analyze_frs_chunked([DOCUMENT], "Kanban", []))
+
+
+def test_partial_results_are_opt_in(monkeypatch):
+    service = GenAIService()
+    _section_results(monkeypatch, service, [["Login page"], [], ["Reports"]], {1: ValueError("bad JSON")})
+    result = asyncio.run(service.analyze_frs_chunked([DOCUMENT], "Kanban", [], allow_partial=True))
+    assert [task["summary"] for task in result["tasks"]] == ["Login page", "Reports"]
+    assert result["_meta"]["failed_sections"] == [2]
@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+from google.genai import errors
+
+from app.services import context_cache
+from app.services.context_cache import ContextCacheManager, FakeCacheService
+
+PREFIX = "You are a project planner. " * 20
+DOCUMENTS = ["digest-1"]
+
+
+def _manager(caches: FakeCacheService) -> ContextCacheManager:
+    return ContextCacheManager(caches, "test-model", ttl_seconds=600, max_entries=4)
+
+
+def _get(manager: ContextCacheManager, prefix: str = PREFIX):
+    return asyncio.run(manager.get(prefix, [], DOCUMENTS))
+
+
+def test_content_is_created_once_and_reused():
+    caches = FakeCacheService()
+    manager = _manager(caches)
+    name = _get(manager)
+    assert name in caches.store
+    assert _get(manager) == name
+    assert caches.created == 1
+    assert caches.updated == 0
+
+
+def test_reuse_past_half_the_ttl_extends_it():
+    caches = FakeCacheService()
+    manager = _manager(caches)
+    name = _get(manager)
+    key = manager.make_key(PREFIX, DOCUMENTS)
+    manager._entries[key] = (name, time.time() + 60)
+
+    assert _get(manager) == name
+    assert caches.updated == 1
+    assert manager._entries[key][1] > time.time() + 500
+
+
+def test_expired_content_is_recreated():
+    caches = FakeCacheService()
+    manager = _manager(caches)
+    first = _get(manager)
+    manager._entries[manager.make_key(PREFIX, DOCUMENTS)] = (first, time.time() - 1)
+
+    second = _get(manager)
+    assert second != first
+    assert caches.created == 2
+
+
+def test_rejected_content_is_not_retried():
+    caches = FakeCacheService(min_chars=len(PREFIX) + 1)
+    manager = _manager(caches)
+    assert _get(manager) is None
+    assert _get(manager) is None
+    assert caches.attempts == 1
+
+
+def test_transient_failure_is_retried_sooner(monkeypatch):
+    monkeypatch.setattr(context_cache, "FAILED_RETRY_SECONDS", 0.05)
+    caches = FakeCacheService()
+    caches.failures.append(errors.ServerError(503, {"error": {"code": 503, "message": "Overloaded"}}))
+    manager = _manager(caches)
+    assert _get(manager) is None
+    assert _get(manager) is None
+    assert caches.attempts == 1
+
+    time.sleep(0.1)
+    assert _get(manager) is not None
+    assert caches.attempts == 2
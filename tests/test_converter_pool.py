@@ -0,0 +1,82 @@
+import asyncio
+import os
+import stat
+
+from app.utils.converter_pool import ConverterPool
+from app.utils.shared_cache import SharedCache
+
+# Stands in for LibreOffice: logs each run and writes a PDF for --convert-to
+FAKE_LIBREOFFICE = """#!/bin/sh
+profile="$1"; shift
+outdir=""; source=""
+while [ $# -gt 0 ]; do
+  case "$1" in
+    --terminate_after_init) echo "warm $profile" >> "{log}" ;;
+    --outdir) outdir="$2"; shift ;;
+    --convert-to) shift ;;
+    --*) ;;
+    *) source="$1" ;;
+  esac
+  shift
+done
+if [ -n "$source" ]; then
+  echo "convert $profile" >> "{log}"
+  name=$(basename "$source" .docx)
+  echo "%PDF-1.4 $name" > "$outdir/$name.pdf"
+fi
+"""
+
+
+def _make_pool(tmp_path, **kwargs) -> tuple[ConverterPool, str]:
+    log = tmp_path / "runs.log"
+    binary = tmp_path / "libreoffice"
+    binary.write_text(FAKE_LIBREOFFICE.replace("{log}", str(log)))
+    binary.chmod(binary.stat().st_mode | stat.S_IEXEC)
+    pool = ConverterPool(
+        size=1,
+        binary=str(binary),
+        profile_root=str(tmp_path / "profiles"),
+        cache=SharedCache(path=str(tmp_path / "cache.db")),
+        **kwargs,
+    )
+    return pool, str(log)
+
+
+def _runs(log: str) -> list[str]:
+    with open(log) as f:
+        return [line.split()[0] for line in f]
+
+
+def _docx(tmp_path, name: str) -> str:
+    path = tmp_path / f"{name}.docx"
+    path.write_bytes(name.encode())
+    return str(path)
+
+
+def test_recycled_worker_is_rewarmed_before_its_next_job(tmp_path):
+    pool, log = _make_pool(tmp_path, max_jobs=1)
+
+    async def scenario():
+        await pool.warm_up()
+        first = await pool.convert(_docx(tmp_path, "first"), "digest-1")
+        second = await pool.convert(_docx(tmp_path, "second"), "digest-2")
+        # The second job also used up the worker; wait for its background recycle
+        await asyncio.gather(*pool._background)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert os.path.exists(first) and os.path.exists(second)
+    assert _runs(log) == ["warm", "convert", "warm", "convert", "warm"]
+
+
+def test_cached_conversion_skips_libreoffice(tmp_path):
+    pool, log = _make_pool(tmp_path)
+
+    async def scenario():
+        await pool.convert(_docx(tmp_path, "first"), "same-digest")
+        return await pool.convert(_docx(tmp_path, "again"), "same-digest")
+
+    pdf_path = asyncio.run(scenario())
+    assert _runs(log) == ["convert"]
+    with open(pdf_path) as f:
+        assert f.read().strip() == "%PDF-1.4 first"
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routes.analyze import genai_service
+
+
+def _task(summary: str, task_id: int) -> dict:
+    return {
+        "id": task_id,
+        "summary": summary,
+        "description": f"Work on {summary}",
+        "issueType": "Task",
+        "priority": "Medium",
+        "originalEstimate": "02:00",
+        "storyPoint": 2,
+        "subTasks": [],
+    }
+
+
+PROJECT = {
+    "project_name": "Demo",
+    "tasks": [_task(f"Module {index}", index) for index in range(28)]
+    + [_task("FE: Login page", 100), _task("BE: Login API", 101)],
+}
+
+
+@pytest.fixture
+def model_reply(monkeypatch):
+    """
+    Replaces the model call; set reply["text"] to the raw response text.
+    """
+    reply = {}
+
+    async def choose_model(file_paths, prompt, latency_budget=None):
+        return "test-model"
+
+    async def get_task_breakdown(file_paths, prompt, static_prefix=None, model=None, priority=None):
+        reply["prompt"] = prompt
+        return {"text": reply["text"]}
+
+    monkeypatch.setattr(genai_service.client, "choose_model", choose_model)
+    monkeypatch.setattr(genai_service.client, "get_task_breakdown", get_task_breakdown)
+    return reply
+
+
+def _edit(**fields):
+    data = {"previous_json": json.dumps(PROJECT), "query": "Raise the priority of the login work", **fields}
+    return TestClient(app).post("/edit-json/", data=data)
+
+
+def test_scoped_error_response_is_returned_unchanged(model_reply):
+    error = {"success": False, "error": "The query is too ambiguous."}
+    model_reply["text"] = json.dumps(error)
+    response = _edit(scoped="true")
+    assert response.status_code == 200
+    assert response.json() == error
+
+
+def test_patch_mode_returns_updated_json_without_operations(model_reply):
+    model_reply["text"] = json.dumps({
+        "success": True,
+        "added": [],
+        "updated": ["FE: Login page"],
+        "deleted": [],
+        "patch": [
+            {"op": "test", "path": "/tasks/28/summary", "value": "FE: Login page"},
+            {"op": "replace", "path": "/tasks/28/priority", "value": "High"},
+        ],
+    })
+    response = _edit(edit_mode="patch")
+    assert response.status_code == 200
+    body = response.json()
+    assert "patch" not in body
+    assert body["updated_json"]["tasks"][28]["priority"] == "High"
+    assert body["updated_json"]["tasks"][28]["id"] == 100
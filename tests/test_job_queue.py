@@ -0,0 +1,72 @@
+import asyncio
+import os
+import subprocess
+import sys
+from datetime import timedelta
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.services.job_queue import JobQueue
+from app.services.job_store import JOB_FAILED, JOB_QUEUED, Job, JobStore, _utcnow
+from app.services.resilience import CircuitOpenError
+
+
+def _store_with_job(tmp_path) -> tuple[JobStore, str, str]:
+    store = JobStore(db_path=str(tmp_path / "jobs.db"))
+    storage_dir = tmp_path / "job-files"
+    storage_dir.mkdir()
+    upload = storage_dir / "frs.txt"
+    upload.write_text("The user can log in.")
+    job_id = store.create(
+        project_type="Scrum",
+        tech_stack=[],
+        ingest_mode="text",
+        storage_dir=str(storage_dir),
+        file_paths=[str(upload)],
+    )
+    return store, job_id, str(storage_dir)
+
+
+class _UnavailableService:
+    async def analyze_frs(self, *args, **kwargs):
+        raise CircuitOpenError("Model service is unavailable.", 30)
+
+
+def test_unavailable_model_defers_the_job(tmp_path, monkeypatch):
+    store, job_id, storage_dir = _store_with_job(tmp_path)
+    queue = JobQueue(_UnavailableService(), store=store, workers=1)
+
+    async def prepare_documents(file_paths, ingest_mode):
+        return file_paths, None
+
+    monkeypatch.setattr("app.services.job_queue.prepare_documents", prepare_documents)
+    asyncio.run(queue._run(store.claim_next()))
+
+    job = store.get(job_id)
+    assert job.status == JOB_QUEUED
+    assert job.attempts == 0
+    assert job.not_before > _utcnow() + timedelta(seconds=20)
+    # Not due yet, and its uploads are kept for the retry
+    assert store.claim_next() is None
+    assert os.path.isdir(storage_dir)
+
+
+def test_exhausted_stale_job_is_failed_and_its_uploads_removed(tmp_path):
+    store, job_id, storage_dir = _store_with_job(tmp_path)
+    store.claim_next()
+    with Session(store.engine) as session:
+        session.execute(update(Job).values(attempts=3, updated_at=_utcnow() - timedelta(minutes=10)))
+        session.commit()
+
+    assert store.requeue_stale(stale_seconds=60, max_attempts=3) == 0
+    assert store.get(job_id).status == JOB_FAILED
+    assert not os.path.exists(storage_dir)
+
+
+def test_importing_the_app_does_not_open_the_job_database(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    env = dict(os.environ, JOB_DB_PATH=str(db_path))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=root, env=env, check=True)
+    assert not db_path.exists()
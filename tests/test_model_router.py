@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from app.services.model_router import ModelRouter
+from app.services.resilience import CircuitBreaker, ModelCallPolicy
+
+HEDGE_DELAY = 0.05
+
+
+class FakeBackend:
+    """
+    Each call sleeps for the next latency in the list and then succeeds, holding a policy slot
+    the way GenAIClient's attempts do.
+    """
+
+    def __init__(self, latencies: list[float], policy: ModelCallPolicy):
+        self.latencies = latencies
+        self.policy = policy
+        self.started: list[float] = []
+        self.cancelled = 0
+
+    async def generate(self) -> str:
+        index = len(self.started)
+        self.started.append(time.perf_counter())
+        async with self.policy.slot():
+            try:
+                await asyncio.sleep(self.latencies[index])
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        return f"call {index}"
+
+
+def _router() -> ModelRouter:
+    router = ModelRouter([("fake-model", float("inf"))], hedge_enabled=True, hedge_percentile=0.5,
+                         hedge_max_ratio=1.0, window=20, min_samples=5)
+    for _ in range(5):
+        router.tracker("fake-model", "generate").observe(HEDGE_DELAY)
+    return router
+
+
+def _call(router: ModelRouter, backend: FakeBackend) -> tuple[str, float]:
+    async def scenario():
+        start = time.perf_counter()
+        result = await router.call("fake-model", "generate", backend.generate)
+        # Let the cancelled loser unwind
+        await asyncio.sleep(0)
+        return result, start
+
+    return asyncio.run(scenario())
+
+
+def test_fast_call_is_not_hedged():
+    policy = ModelCallPolicy()
+    backend = FakeBackend([0.0], policy)
+    router = _router()
+    assert _call(router, backend)[0] == "call 0"
+    assert len(backend.started) == 1
+    assert router.hedges == 0
+
+
+def test_hedge_fires_after_the_delay_and_the_loser_is_cancelled():
+    policy = ModelCallPolicy()
+    backend = FakeBackend([5.0, 0.0], policy)
+    router = _router()
+    result, start = _call(router, backend)
+
+    assert result == "call 1"
+    assert router.hedges == 1
+    assert backend.started[1] - start >= HEDGE_DELAY
+    assert backend.cancelled == 1
+    assert policy.limiter.in_flight == 0
+
+
+def test_cancelled_loser_leaves_the_breaker_alone():
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    verdicts = []
+    record = breaker.record
+
+    def spy(error, probe):
+        verdicts.append(error)
+        record(error, probe)
+
+    breaker.record = spy
+    policy = ModelCallPolicy(breaker=breaker)
+    backend = FakeBackend([5.0, 0.0], policy)
+    _call(_router(), backend)
+
+    # Only the winner reported an outcome; the cancellation was not counted as a failure
+    assert backend.cancelled == 1
+    assert verdicts == [None]
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
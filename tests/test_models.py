@@ -0,0 +1,31 @@
+from app.models import ProjectAdapter
+
+
+def _task(**overrides) -> dict:
+    task = {
+        "summary": "Login page",
+        "description": "<p class='TextEditor__paragraph' dir='ltr'>Build the login page</p>",
+        "issueType": "Story",
+        "priority": "High",
+        "originalEstimate": "04:00",
+        "storyPoint": 3,
+        "subTasks": [],
+    }
+    task.update(overrides)
+    return task
+
+
+def test_missing_priority_defaults_to_none():
+    task = _task(subTasks=[_task()])
+    del task["priority"]
+    del task["subTasks"][0]["priority"]
+    project = ProjectAdapter.validate_python({"project_name": "Demo", "tasks": [task]})
+    assert project.tasks[0].priority == "None"
+    assert project.tasks[0].subTasks[0].priority == "None"
+
+
+def test_priority_is_normalized():
+    project = ProjectAdapter.validate_python({"project_name": "Demo", "tasks": [_task(priority=" high ")]})
+    assert project.tasks[0].priority == "High"
+    project = ProjectAdapter.validate_python({"project_name": "Demo", "tasks": [_task(priority="Critical")]})
+    assert project.tasks[0].priority == "None"
@@ -0,0 +1,29 @@
+import asyncio
+
+from app.services.result_cache import ResultCache
+from app.utils.metrics import CACHE_LOOKUPS, render_metrics
+from app.utils.shared_cache import SharedCache
+
+
+def _lookups(outcome: str) -> float:
+    return CACHE_LOOKUPS._values.get(("result", outcome), 0)
+
+
+def test_lookups_are_counted_per_tier(tmp_path):
+    store = SharedCache(path=str(tmp_path / "cache.db"))
+    before = {outcome: _lookups(outcome) for outcome in ("memory_hit", "shared_hit", "miss")}
+
+    async def scenario():
+        writer = ResultCache(store=store)
+        assert await writer.get("key") is None
+        await writer.set("key", {"tasks": [], "_meta": {}})
+        assert await writer.get("key") == {"tasks": [], "_meta": {}}
+        # Another worker process: empty memory tier, same shared store
+        reader = ResultCache(store=store)
+        assert await reader.get("key") == {"tasks": [], "_meta": {}}
+
+    asyncio.run(scenario())
+    assert _lookups("miss") - before["miss"] == 1
+    assert _lookups("memory_hit") - before["memory_hit"] == 1
+    assert _lookups("shared_hit") - before["shared_hit"] == 1
+    assert 'intellitask_cache_lookups_total{cache="result",outcome="shared_hit"}' in render_metrics()
@@ -0,0 +1,51 @@
+from app.utils.retrieval_utils import scope_edit
+
+
+def _project(count: int) -> dict:
+    tasks = [
+        {"summary": f"Task {index}", "description": f"Implement module {index}", "subTasks": []}
+        for index in range(count)
+    ]
+    tasks[3] = {"summary": "FE: Login page", "description": "Build the login form with password reset", "subTasks": []}
+    tasks[7] = {"summary": "BE: Login API", "description": "Password login endpoint", "subTasks": []}
+    return {"project_name": "Demo", "tasks": tasks}
+
+
+def test_scope_selects_matching_tasks():
+    scope = scope_edit(_project(30), "Raise the priority of the login work", max_tasks=5)
+    assert scope is not None
+    assert scope.selected == [3, 7]
+    assert [task["summary"] for task in scope.scoped_data["tasks"]] == ["FE: Login page", "BE: Login API"]
+
+
+def test_scope_without_lexical_match_sends_everything():
+    assert scope_edit(_project(30), "Make the billing reports faster", max_tasks=5) is None
+
+
+def test_small_project_is_not_scoped():
+    project = _project(30)
+    project["tasks"] = project["tasks"][:5]
+    assert scope_edit(project, "Raise the priority of the login work", max_tasks=5) is None
+
+
+def test_merge_replaces_selected_tasks_in_place():
+    project = _project(30)
+    scope = scope_edit(project, "Raise the priority of the login work", max_tasks=5)
+    updated = {"tasks": [
+        {"summary": "FE: Login page", "priority": "High"},
+        {"summary": "FE: Logout button", "priority": "Low"},
+    ]}
+    merged = scope.merge(updated)
+    summaries = [task["summary"] for task in merged["tasks"]]
+    assert len(summaries) == 30  # one selected task deleted, one added
+    assert merged["tasks"][3]["priority"] == "High"
+    assert "BE: Login API" not in summaries
+    assert summaries.index("FE: Logout button") == 7
+
+
+def test_merge_returns_error_response_unchanged():
+    project = _project(30)
+    scope = scope_edit(project, "Raise the priority of the login work", max_tasks=5)
+    error = {"success": False, "error": "The query is too ambiguous."}
+    assert scope.merge(error) == error
+    assert len(project["tasks"]) == 30
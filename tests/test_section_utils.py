@@ -0,0 +1,56 @@
+from app.utils.section_utils import _merge_small, heading_level, split_into_sections
+
+
+def _document() -> str:
+    sections = []
+    for chapter in (1, 2):
+        sections.append(f"# Chapter {chapter}")
+        for part in (1, 2):
+            sections.append(f"## Feature {chapter}.{part}")
+            sections.append(f"The system shall support feature {chapter}.{part}. " * 5)
+    return "\n".join(sections)
+
+
+def test_heading_levels():
+    assert heading_level("## Login") == 2
+    assert heading_level("3.2 Password reset") == 2
+    assert heading_level("4.1.2. Audit log") == 3
+    assert heading_level("The user logs in.") is None
+    assert heading_level("") is None
+
+
+def test_short_text_is_one_section():
+    assert split_into_sections("  # Title\nBody  ", max_chars=100) == ["# Title\nBody"]
+    assert split_into_sections("   ", max_chars=100) == []
+
+
+def test_splits_at_the_shallowest_heading_level():
+    text = _document()
+    sections = split_into_sections(text, max_chars=len(text) - 10)
+    assert [section.split("\n")[0] for section in sections] == ["# Chapter 1", "# Chapter 2"]
+
+
+def test_large_sections_are_split_at_deeper_headings():
+    text = _document()
+    sections = split_into_sections(text, max_chars=400)
+    assert all(len(section) <= 400 for section in sections)
+    assert sum("## Feature" in section for section in sections) == 4
+    # No text is lost or reordered
+    assert "\n".join(sections).split() == text.split()
+
+
+def test_text_without_headings_is_packed_by_paragraph():
+    text = "\n".join(f"Paragraph {index} " + "x" * 40 for index in range(10))
+    sections = split_into_sections(text, max_chars=120)
+    assert all(len(section) <= 120 for section in sections)
+    assert "\n".join(sections) == text
+
+
+def test_merge_small_joins_neighbours_below_the_minimum():
+    # Once the merged section reaches the minimum, the next one starts a new section
+    assert _merge_small(["a" * 10, "b" * 10, "c" * 50], max_chars=100, min_chars=20) == [
+        "a" * 10 + "\n\n" + "b" * 10, "c" * 50
+    ]
+    # Merging never exceeds max_chars
+    assert _merge_small(["a" * 10, "b" * 95], max_chars=100, min_chars=20) == ["a" * 10, "b" * 95]
+    assert _merge_small(["a" * 30, "b" * 30], max_chars=100, min_chars=20) == ["a" * 30, "b" * 30]
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+
+from app.services.genai_service import GenAIService
+from app.services.singleflight import SingleFlight
+from app.utils.workspace import RequestWorkspace
+
+PROJECT = {
+    "project_name": "Demo",
+    "tasks": [
+        {
+            "id": 1,
+            "summary": "Login page",
+            "description": "Build the login page",
+            "issueType": "Task",
+            "priority": "High",
+            "originalEstimate": "02:00",
+            "storyPoint": 2,
+            "subTasks": [],
+        }
+    ],
+}
+
+
+def _upload(tmp_path) -> tuple[RequestWorkspace, str]:
+    workspace = RequestWorkspace(root=str(tmp_path)).open()
+    path = workspace.new_path(".pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4 requirements")
+    return workspace, path
+
+
+def test_shared_call_survives_the_leaders_workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.config.config.settings.WORKSPACE_ROOT", str(tmp_path / "shared"))
+    service = GenAIService()
+    service.result_cache = None
+    release = asyncio.Event()
+    seen = []
+
+    async def choose_model(file_paths, prompt, latency_budget=None):
+        return "test-model"
+
+    async def get_task_breakdown(file_paths, prompt, static_prefix=None, model=None, priority=None):
+        await release.wait()
+        for path in file_paths:
+            with open(path, "rb") as f:
+                seen.append(f.read())
+        return {"text": json.dumps(PROJECT)}
+
+    monkeypatch.setattr(service.client, "choose_model", choose_model)
+    monkeypatch.setattr(service.client, "get_task_breakdown", get_task_breakdown)
+
+    async def scenario():
+        leader_workspace, leader_path = _upload(tmp_path)
+        follower_workspace, follower_path = _upload(tmp_path)
+        leader = asyncio.create_task(service.analyze_frs([leader_path], "Scrum", []))
+        while service.inflight.in_flight() == 0:
+            await asyncio.sleep(0.01)
+        follower = asyncio.create_task(service.analyze_frs([follower_path], "Scrum", []))
+        await asyncio.sleep(0.1)
+
+        # The leader's client disconnects and its workspace is removed while the call is still running
+        leader.cancel()
+        await asyncio.gather(leader, return_exceptions=True)
+        leader_workspace.close()
+        release.set()
+        result = await follower
+        follower_workspace.close()
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["_meta"]["cache"] == "coalesced"
+    assert seen == [b"%PDF-1.4 requirements"]
+    assert os.listdir(tmp_path / "shared") == []
+
+
+def test_only_the_caller_that_starts_a_call_prepares_it():
+    flight = SingleFlight()
+    events = []
+    release = asyncio.Event()
+
+    async def prepare():
+        events.append("prepare")
+        return "inputs", lambda: events.append("cleanup")
+
+    async def func(value):
+        await release.wait()
+        return value
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("key", func, prepare=prepare))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(flight.do("key", func, prepare=prepare))
+        await asyncio.sleep(0.01)
+        release.set()
+        return await first, await second
+
+    assert asyncio.run(scenario()) == (("inputs", False), ("inputs", True))
+    assert events == ["prepare", "cleanup"]
@@ -0,0 +1,40 @@
+import json
+
+from app.utils.stream_utils import TaskStreamParser
+
+TASKS = [
+    {"id": 1, "summary": "Parse {braces} and [brackets]", "description": 'Quote \\"x\\" and a \\\\ backslash', "subTasks": []},
+    {"id": 2, "summary": "Second", "description": "Ends with a brace }", "subTasks": [{"id": 3, "summary": "Nested"}]},
+]
+DOCUMENT = json.dumps({"project_name": 'Demo "tasks": [', "tasks": TASKS})
+
+
+def _feed_all(parser: TaskStreamParser, chunks: list[str]) -> list[dict]:
+    tasks = []
+    for chunk in chunks:
+        tasks.extend(parser.feed(chunk))
+    return tasks
+
+
+def test_tasks_are_found_at_every_chunk_boundary():
+    for split in range(1, len(DOCUMENT)):
+        parser = TaskStreamParser()
+        assert _feed_all(parser, [DOCUMENT[:split], DOCUMENT[split:]]) == TASKS, split
+        assert parser.text == DOCUMENT
+
+
+def test_single_character_chunks():
+    parser = TaskStreamParser()
+    assert _feed_all(parser, list(DOCUMENT)) == TASKS
+
+
+def test_markdown_fence_before_the_document_is_ignored():
+    text = "Here you go:\n```json\n" + DOCUMENT + "\n```"
+    parser = TaskStreamParser()
+    assert _feed_all(parser, [text[i:i + 7] for i in range(0, len(text), 7)]) == TASKS
+
+
+def test_malformed_task_is_skipped():
+    text = '{"project_name": "Demo", "tasks": [{"id": 1, "summary": }, {"id": 2}]}'
+    parser = TaskStreamParser()
+    assert _feed_all(parser, [text[:30], text[30:]]) == [{"id": 2}]
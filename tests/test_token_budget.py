@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+from google.genai import errors
+
+from app.config.config import settings
+from app.services.genai_client import GenAIClient
+from app.services.token_budget import PRIORITY_BATCH, PRIORITY_INTERACTIVE, TokenBudgetStore, TokenScheduler
+
+
+def _store(tmp_path, limit: int = 100) -> TokenBudgetStore:
+    return TokenBudgetStore(db_path=str(tmp_path / "budget.db"), limit=limit)
+
+
+def test_waiters_are_admitted_in_priority_order(tmp_path):
+    store = _store(tmp_path)
+    assert store.try_reserve("running", 80, PRIORITY_BATCH)
+    # Both wait while the window is full; the interactive call queued later is still first in line
+    assert not store.try_reserve("batch", 50, PRIORITY_BATCH)
+    assert not store.try_reserve("interactive", 50, PRIORITY_INTERACTIVE)
+
+    store.cancel("running")
+    assert not store.try_reserve("batch", 50, PRIORITY_BATCH)
+    assert store.try_reserve("interactive", 50, PRIORITY_INTERACTIVE)
+    assert store.try_reserve("batch", 50, PRIORITY_BATCH)
+
+
+def test_settle_replaces_the_estimate_and_cancel_frees_it(tmp_path):
+    store = _store(tmp_path)
+    assert store.try_reserve("call", 80, PRIORITY_BATCH)
+    store.settle("call", 30)
+    assert store.used() == 30
+    store.cancel("call")
+    assert store.used() == 0
+
+
+def test_scheduler_settles_with_actual_usage(tmp_path):
+    scheduler = TokenScheduler(_store(tmp_path, limit=100_000))
+
+    async def scenario():
+        reservation = await scheduler.reserve(1000)
+        assert scheduler.store.used() == reservation.tokens
+        await scheduler.settle(reservation, {"input_tokens": 900, "output_tokens": 100, "total_tokens": 1000})
+        return scheduler.store.used()
+
+    assert asyncio.run(scenario()) == 1000
+
+
+def test_retried_attempts_each_hold_a_reservation(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GENAI_RETRY_BASE_SECONDS", 0.01)
+    client = GenAIClient()
+    client.token_budget = TokenScheduler(_store(tmp_path, limit=1_000_000))
+    estimate = 10 + round(client.token_budget.output_estimate)
+    calls = []
+
+    async def estimate_input_tokens(file_paths, prompt):
+        return 10
+
+    async def generate_content(model, contents, config):
+        calls.append(model)
+        if len(calls) == 1:
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "Overloaded"}})
+        usage = SimpleNamespace(
+            prompt_token_count=10, candidates_token_count=5, total_token_count=15, cached_content_token_count=None
+        )
+        return SimpleNamespace(text="{}", usage_metadata=usage)
+
+    monkeypatch.setattr("app.services.genai_client.estimate_input_tokens", estimate_input_tokens)
+    monkeypatch.setattr(client.client.aio.models, "generate_content", generate_content)
+
+    result = asyncio.run(client.get_task_breakdown([], "prompt", model="test-model"))
+    assert result["usage"]["total_tokens"] == 15
+    assert len(calls) == 2
+    # The failed attempt reached the API and keeps its estimate; the winner is settled to its usage
+    assert client.token_budget.store.used() == estimate + 15
@@ -0,0 +1,65 @@
+import os
+import shutil
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils import workspace as workspace_module
+from app.utils.workspace import RequestWorkspace, cleanup_stale_workspaces
+
+
+@pytest.fixture
+def other_process(monkeypatch):
+    """
+    Gives later workspaces fresh ledger objects, as a separate worker process would have.
+    """
+    def switch():
+        monkeypatch.setattr(workspace_module, "_ledgers", {})
+    return switch
+
+
+def test_quota_is_shared_across_processes(tmp_path, other_process):
+    first = RequestWorkspace(root=str(tmp_path), quota_bytes=100).open()
+    first.reserve(60)
+
+    other_process()
+    second = RequestWorkspace(root=str(tmp_path), quota_bytes=100).open()
+    with pytest.raises(HTTPException) as raised:
+        second.reserve(60)
+    assert raised.value.status_code == 507
+
+    first.close()
+    second.reserve(60)
+    assert RequestWorkspace.usage_bytes(str(tmp_path)) == 60
+
+
+def test_detached_workspace_no_longer_counts(tmp_path):
+    workspace = RequestWorkspace(root=str(tmp_path), quota_bytes=100).open()
+    workspace.reserve(80)
+    workspace.detach()
+    assert RequestWorkspace.usage_bytes(str(tmp_path)) == 0
+    assert os.path.isdir(workspace.path)
+
+
+def test_cleanup_releases_workspaces_of_stopped_processes(tmp_path):
+    crashed = RequestWorkspace(root=str(tmp_path), quota_bytes=100).open()
+    crashed.reserve(80)
+    # The process died without closing it; the directory is later removed as stale
+    shutil.rmtree(crashed.path)
+    cleanup_stale_workspaces(root=str(tmp_path))
+    assert RequestWorkspace.usage_bytes(str(tmp_path)) == 0
+
+
+def test_adopted_copies_count_against_the_quota(tmp_path, monkeypatch):
+    source = tmp_path / "upload.pdf"
+    source.write_bytes(b"x" * 80)
+
+    def no_links(src, dst):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(os, "link", no_links)
+    workspace = RequestWorkspace(root=str(tmp_path / "root"), quota_bytes=100).open()
+    workspace.adopt(str(source))
+    assert workspace.reserved_bytes == 80
+    with pytest.raises(HTTPException):
+        workspace.adopt(str(source))